@@ -0,0 +1,167 @@
+from typing import Any, Dict, List, Mapping, Tuple
+from pathlib import Path
+import json
+import os
+import numpy as np
+import numpy.typing as npt
+
+
+_MAGIC: bytes = b"WMLBNDL\x01"
+
+_ALIGNMENT: int = 64
+"""The alignment, in bytes, of the start of each array in a bundle file"""
+
+
+class InvalidArrayBundleError(Exception):
+    pass
+
+
+def _aligned(position: int) -> int:
+    return -(-position // _ALIGNMENT) * _ALIGNMENT
+
+
+def write_array_bundle(filepath: Path,
+                       metadata: Mapping[str, Any],
+                       arrays: Mapping[str, npt.NDArray]) -> None:
+    """Writes some named arrays and metadata to a single file.
+
+The file starts with a JSON header describing the metadata and the dtype, shape and position of each array. \
+The arrays follow, uncompressed and in C order, each starting at a position aligned to 64 bytes so that they can all be memory-mapped. \
+The file is written to a temporary path first and then moved into place, so a partially-written file is never seen.
+
+Parameters:
+
+    filepath - the file to write
+
+    metadata - JSON-serializable metadata to store with the arrays
+
+    arrays - the arrays to store. Object arrays can't be stored
+"""
+
+    entries: Dict[str, Dict[str, Any]] = {}
+    position = 0
+
+    for name, array in arrays.items():
+
+        if array.dtype.hasobject:
+            raise ValueError(f"Can't store object array {name}")
+
+        entries[name] = {
+            "dtype": array.dtype.str,
+            "shape": list(array.shape),
+            "offset": position,
+        }
+
+        position = _aligned(position + array.nbytes)
+
+    header = json.dumps({ "metadata": metadata, "arrays": entries }).encode("UTF-8")
+
+    # Array offsets are relative to the start of the data, which is itself aligned
+
+    data_start = _aligned(len(_MAGIC) + 8 + len(header))
+
+    temp_filepath = filepath.with_name(f"{filepath.name}.tmp-{os.getpid()}")
+
+    try:
+
+        with temp_filepath.open("wb") as file:
+
+            file.write(_MAGIC)
+            file.write(np.array([len(header)], dtype="<u8").tobytes())
+            file.write(header)
+
+            for name, array in arrays.items():
+                file.seek(data_start + entries[name]["offset"])
+                np.ascontiguousarray(array).tofile(file)
+
+            file.truncate(data_start + position)
+
+        temp_filepath.replace(filepath)
+
+    finally:
+        if temp_filepath.exists():
+            temp_filepath.unlink()
+
+
+def read_array_bundle(filepath: Path, mmap: bool = True) -> Tuple[Dict[str, Any], Dict[str, npt.NDArray]]:
+    """Reads a file written by `write_array_bundle`.
+
+Parameters:
+
+    filepath - the file to read
+
+    mmap (optional) - if true, the arrays are memory-mapped read-only instead of being read into memory
+
+Returns:
+
+    metadata - the metadata stored with the arrays
+
+    arrays - the stored arrays by name
+"""
+
+    with filepath.open("rb") as file:
+
+        if file.read(len(_MAGIC)) != _MAGIC:
+            raise InvalidArrayBundleError(filepath)
+
+        header_length = int(np.frombuffer(file.read(8), dtype="<u8")[0])
+        header_bytes = file.read(header_length)
+
+        if len(header_bytes) != header_length:
+            raise InvalidArrayBundleError(filepath)
+
+        header = json.loads(header_bytes.decode("UTF-8"))
+        data_start = _aligned(len(_MAGIC) + 8 + header_length)
+
+        file_size = os.fstat(file.fileno()).st_size
+
+        arrays: Dict[str, npt.NDArray] = {}
+
+        for name, entry in header["arrays"].items():
+
+            dtype = np.dtype(entry["dtype"])
+            shape = tuple(entry["shape"])
+            offset = data_start + entry["offset"]
+            count = int(np.prod(shape, dtype=np.int64))
+
+            if offset + count * dtype.itemsize > file_size:
+                raise InvalidArrayBundleError(filepath)
+
+            # Memory-mapping an empty array isn't possible
+
+            if count == 0:
+                arrays[name] = np.zeros(shape=shape, dtype=dtype)
+            elif mmap:
+                arrays[name] = np.memmap(filepath, dtype=dtype, mode="r", offset=offset, shape=shape)
+            else:
+                file.seek(offset)
+                arrays[name] = np.fromfile(file, dtype=dtype, count=count).reshape(shape)
+
+    return header["metadata"], arrays
+
+
+def encode_strings(strings: List[str]) -> Tuple[npt.NDArray[np.uint8], npt.NDArray[np.int64]]:
+    """Encodes some strings as arrays that can be stored in a bundle.
+
+Returns:
+
+    blob - the UTF-8 encodings of the strings, concatenated
+
+    offsets - an (N+1)-vector where string `i` is encoded in `blob[offsets[i]:offsets[i+1]]`
+"""
+
+    encoded = [string.encode("UTF-8") for string in strings]
+
+    offsets = np.zeros(shape=(len(encoded)+1,), dtype=np.int64)
+    np.cumsum([len(x) for x in encoded], out=offsets[1:])
+
+    return np.frombuffer(b"".join(encoded), dtype=np.uint8), offsets
+
+
+def decode_strings(blob: npt.NDArray[np.uint8], offsets: npt.NDArray[np.int64]) -> List[str]:
+    """Decodes strings encoded by `encode_strings`"""
+
+    data = blob.tobytes()
+    bounds = offsets.tolist()
+
+    return [data[bounds[i]:bounds[i+1]].decode("UTF-8") for i in range(len(bounds)-1)]
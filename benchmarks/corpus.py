@@ -0,0 +1,65 @@
+from typing import List
+import numpy as np
+
+
+_SEED: int = 20231018
+
+_VOCABULARY_SIZE: int = 50_000
+
+_ZIPF_EXPONENT: float = 1.1
+
+_CHUNK_SECTIONS: int = 10_000
+
+
+def _vocabulary(rng: np.random.Generator) -> List[str]:
+    """Makes distinct random lowercase words, with lengths roughly like those of English words"""
+
+    letters = np.array(list("abcdefghijklmnopqrstuvwxyz"))
+    words: List[str] = []
+    seen = set()
+
+    while len(words) < _VOCABULARY_SIZE:
+        length = int(np.clip(rng.poisson(5), 1, 15))
+        word = "".join(letters[rng.integers(0, 26, size=length)])
+        if word not in seen:
+            seen.add(word)
+            words.append(word)
+
+    return words
+
+
+def synthetic_corpus(size_bytes: int) -> str:
+    """Returns a stable synthetic text of about the given size, which is always the same for the same size.
+
+The words are drawn from a fixed random vocabulary with Zipf-distributed frequencies, like natural text. \
+Sentences have between 3 and 30 words and are ended by full stops or new lines, with some words separated by commas or hyphens.
+"""
+
+    rng = np.random.default_rng(_SEED)
+    words = np.array(_vocabulary(rng), dtype=object)
+
+    # Zipf's law over a finite vocabulary
+
+    weights = 1 / np.arange(1, _VOCABULARY_SIZE+1) ** _ZIPF_EXPONENT
+    cumulative = np.cumsum(weights / np.sum(weights))
+
+    pieces: List[str] = []
+    length = 0
+
+    while length < size_bytes:
+
+        section_lengths = rng.integers(3, 31, size=_CHUNK_SECTIONS)
+        ids = np.minimum(np.searchsorted(cumulative, rng.random(int(np.sum(section_lengths)))), _VOCABULARY_SIZE-1)
+        separators = np.where(rng.random(len(ids)) < 0.05, np.where(rng.random(len(ids)) < 0.5, ", ", "-"), " ").astype(object)
+
+        # The last word of each section is followed by a section separator instead
+
+        section_ends = np.cumsum(section_lengths) - 1
+        separators[section_ends] = np.where(rng.random(len(section_ends)) < 0.8, ". ", ".\n")
+
+        chunk = "".join((words[ids] + separators).tolist())
+
+        pieces.append(chunk)
+        length += len(chunk)
+
+    return "".join(pieces)[:size_bytes]
@@ -0,0 +1,87 @@
+from typing import Callable, List
+from pathlib import Path
+from time import perf_counter
+import argparse
+import os
+from example_data.text.imdb_reviews import TRAIN_DATA_POS_PATH, TRAIN_DATA_NEG_PATH, TEST_DATA_POS_PATH, TEST_DATA_NEG_PATH, review_filepaths, iter_reviews, load_reviews
+from example_data.text.imdb_reviews.packed import PACKED_REVIEWS_PATH, PackedReviews
+
+
+def _original_loop() -> List[str]:
+    """How the reviews used to be loaded: globbing each directory and reading one file at a time"""
+
+    filepaths = list(TRAIN_DATA_POS_PATH.glob("*.txt")) \
+        + list(TRAIN_DATA_NEG_PATH.glob("*.txt")) \
+        + list(TEST_DATA_POS_PATH.glob("*.txt")) \
+        + list(TEST_DATA_NEG_PATH.glob("*.txt"))
+
+    return [path.read_text(encoding="UTF-8") for path in filepaths]
+
+
+def _evict(filepaths: List[Path]) -> None:
+    """Asks the OS to drop the files from its page cache, so that they have to be read from the disk again"""
+
+    for path in filepaths:
+        fd = os.open(path, os.O_RDONLY)
+        try:
+            os.posix_fadvise(fd, 0, 0, os.POSIX_FADV_DONTNEED)
+        finally:
+            os.close(fd)
+
+
+def _measure(name: str, load: Callable[[], List[str]], file_count: int, cold: bool, filepaths: List[Path]) -> None:
+
+    if cold:
+        _evict(filepaths)
+
+    start = perf_counter()
+    texts = load()
+    seconds = perf_counter() - start
+
+    assert len(texts) == file_count
+
+    print(f"{name:<30} {'cold' if cold else 'warm'}  {seconds:7.3f} s  {file_count/seconds:9.0f} files/s")
+
+
+def main():
+
+    parser = argparse.ArgumentParser(description="Measures how many IMDB review files are loaded per second, serially and with threads")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 4, 16, 64])
+    parser.add_argument("--warm-only", action="store_true", help="don't evict the files from the page cache before each measurement")
+    args = parser.parse_args()
+
+    filepaths = review_filepaths()
+    file_count = len(filepaths)
+
+    can_evict = hasattr(os, "posix_fadvise") and not args.warm_only
+
+    for cold in ([True, False] if can_evict else [False]):
+
+        if not cold:
+            _original_loop()  # Warms the page cache
+
+        _measure("original loop", _original_loop, file_count, cold, filepaths)
+
+        for workers in args.workers:
+            _measure(f"load_reviews(workers={workers})", lambda: load_reviews(workers=workers), file_count, cold, filepaths)
+
+        if PACKED_REVIEWS_PATH.is_file():
+            _measure("PackedReviews.load_reviews", lambda: PackedReviews().load_reviews(), file_count, cold, [PACKED_REVIEWS_PATH])
+
+    if not PACKED_REVIEWS_PATH.is_file():
+        print("Pack the reviews with `python -m example_data.text.imdb_reviews.packed` to also measure reading them from the packed file")
+
+    # How soon the first review can be used when streaming
+
+    if can_evict:
+        _evict(filepaths)
+
+    start = perf_counter()
+    stream = iter_reviews()
+    next(stream)
+    print(f"First review from iter_reviews after {1e3*(perf_counter() - start):.1f} ms")
+    stream.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,174 @@
+from typing import List, Optional, Tuple
+from pathlib import Path
+from time import perf_counter
+import argparse
+import asyncio
+import json
+import subprocess
+import sys
+import tempfile
+import numpy as np
+from query_server import LatencyHistogram
+from saved_models import ModelBundle, save_bundle, load_bundle, save_neighbour_index
+from neighbours import NeighbourIndex
+from sparse_matrix import CSRMatrix
+from vocabulary import Vocabulary
+
+
+_SYNTHETIC_WORDS: int = 20_000
+
+_SYNTHETIC_COMPONENTS: int = 100
+
+
+def _write_synthetic_model(directory: Path) -> Tuple[Path, Path]:
+    """Writes a model with random projections and a neighbour index for it, for when no saved model is given"""
+
+    rng = np.random.default_rng(0)
+
+    words = [f"w{i}" for i in range(_SYNTHETIC_WORDS)]
+    projections = rng.standard_normal((_SYNTHETIC_WORDS, _SYNTHETIC_COMPONENTS)).astype(np.float32)
+
+    keys = np.unique(rng.integers(0, _SYNTHETIC_WORDS**2, size=20*_SYNTHETIC_WORDS))
+    rel_pos = CSRMatrix.from_flat_keys(keys, rng.random(len(keys)).astype(np.float32), (_SYNTHETIC_WORDS, _SYNTHETIC_WORDS))
+
+    bundle_filepath = directory/"model.bundle"
+    save_bundle(bundle_filepath, ModelBundle(Vocabulary(words), rel_pos, np.identity(_SYNTHETIC_COMPONENTS, dtype=np.float32), projections, 20, False))
+
+    index = NeighbourIndex(projections)
+    index.build_ivf()
+    index_filepath = directory/"index.bundle"
+    save_neighbour_index(index_filepath, index)
+
+    return bundle_filepath, index_filepath
+
+
+async def _request(reader: asyncio.StreamReader, writer: asyncio.StreamWriter, target: str) -> int:
+
+    writer.write(f"GET {target} HTTP/1.1\r\nHost: localhost\r\n\r\n".encode("latin-1"))
+    await writer.drain()
+
+    status_line = await reader.readline()
+    content_length = 0
+
+    while (line := await reader.readline()) not in (b"\r\n", b""):
+        name, _, value = line.decode("latin-1").partition(":")
+        if name.lower() == "content-length":
+            content_length = int(value)
+
+    await reader.readexactly(content_length)
+
+    return int(status_line.split()[1])
+
+
+def _targets(words: List[str], count: int, seed: int) -> List[str]:
+    """A deterministic mix of queries, with some words repeated so that the cache is used"""
+
+    rng = np.random.default_rng(seed)
+    popular = words[:max(1, len(words) // 100)]
+
+    targets: List[str] = []
+
+    for _ in range(count):
+        word = popular[rng.integers(len(popular))] if rng.random() < 0.5 else words[rng.integers(len(words))]
+        other = words[rng.integers(len(words))]
+        kind = rng.random()
+        if kind < 0.5:
+            targets.append(f"/neighbours?word={word}&k=10&approximate=1")
+        elif kind < 0.8:
+            targets.append(f"/distance?a={word}&b={other}")
+        else:
+            targets.append(f"/lookup?word={word}")
+
+    return targets
+
+
+async def _load(port: int, words: List[str], concurrency: int, requests: int) -> Tuple[LatencyHistogram, float, int]:
+    """Makes requests from several clients at once, each with their own connection. Returns the client-side latencies, the total time and the number of errors"""
+
+    histogram = LatencyHistogram()
+    errors = 0
+
+    async def client(targets: List[str]) -> None:
+        nonlocal errors
+        reader, writer = await asyncio.open_connection("127.0.0.1", port)
+        for target in targets:
+            start = perf_counter()
+            if await _request(reader, writer, target) != 200:
+                errors += 1
+            histogram.record(perf_counter() - start)
+        writer.close()
+
+    start = perf_counter()
+    await asyncio.gather(*[client(_targets(words, requests // concurrency, seed)) for seed in range(concurrency)])
+
+    return histogram, perf_counter() - start, errors
+
+
+async def _stats(port: int) -> dict:
+
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    writer.write(b"GET /stats HTTP/1.1\r\nHost: localhost\r\nConnection: close\r\n\r\n")
+    await writer.drain()
+    response = await reader.read()
+    writer.close()
+
+    return json.loads(response.split(b"\r\n\r\n", 1)[1])
+
+
+def main():
+
+    parser = argparse.ArgumentParser(description="Measures the cold-start and per-request latency of the query server")
+    parser.add_argument("--bundle", type=Path, default=None, help="the model to serve. Defaults to a synthetic model")
+    parser.add_argument("--neighbour-index", type=Path, default=None)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--requests", type=int, default=20_000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as temp_directory:
+
+        bundle_filepath: Path = args.bundle
+        index_filepath: Optional[Path] = args.neighbour_index
+
+        if bundle_filepath is None:
+            bundle_filepath, index_filepath = _write_synthetic_model(Path(temp_directory))
+
+        command = [sys.executable, "-m", "query_server", "--bundle", str(bundle_filepath), "--port", "0"]
+        if index_filepath is not None:
+            command += ["--neighbour-index", str(index_filepath)]
+
+        start = perf_counter()
+        server = subprocess.Popen(command, stdout=subprocess.PIPE, text=True)
+
+        try:
+
+            assert server.stdout is not None
+            line = server.stdout.readline()
+            port = int(line.rsplit(":", 1)[1])
+            listening_time = perf_counter() - start
+
+            async def first_request() -> None:
+                reader, writer = await asyncio.open_connection("127.0.0.1", port)
+                await _request(reader, writer, "/lookup?word=" + ("w0" if args.bundle is None else "the"))
+                writer.close()
+
+            asyncio.run(first_request())
+            first_response_time = perf_counter() - start
+
+            words = load_bundle(bundle_filepath).word_indexes.words
+
+            histogram, total_time, errors = asyncio.run(_load(port, words, args.concurrency, args.requests))
+            stats = asyncio.run(_stats(port))
+
+        finally:
+            server.terminate()
+            server.wait()
+
+    print(f"Cold start: listening after {1e3*listening_time:.0f} ms, first response after {1e3*first_response_time:.0f} ms")
+    print(f"Load: {histogram.count} requests from {args.concurrency} clients in {total_time:.2f} s ({histogram.count/total_time:.0f} requests/s), {errors} errors")
+    print("Client latency: p50 <= {p50_ms:.2f} ms, p95 <= {p95_ms:.2f} ms, p99 <= {p99_ms:.2f} ms, mean {mean_ms:.2f} ms".format(**histogram.to_dict()))
+    print("Server stats:")
+    print(json.dumps(stats, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+from typing import Callable, Dict, Tuple
+import resource
+import subprocess
+import sys
+import numpy as np
+import numpy.typing as npt
+from rel_pos_mapping import normalize_rel_pos, exp_map_rel_pos
+
+
+_N: int = 4000
+"""The vocabulary size of the relative position matrix to post-process"""
+
+
+def _original(pos_mat: npt.NDArray) -> Tuple[npt.NDArray, npt.NDArray]:
+    """The post-processing originally in `examples/create_models_word_rel_pos.py`. Kept to compare against"""
+
+    offset_pos_mat = pos_mat-np.mean(np.where(
+        pos_mat == np.inf,
+        0,
+        pos_mat
+    ))
+
+    normalization_factor = np.max(np.where(
+        pos_mat == np.inf,
+        0,
+        np.abs(offset_pos_mat)
+    ))
+    normalized_pos_mat = offset_pos_mat/normalization_factor
+
+    mapped_mat = np.where(
+        normalized_pos_mat == np.inf,
+        np.zeros_like(normalized_pos_mat),
+        np.exp(np.negative(normalized_pos_mat))
+    )
+
+    return normalized_pos_mat, mapped_mat
+
+
+def _fused(pos_mat: npt.NDArray) -> Tuple[npt.NDArray, npt.NDArray]:
+    normalized = normalize_rel_pos(pos_mat, out=pos_mat)
+    return normalized, exp_map_rel_pos(normalized, out=normalized)
+
+
+_VARIANTS: Dict[str, Callable[[npt.NDArray], Tuple[npt.NDArray, npt.NDArray]]] = {
+    "original": _original,
+    "fused": _fused,
+}
+
+
+def _peak_rss_mb() -> float:
+    # ru_maxrss is in kilobytes on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1e3
+
+
+def _run_variant(name: str) -> None:
+    """Runs a single variant and prints the peak RSS used beyond that of the input matrix. \
+Each variant is run in its own process as the peak RSS of a process can't be reset"""
+
+    # The input is made a row at a time so that the peak RSS before running the variant is just that of the input
+
+    rng = np.random.default_rng(0)
+    pos_mat = np.empty(shape=(_N, _N), dtype=np.float32)
+
+    for i in range(_N):
+        row = rng.random(_N, dtype=np.float32) * 20
+        row[rng.random(_N) < 0.6] = np.inf
+        pos_mat[i] = row
+
+    baseline = _peak_rss_mb()
+
+    _VARIANTS[name](pos_mat)
+
+    print(_peak_rss_mb() - baseline)
+
+
+def main():
+
+    if len(sys.argv) > 1:
+        _run_variant(sys.argv[1])
+        return
+
+    matrix_mb = _N * _N * 4 / 1e6
+
+    print(f"Input matrix: {_N}x{_N} float32 ({matrix_mb:.0f} MB)")
+
+    for name in _VARIANTS:
+        output = subprocess.run(
+            [sys.executable, "-m", "benchmarks.rel_pos_mapping_memory", name],
+            capture_output=True, text=True, check=True
+        ).stdout
+        extra_mb = float(output)
+        print(f"{name:<10} extra peak RSS: {extra_mb:8.0f} MB ({extra_mb/matrix_mb:.1f}x the input)")
+
+
+if __name__ == "__main__":
+    main()
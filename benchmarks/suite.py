@@ -0,0 +1,254 @@
+from typing import Any, Callable, Dict, List, Tuple
+from pathlib import Path
+from time import perf_counter
+import argparse
+import gc
+import json
+import os
+import platform
+import sys
+import tempfile
+import tracemalloc
+import numpy as np
+from tokenizing import tokenize
+from text_source import RawTextSource
+from learn import learn_word_rel_pos
+from pca import covariance_matrix, principal_components
+from rel_pos_mapping import normalize_rel_pos, exp_map_rel_pos
+from vocabulary import Vocabulary
+from examples.create_models_word_rel_pos import create_models
+from benchmarks.corpus import synthetic_corpus
+
+
+DEFAULT_BASELINE: Path = Path(__file__).parent / "baseline.json"
+
+_DEFAULT_SIZES_MB: List[int] = [1, 10]
+"""The corpus sizes benchmarked by default. The 100 MB corpus takes much longer so must be asked for"""
+
+_DEFAULT_TOLERANCE: float = 0.25
+"""How much slower, or how much more memory, a case may take than the baseline before it counts as a regression"""
+
+_DEFAULT_REPEATS: int = 5
+"""The default number of times each case is timed, of which the best is kept. Short cases vary too much between single runs to be compared"""
+
+_MIN_SECONDS_DIFFERENCE: float = 0.05
+"""How much slower than the baseline a case must be, as well as more than the tolerance, for its time to count as a regression. \
+Differences smaller than this are within the noise of timing short cases"""
+
+_MATRIX_WORD_COUNTS: List[int] = [1000, 3000]
+"""The vocabulary sizes of the matrices that the covariance matrix, principal components and model creation are benchmarked for"""
+
+
+class _Case:
+    """A benchmark case. `setup` makes the input, which isn't measured, and `run` is what is measured"""
+
+    def __init__(self, name: str, setup: Callable[[], Any], run: Callable[[Any], Any]):
+        self.name = name
+        self.setup = setup
+        self.run = run
+
+
+def _measure(case: _Case, repeats: int, memory: bool) -> Dict[str, float]:
+    """Returns the best time of a case and, separately measured so that tracing doesn't slow the timing, its peak traced memory"""
+
+    best = float("inf")
+
+    for _ in range(repeats):
+        data = case.setup()
+        gc.collect()
+        start = perf_counter()
+        case.run(data)
+        best = min(best, perf_counter() - start)
+        del data
+
+    result = { "seconds": best }
+
+    if memory:
+        data = case.setup()
+        gc.collect()
+        tracemalloc.start()
+        try:
+            case.run(data)
+            result["peak_mb"] = tracemalloc.get_traced_memory()[1] / 1e6
+        finally:
+            tracemalloc.stop()
+
+    return result
+
+
+def _create_models(pos_mat: np.ndarray) -> None:
+    """Runs the whole model creation pipeline of the example, writing the models to a temporary directory"""
+
+    word_count = pos_mat.shape[0]
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = Path(directory)
+        create_models(
+            pos_mat=pos_mat,
+            word_indexes=Vocabulary(f"w{i}" for i in range(word_count)),
+            data_filepath=path/"data.npy",
+            word_indexes_filepath=path/"word_indexes.dat",
+            principal_components_filepath=path/"principal_components.npy",
+            pca_filepath=path/"pca.npy",
+            bundle_filepath=path/"model.bundle",
+            neighbour_index_filepath=path/"index.bundle",
+            signed=False,
+            corpus_hash=""
+        )
+
+
+def _cases(size_mb: int) -> List[_Case]:
+
+    text_cache: Dict[str, Any] = {}
+
+    def text() -> str:
+        if "text" not in text_cache:
+            text_cache["text"] = synthetic_corpus(size_mb * 1_000_000)
+        return text_cache["text"]
+
+    def source() -> RawTextSource:
+        if "source" not in text_cache:
+            text_cache["source"] = RawTextSource(text())
+        return text_cache["source"]
+
+    def pos_mat(word_count: int) -> np.ndarray:
+        key = f"pos_mat_{word_count}"
+        if key not in text_cache:
+            text_cache[key] = learn_word_rel_pos(source(), max_look_dist=20, word_count_max=word_count)[0]
+        return text_cache[key]
+
+    def mapped_mat(word_count: int) -> np.ndarray:
+        return exp_map_rel_pos(normalize_rel_pos(pos_mat(word_count)))
+
+    prefix = f"{size_mb}mb"
+
+    cases: List[_Case] = [
+        _Case(f"{prefix}/tokenize", text, tokenize),
+        _Case(f"{prefix}/read_all_sections", source, lambda s: s.read_all_sections()),
+    ]
+
+    for max_look_dist in [5, 20]:
+        for word_count_max in [1000, 5000]:
+            for signed in [False, True]:
+                cases.append(_Case(
+                    f"{prefix}/learn_word_rel_pos/dist={max_look_dist}/words={word_count_max}/{'signed' if signed else 'unsigned'}",
+                    source,
+                    lambda s, d=max_look_dist, w=word_count_max, sg=signed: learn_word_rel_pos(s, max_look_dist=d, signed=sg, word_count_max=w)
+                ))
+
+    for word_count in _MATRIX_WORD_COUNTS:
+        cases.extend([
+            _Case(f"{prefix}/covariance_matrix/words={word_count}", lambda w=word_count: mapped_mat(w), covariance_matrix),
+            _Case(f"{prefix}/principal_components/words={word_count}", lambda w=word_count: covariance_matrix(mapped_mat(w)), principal_components),
+            _Case(f"{prefix}/create_models/words={word_count}", lambda w=word_count: pos_mat(w).copy(), _create_models),
+        ])
+
+    return cases
+
+
+def _environment() -> Dict[str, Any]:
+    return {
+        "python": sys.version.split()[0],
+        "numpy": np.__version__,
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+    }
+
+
+def compare(results: Dict[str, Dict[str, float]],
+            baseline: Dict[str, Dict[str, float]],
+            tolerance: float,
+            min_seconds_difference: float = _MIN_SECONDS_DIFFERENCE) -> Tuple[List[Tuple[str, str, float, float]], List[str]]:
+    """Compares benchmark results with a baseline.
+
+Returns:
+
+    regressions - the case name, the measurement ("seconds" or "peak_mb"), the baseline value and the new value of each measurement that is more than `tolerance` (as a fraction) worse than the baseline. \
+Times must also be at least `min_seconds_difference` slower than the baseline
+
+    uncompared - the names of the cases that the baseline has no results for
+"""
+
+    regressions: List[Tuple[str, str, float, float]] = []
+    uncompared: List[str] = []
+
+    for name, result in results.items():
+
+        if name not in baseline:
+            uncompared.append(name)
+            continue
+
+        for measurement, value in result.items():
+            base = baseline[name].get(measurement)
+            if (base is None) or (value <= base * (1 + tolerance)):
+                continue
+            if (measurement == "seconds") and (value - base < min_seconds_difference):
+                continue
+            regressions.append((name, measurement, base, value))
+
+    return regressions, uncompared
+
+
+def main():
+
+    parser = argparse.ArgumentParser(description="Times and memory-profiles tokenizing, learning, the covariance matrix, PCA and model creation on synthetic corpora")
+    parser.add_argument("--sizes", type=int, nargs="+", default=_DEFAULT_SIZES_MB, help="the corpus sizes to benchmark, in MB")
+    parser.add_argument("--filter", default="", help="only run the cases whose names contain this")
+    parser.add_argument("--repeats", type=int, default=_DEFAULT_REPEATS, help="the number of times each case is timed, of which the best is kept")
+    parser.add_argument("--no-memory", action="store_true", help="don't measure peak memory, which runs each case again")
+    parser.add_argument("--output", type=Path, default=None, help="a file to write the results to as JSON")
+    parser.add_argument("--baseline", type=Path, default=DEFAULT_BASELINE, help="the results to compare with")
+    parser.add_argument("--tolerance", type=float, default=_DEFAULT_TOLERANCE)
+    parser.add_argument("--write-baseline", action="store_true", help="save the results as the new baseline instead of comparing with it")
+    parser.add_argument("--allow-uncompared", action="store_true", help="don't fail when some cases aren't in the baseline")
+    args = parser.parse_args()
+
+    results: Dict[str, Dict[str, float]] = {}
+
+    for size_mb in args.sizes:
+        for case in _cases(size_mb):
+
+            if args.filter not in case.name:
+                continue
+
+            result = _measure(case, args.repeats, not args.no_memory)
+            results[case.name] = result
+
+            memory = f"{result['peak_mb']:10.1f} MB" if "peak_mb" in result else ""
+            print(f"{case.name:<70} {result['seconds']:10.3f} s {memory}", flush=True)
+
+    output: Dict[str, Any] = { "environment": _environment(), "results": results }
+
+    if args.output is not None:
+        args.output.write_text(json.dumps(output, indent=2))
+
+    if args.write_baseline:
+        args.baseline.write_text(json.dumps(output, indent=2))
+        print(f"Wrote baseline to {args.baseline}")
+        return
+
+    if not args.baseline.is_file():
+        print(f"No baseline at {args.baseline} to compare with")
+        return
+
+    baseline = json.loads(args.baseline.read_text())
+
+    if baseline["environment"] != output["environment"]:
+        print("Warning: the baseline was measured in a different environment:", json.dumps(baseline["environment"]))
+
+    regressions, uncompared = compare(results, baseline["results"], args.tolerance)
+
+    for name, measurement, base, value in regressions:
+        print(f"REGRESSION {name} {measurement}: {base:.3f} -> {value:.3f} ({100*(value/base - 1):+.0f}%)")
+
+    for name in uncompared:
+        print(f"UNCOMPARED {name}: not in the baseline")
+
+    if regressions or (uncompared and not args.allow_uncompared):
+        sys.exit(1)
+
+    print(f"No regressions beyond {100*args.tolerance:.0f}% of the baseline in {len(results) - len(uncompared)} cases")
+
+
+if __name__ == "__main__":
+    main()
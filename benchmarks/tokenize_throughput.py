@@ -0,0 +1,77 @@
+from typing import List, Callable
+from time import perf_counter
+from tokenizing import tokenize, TextToken, WordTextToken, EndOfSectionTextToken
+from example_data.text.imdb_reviews import load_reviews_joined as load_imdb_reviews_text
+
+
+_TEXT_LENGTH: int = 4_000_000
+"""Number of characters of the IMDB reviews to tokenize"""
+
+_REPEATS: int = 3
+
+
+def _per_character_tokenize(text: str) -> List[TextToken]:
+    """The original tokenizer, which handles the text one character at a time. Kept to compare against"""
+
+    word_characters = { *[chr(x) for x in range(ord("A"), ord("Z")+1)], *[chr(x) for x in range(ord("a"), ord("z")+1)] }
+    word_separators = { " ", "-", "," }
+    section_separators = { ".", "\n" }
+
+    tokens: List[TextToken] = []
+    curr: str = ""
+
+    for char in text:
+
+        if char in word_characters:
+
+            curr += char
+
+        elif char in word_separators:
+
+            if curr:
+                tokens.append(WordTextToken(curr))
+                curr = ""
+
+        elif char in section_separators:
+
+            if curr:
+                tokens.append(WordTextToken(curr))
+                curr = ""
+
+            if (len(tokens) > 0) and (not isinstance(tokens[-1], EndOfSectionTextToken)):
+                tokens.append(EndOfSectionTextToken())
+
+    if curr:
+        tokens.append(WordTextToken(curr))
+        curr = ""
+
+    return tokens
+
+
+def _throughput(text: str, func: Callable[[str], List[TextToken]]) -> float:
+    """Returns the best throughput of a tokenizer in MB/s"""
+
+    best = float("inf")
+
+    for _ in range(_REPEATS):
+        start = perf_counter()
+        func(text)
+        best = min(best, perf_counter() - start)
+
+    return len(text.encode("UTF-8")) / best / 1e6
+
+
+def main():
+
+    text = load_imdb_reviews_text()[:_TEXT_LENGTH]
+
+    before = _throughput(text, _per_character_tokenize)
+    after = _throughput(text, tokenize)
+
+    print(f"Per-character tokenizer: {before:.2f} MB/s")
+    print(f"Bulk tokenizer:          {after:.2f} MB/s")
+    print(f"Speed-up:                {after/before:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,5 +1,8 @@
-from typing import List, Optional
+from typing import List, Optional, Iterator, Tuple, Deque
 from pathlib import Path
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, Future
+from itertools import islice
 from progress import Progress
 
 
@@ -15,36 +18,132 @@ assert TEST_DATA_POS_PATH.is_dir()
 assert TEST_DATA_NEG_PATH.is_dir()
 
 
-def load_reviews(progress: Optional[Progress] = None) -> List[str]:
-    """Loads all the reviews and returns them as a list of strings"""
+_DEFAULT_WORKERS: int = 16
+"""The default number of threads that read review files at once. Reading many small files is bound by waiting for the file system rather than by the CPU, so more threads than CPUs are useful"""
 
-    filepaths: List[Path] = list(TRAIN_DATA_POS_PATH.glob("*.txt")) \
-        + list(TRAIN_DATA_NEG_PATH.glob("*.txt")) \
-        + list(TEST_DATA_POS_PATH.glob("*.txt")) \
-        + list(TEST_DATA_NEG_PATH.glob("*.txt"))
+_BATCH_FILES: int = 64
+"""The number of files read by each task given to the threads. Giving the threads batches of files rather than single files keeps the overhead of handing out tasks low"""
+
+_READ_AHEAD_BATCHES_PER_WORKER: int = 2
+"""How many batches each thread may read ahead of the review being yielded, which bounds the memory used by reviews waiting to be yielded"""
+
+
+def _review_sort_key(path: Path) -> Tuple[int, int, str]:
+    """Sorts review files, which are named `<id>_<rating>.txt`, by their ID"""
+
+    review_id, _, rating = path.stem.partition("_")
+
+    if review_id.isdigit() and rating.isdigit():
+        return int(review_id), int(rating), path.name
+    else:
+        return -1, -1, path.name
+
+
+def review_filepaths() -> List[Path]:
+    """Returns the paths of all the review files, in the order that `load_reviews` loads them. \
+This is the training reviews then the testing reviews, with the positive reviews before the negative ones and each directory sorted by review ID"""
+
+    return [
+        path
+        for directory in [TRAIN_DATA_POS_PATH, TRAIN_DATA_NEG_PATH, TEST_DATA_POS_PATH, TEST_DATA_NEG_PATH]
+        for path in sorted(directory.glob("*.txt"), key=_review_sort_key)
+    ]
+
+
+def _read_reviews(paths: List[Path]) -> List[str]:
+    """Reads some review files. The files are small, so they are each read whole without buffering and then decoded, which is quicker than `Path.read_text`. \
+Newlines are translated as `Path.read_text` would"""
 
     texts: List[str] = []
 
+    for path in paths:
+
+        with open(path, "rb", buffering=0) as file:
+            text = file.read().decode("UTF-8")
+
+        if "\r" in text:
+            text = text.replace("\r\n", "\n").replace("\r", "\n")
+
+        texts.append(text)
+
+    return texts
+
+
+def iter_reviews(progress: Optional[Progress] = None, workers: int = _DEFAULT_WORKERS) -> Iterator[str]:
+    """Yields the reviews one at a time in the order of `review_filepaths`. \
+The files are read by several threads at once, which only read a limited number of files ahead of the review being yielded.
+
+Parameters:
+
+    progress (optional) - optional progress tracker, which is advanced as each review is yielded
+
+    workers (optional) - the number of threads reading files. If this is 1, the files are read one at a time by the calling thread
+"""
+
+    if workers < 1:
+        raise ValueError(workers)
+
+    filepaths = review_filepaths()
+
     if progress:
         progress.max = len(filepaths)
 
-    for path in filepaths:
+    batches = [filepaths[start:start+_BATCH_FILES] for start in range(0, len(filepaths), _BATCH_FILES)]
+
+    if workers == 1:
+
+        for batch in batches:
+            for text in _read_reviews(batch):
+
+                yield text
+
+                if progress:
+                    progress.next()
+
+    else:
+
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+
+            pending: Deque[Future[List[str]]] = deque()
+            remaining = iter(batches)
 
-        texts.append(path.read_text(encoding="UTF-8"))
+            try:
 
-        if progress:
-            progress.next()
+                for batch in islice(remaining, workers * _READ_AHEAD_BATCHES_PER_WORKER):
+                    pending.append(executor.submit(_read_reviews, batch))
+
+                while pending:
+
+                    texts = pending.popleft().result()
+
+                    for batch in islice(remaining, 1):
+                        pending.append(executor.submit(_read_reviews, batch))
+
+                    for text in texts:
+
+                        yield text
+
+                        if progress:
+                            progress.next()
+
+            finally:
+                for future in pending:
+                    future.cancel()
 
     if progress:
         progress.finish()
 
-    return texts
+
+def load_reviews(progress: Optional[Progress] = None, workers: int = _DEFAULT_WORKERS) -> List[str]:
+    """Loads all the reviews and returns them as a list of strings, in the order of `review_filepaths`. The files are read by `workers` threads at once"""
+
+    return list(iter_reviews(progress=progress, workers=workers))
 
 
-def load_reviews_joined(progress: Optional[Progress] = None) -> str:
+def load_reviews_joined(progress: Optional[Progress] = None, workers: int = _DEFAULT_WORKERS) -> str:
     """Loads all the reviews and joins them together into a single string, separating reviews with full stops"""
 
-    texts = load_reviews(progress=progress)
+    texts = load_reviews(progress=progress, workers=workers)
 
     out = ".".join(texts)
 
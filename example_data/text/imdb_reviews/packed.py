@@ -0,0 +1,181 @@
+from typing import List, Optional, Literal, Iterator
+from pathlib import Path
+import numpy as np
+import numpy.typing as npt
+from progress import Progress
+from array_bundle import write_array_bundle, read_array_bundle, InvalidArrayBundleError
+from example_data.text.imdb_reviews import review_filepaths, iter_reviews
+
+
+PACKED_REVIEWS_PATH: Path = Path(__file__).parent.absolute()/"reviews.bundle"
+
+_FORMAT_VERSION: int = 1
+
+Split = Literal["training", "testing"]
+
+Sentiment = Literal["pos", "neg"]
+
+SPLITS: List[Split] = ["training", "testing"]
+"""The splits of the reviews, in the order of their codes in `PackedReviews.splits`"""
+
+SENTIMENTS: List[Sentiment] = ["neg", "pos"]
+"""The sentiments of the reviews, in the order of their codes in `PackedReviews.sentiments`"""
+
+
+def pack_reviews(filepath: Path = PACKED_REVIEWS_PATH, progress: Optional[Progress] = None) -> None:
+    """Packs all the review files into a single file, which `PackedReviews` reads.
+
+The file holds the UTF-8 text of the reviews concatenated, the offset of each review in it and the labels of each review: \
+its split, its sentiment and the ID and rating from its file name, `<id>_<rating>.txt`. \
+Reviews are in the order of `review_filepaths`.
+"""
+
+    filepaths = review_filepaths()
+
+    review_ids = np.zeros(shape=(len(filepaths),), dtype=np.int32)
+    ratings = np.zeros(shape=(len(filepaths),), dtype=np.int8)
+    splits = np.zeros(shape=(len(filepaths),), dtype=np.uint8)
+    sentiments = np.zeros(shape=(len(filepaths),), dtype=np.uint8)
+
+    for i, path in enumerate(filepaths):
+
+        review_id, _, rating = path.stem.partition("_")
+
+        if not (review_id.isdigit() and rating.isdigit()):
+            raise ValueError(f"Unexpected review file name {path.name}")
+
+        review_ids[i] = int(review_id)
+        ratings[i] = int(rating)
+        splits[i] = SPLITS.index(path.parent.parent.name)  # type: ignore
+        sentiments[i] = SENTIMENTS.index(path.parent.name)  # type: ignore
+
+    encoded = [text.encode("UTF-8") for text in iter_reviews(progress=progress)]
+
+    offsets = np.zeros(shape=(len(encoded)+1,), dtype=np.int64)
+    np.cumsum([len(x) for x in encoded], out=offsets[1:])
+
+    write_array_bundle(filepath, {
+        "version": _FORMAT_VERSION,
+        "count": len(filepaths),
+    }, {
+        "text": np.frombuffer(b"".join(encoded), dtype=np.uint8),
+        "offsets": offsets,
+        "review_ids": review_ids,
+        "ratings": ratings,
+        "splits": splits,
+        "sentiments": sentiments,
+    })
+
+
+class PackedReviews:
+    """The reviews packed into a single file by `pack_reviews`.
+
+The file is memory-mapped, so opening it doesn't read the reviews, and a single review can be read by its index without reading the rest. \
+`load_reviews` and `load_reviews_joined` give the same as the functions of the same names that read the review files.
+"""
+
+    def __init__(self, filepath: Path = PACKED_REVIEWS_PATH):
+
+        metadata, arrays = read_array_bundle(filepath, mmap=True)
+
+        if metadata.get("version") != _FORMAT_VERSION:
+            raise InvalidArrayBundleError(filepath)
+
+        self._text: npt.NDArray[np.uint8] = arrays["text"]
+        self._offsets: npt.NDArray[np.int64] = arrays["offsets"]
+        self._review_ids: npt.NDArray[np.int32] = arrays["review_ids"]
+        self._ratings: npt.NDArray[np.int8] = arrays["ratings"]
+        self._splits: npt.NDArray[np.uint8] = arrays["splits"]
+        self._sentiments: npt.NDArray[np.uint8] = arrays["sentiments"]
+
+        if len(self._offsets) != metadata["count"] + 1:
+            raise InvalidArrayBundleError(filepath)
+
+    @property
+    def review_ids(self) -> npt.NDArray[np.int32]:
+        """The ID of each review, from its file name"""
+        return self._review_ids
+
+    @property
+    def ratings(self) -> npt.NDArray[np.int8]:
+        """The rating out of 10 of each review, from its file name"""
+        return self._ratings
+
+    @property
+    def splits(self) -> npt.NDArray[np.uint8]:
+        """The split of each review, as its index in `SPLITS`"""
+        return self._splits
+
+    @property
+    def sentiments(self) -> npt.NDArray[np.uint8]:
+        """The sentiment of each review, as its index in `SENTIMENTS`"""
+        return self._sentiments
+
+    def indexes_of(self, split: Optional[Split] = None, sentiment: Optional[Sentiment] = None) -> npt.NDArray[np.int64]:
+        """Returns the indexes of the reviews in a split and/or with a sentiment"""
+
+        selected = np.ones(shape=(len(self),), dtype=bool)
+
+        if split is not None:
+            selected &= self._splits == SPLITS.index(split)
+
+        if sentiment is not None:
+            selected &= self._sentiments == SENTIMENTS.index(sentiment)
+
+        return np.flatnonzero(selected)
+
+    def __len__(self) -> int:
+        return len(self._offsets) - 1
+
+    def __getitem__(self, index: int) -> str:
+
+        if not (-len(self) <= index < len(self)):
+            raise IndexError(index)
+
+        index %= len(self)
+
+        return self._text[self._offsets[index]:self._offsets[index+1]].tobytes().decode("UTF-8")
+
+    def __iter__(self) -> Iterator[str]:
+        for i in range(len(self)):
+            yield self[i]
+
+    def load_reviews(self, progress: Optional[Progress] = None) -> List[str]:
+        """Returns all the reviews as a list of strings"""
+
+        data = self._text.tobytes()
+        bounds = self._offsets.tolist()
+
+        if progress:
+            progress.max = len(self)
+
+        texts: List[str] = []
+
+        for i in range(len(self)):
+
+            texts.append(data[bounds[i]:bounds[i+1]].decode("UTF-8"))
+
+            if progress:
+                progress.next()
+
+        if progress:
+            progress.finish()
+
+        return texts
+
+    def load_reviews_joined(self, progress: Optional[Progress] = None) -> str:
+        """Returns all the reviews joined together into a single string, separating reviews with full stops"""
+        return ".".join(self.load_reviews(progress=progress))
+
+
+def main():
+
+    from progress.bar import IncrementalBar
+
+    pack_reviews(progress=IncrementalBar("Packing reviews"))
+
+    print(f"Packed {len(PackedReviews())} reviews into {PACKED_REVIEWS_PATH}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,46 +1,68 @@
+import hashlib
+import os
+from typing import Optional
 import numpy.typing as npt
 import numpy as np
 from pathlib import Path
 from progress.bar import IncrementalBar
-from bij_map import BijMap
-from pca import covariance_matrix, principal_components, project_to_components
-from learn import learn_word_rel_pos
-from text_source import RawTextSource
+from vocabulary import Vocabulary
+from pca import covariance_matrix, principal_components, project_to_components, truncated_principal_components
+from learn import learn_word_rel_pos_both
+from sparse_matrix import CSRMatrix
+from rel_pos_mapping import normalize_rel_pos, exp_map_rel_pos, normalize_rel_pos_sparse, exp_map_rel_pos_sparse
+from text_source import DocumentsTextSource
 from example_data.text.wikipedia_articles import load_text as load_wikipedia_text
-from example_data.text.imdb_reviews import load_reviews_joined as load_imdb_reviews_text
-from saved_models import save_matrix, save_word_indexes, ModelFilepaths
+from example_data.text.imdb_reviews import load_reviews as load_imdb_reviews
+from saved_models import save_matrix, load_matrix, save_sparse_matrix, save_word_indexes, save_bundle, save_neighbour_index, ModelBundle, ModelFilepaths
+from neighbours import NeighbourIndex
+import instrumentation
+
+
+SPARSE: bool = False
+"""Whether to keep the relative position matrices sparse, which is needed for large vocabularies. \
+Only the leading `SPARSE_COMPONENTS` principal components are found in this case"""
+
+SPARSE_COMPONENTS: int = 100
+
+MAX_LOOK_DIST: int = 20
+
+NEIGHBOUR_INDEX_COMPONENTS: int = 50
+"""The number of leading principal components of the words' projections used to find their nearest neighbours"""
+
+TEXT_LENGTH_MAX: int = 1_000_000
+"""The maximum total length of the reviews learnt from"""
+
+REPORT_FILEPATH: Optional[Path] = Path(os.environ["WORDS_ML_REPORT"]) if "WORDS_ML_REPORT" in os.environ else None
+"""Where to write a JSON report of the time and memory taken by each stage, if anywhere"""
+
+
+def save_word_neighbour_index(filepath: Path, projected: npt.NDArray) -> None:
+    index = NeighbourIndex(projected[:,:NEIGHBOUR_INDEX_COMPONENTS])
+    index.build_ivf()
+    save_neighbour_index(filepath, index)
 
 
 def create_models(
     pos_mat: npt.NDArray,
-    word_indexes: BijMap[str, int],
+    word_indexes: Vocabulary,
     data_filepath: Path,
     word_indexes_filepath: Path,
     principal_components_filepath: Path,
-    pca_filepath: Path) -> None:
+    pca_filepath: Path,
+    bundle_filepath: Path,
+    neighbour_index_filepath: Path,
+    signed: bool,
+    corpus_hash: str) -> None:
 
     save_word_indexes(word_indexes_filepath, word_indexes)
 
-    offset_pos_mat = pos_mat-np.mean(np.where(
-        pos_mat == np.inf,
-        0,
-        pos_mat
-    ))
+    # The matrix is normalized and then mapped in-place, so no other matrices of the same size are made
 
-    normalization_factor = np.max(np.where(
-        pos_mat == np.inf,
-        0,
-        np.abs(offset_pos_mat)
-    ))
-    normalized_pos_mat = offset_pos_mat/normalization_factor
+    normalized_pos_mat = normalize_rel_pos(pos_mat, out=pos_mat)
 
     save_matrix(data_filepath, normalized_pos_mat)
 
-    mapped_mat = np.where(
-        normalized_pos_mat == np.inf,
-        np.zeros_like(normalized_pos_mat),
-        np.exp(np.negative(normalized_pos_mat))
-    )
+    mapped_mat = exp_map_rel_pos(normalized_pos_mat, out=normalized_pos_mat)
 
     cov_mat_bar = IncrementalBar("Covariance Matrix")
     cov_mat = covariance_matrix(mapped_mat, progress=cov_mat_bar)
@@ -51,6 +73,47 @@ def create_models(
     projected = project_to_components(mapped_mat, prin_comps)
     save_matrix(pca_filepath, projected)
 
+    save_word_neighbour_index(neighbour_index_filepath, projected)
+
+    # The normalized matrix has since been mapped in-place, so the saved copy of it is used
+
+    saved_pos_mat = load_matrix(data_filepath, mmap_mode="r")
+    save_bundle(bundle_filepath, ModelBundle(word_indexes, saved_pos_mat, prin_comps, projected, MAX_LOOK_DIST, signed, corpus_hash))
+
+
+def create_models_sparse(
+    pos_mat: CSRMatrix,
+    word_indexes: Vocabulary,
+    data_filepath: Path,
+    word_indexes_filepath: Path,
+    principal_components_filepath: Path,
+    pca_filepath: Path,
+    bundle_filepath: Path,
+    neighbour_index_filepath: Path,
+    signed: bool,
+    corpus_hash: str,
+    n_components: int) -> None:
+
+    save_word_indexes(word_indexes_filepath, word_indexes)
+
+    normalized_pos_mat = normalize_rel_pos_sparse(pos_mat)
+
+    save_sparse_matrix(data_filepath, normalized_pos_mat)
+
+    mapped_mat = exp_map_rel_pos_sparse(normalized_pos_mat)
+
+    # The covariance matrix would be as large as the dense matrix, so the components are found from the mapped matrix directly
+
+    prin_comps = truncated_principal_components(mapped_mat, min(n_components, mapped_mat.shape[1]))
+    save_matrix(principal_components_filepath, prin_comps)
+
+    projected = project_to_components(mapped_mat, prin_comps).astype(np.float32)
+    save_matrix(pca_filepath, projected)
+
+    save_word_neighbour_index(neighbour_index_filepath, projected)
+
+    save_bundle(bundle_filepath, ModelBundle(word_indexes, normalized_pos_mat, prin_comps, projected, MAX_LOOK_DIST, signed, corpus_hash))
+
 
 def main():
 
@@ -61,38 +124,101 @@ def main():
     #     "france",
     # ]]
 
-    # _fulltext = ".".join(_texts)
+    # reviews = _texts
 
     text_load_progress = IncrementalBar("Loading text data")
-    _fulltext = load_imdb_reviews_text(progress=text_load_progress)[:1_000_000]
+    reviews = load_imdb_reviews(progress=text_load_progress)
+
+    review_count = int(np.searchsorted(np.cumsum([len(review) for review in reviews]), TEXT_LENGTH_MAX, side="right"))
+    reviews = reviews[:review_count]
 
-    tokenize_progress = IncrementalBar("Tokenize data")
-    text_source = RawTextSource(_fulltext, tokenize_progress=tokenize_progress)
+    corpus_hasher = hashlib.sha256()
+    for review in reviews:
+        corpus_hasher.update(review.encode("UTF-8") + b"\0")
+    corpus_hash = corpus_hasher.hexdigest()
 
-    unsigned_learn_bar = IncrementalBar("Train unsigned")
-    unsigned_pos_mat, unsigned_word_indexes = learn_word_rel_pos(text_source, max_look_dist=20, signed=False, word_count_max=1000, progress=unsigned_learn_bar)
+    # Each review is tokenized separately, so no section spans two reviews
 
-    signed_learn_bar = IncrementalBar("Train signed")
-    signed_pos_mat, signed_word_indexes = learn_word_rel_pos(text_source, max_look_dist=20, signed=True, word_count_max=1000, progress=signed_learn_bar)
+    text_source = DocumentsTextSource(reviews)
+
+    learn_bar = IncrementalBar("Train")
+    unsigned_pos_mat, signed_pos_mat, word_indexes = learn_word_rel_pos_both(
+        text_source,
+        max_look_dist=MAX_LOOK_DIST,
+        word_count_max=None if SPARSE else 1000,
+        progress=learn_bar,
+        sparse=SPARSE
+    )
+
+    if SPARSE:
+
+        assert isinstance(unsigned_pos_mat, CSRMatrix) and isinstance(signed_pos_mat, CSRMatrix)
+
+        create_models_sparse(
+            pos_mat=unsigned_pos_mat,
+            word_indexes=word_indexes,
+            data_filepath=ModelFilepaths.SPARSE_WORD_REL_POS_UNSIGNED,
+            word_indexes_filepath=ModelFilepaths.WORD_REL_POS_UNSIGNED_WORD_INDEXES,
+            principal_components_filepath=ModelFilepaths.PRINCIPAL_COMPONENTS_WORD_REL_POS_UNSIGNED,
+            pca_filepath=ModelFilepaths.PCA_WORD_REL_POS_UNSIGNED,
+            bundle_filepath=ModelFilepaths.BUNDLE_WORD_REL_POS_UNSIGNED,
+            neighbour_index_filepath=ModelFilepaths.NEIGHBOUR_INDEX_WORD_REL_POS_UNSIGNED,
+            signed=False,
+            corpus_hash=corpus_hash,
+            n_components=SPARSE_COMPONENTS
+        )
+
+        create_models_sparse(
+            pos_mat=signed_pos_mat,
+            word_indexes=word_indexes,
+            data_filepath=ModelFilepaths.SPARSE_WORD_REL_POS_SIGNED,
+            word_indexes_filepath=ModelFilepaths.WORD_REL_POS_SIGNED_WORD_INDEXES,
+            principal_components_filepath=ModelFilepaths.PRINCIPAL_COMPONENTS_WORD_REL_POS_SIGNED,
+            pca_filepath=ModelFilepaths.PCA_WORD_REL_POS_SIGNED,
+            bundle_filepath=ModelFilepaths.BUNDLE_WORD_REL_POS_SIGNED,
+            neighbour_index_filepath=ModelFilepaths.NEIGHBOUR_INDEX_WORD_REL_POS_SIGNED,
+            signed=True,
+            corpus_hash=corpus_hash,
+            n_components=SPARSE_COMPONENTS
+        )
+
+        return
+
+    assert isinstance(unsigned_pos_mat, np.ndarray) and isinstance(signed_pos_mat, np.ndarray)
 
     create_models(
         pos_mat=unsigned_pos_mat,
-        word_indexes=unsigned_word_indexes,
+        word_indexes=word_indexes,
         data_filepath=ModelFilepaths.WORD_REL_POS_UNSIGNED,
         word_indexes_filepath=ModelFilepaths.WORD_REL_POS_UNSIGNED_WORD_INDEXES,
         principal_components_filepath=ModelFilepaths.PRINCIPAL_COMPONENTS_WORD_REL_POS_UNSIGNED,
-        pca_filepath=ModelFilepaths.PCA_WORD_REL_POS_UNSIGNED
+        pca_filepath=ModelFilepaths.PCA_WORD_REL_POS_UNSIGNED,
+        bundle_filepath=ModelFilepaths.BUNDLE_WORD_REL_POS_UNSIGNED,
+        neighbour_index_filepath=ModelFilepaths.NEIGHBOUR_INDEX_WORD_REL_POS_UNSIGNED,
+        signed=False,
+        corpus_hash=corpus_hash
     )
 
     create_models(
         pos_mat=signed_pos_mat,
-        word_indexes=signed_word_indexes,
+        word_indexes=word_indexes,
         data_filepath=ModelFilepaths.WORD_REL_POS_SIGNED,
         word_indexes_filepath=ModelFilepaths.WORD_REL_POS_SIGNED_WORD_INDEXES,
         principal_components_filepath=ModelFilepaths.PRINCIPAL_COMPONENTS_WORD_REL_POS_SIGNED,
-        pca_filepath=ModelFilepaths.PCA_WORD_REL_POS_SIGNED
+        pca_filepath=ModelFilepaths.PCA_WORD_REL_POS_SIGNED,
+        bundle_filepath=ModelFilepaths.BUNDLE_WORD_REL_POS_SIGNED,
+        neighbour_index_filepath=ModelFilepaths.NEIGHBOUR_INDEX_WORD_REL_POS_SIGNED,
+        signed=True,
+        corpus_hash=corpus_hash
     )
 
 
 if __name__ == "__main__":
+
+    if REPORT_FILEPATH is not None:
+        instrumentation.enable()
+
     main()
+
+    if REPORT_FILEPATH is not None:
+        instrumentation.write_report(REPORT_FILEPATH)
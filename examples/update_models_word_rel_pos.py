@@ -0,0 +1,72 @@
+import hashlib
+import sys
+from pathlib import Path
+import numpy as np
+from learn import RelPosAccumulator
+from text_source import StreamingFileTextSource
+from saved_models import save_rel_pos_accumulator, load_rel_pos_accumulator, ModelFilepaths
+from token_cache import corpus_key
+from examples.create_models_word_rel_pos import create_models, MAX_LOOK_DIST
+
+
+WORD_COUNT_MAX: int = 1000
+
+
+def main():
+
+    # Adds the text files given to the totals accumulated so far and remakes the models from the updated totals
+
+    filepaths = [Path(arg) for arg in sys.argv[1:]]
+
+    if ModelFilepaths.REL_POS_ACCUMULATOR.is_file():
+        accumulator = load_rel_pos_accumulator(ModelFilepaths.REL_POS_ACCUMULATOR)
+    else:
+        accumulator = RelPosAccumulator(MAX_LOOK_DIST)
+
+    section_count = accumulator.section_count
+    accumulator.update(StreamingFileTextSource(filepaths))
+
+    # The hash of everything accumulated chains the previous hash with the contents of the files added
+
+    added_key = corpus_key(filepaths, hash_contents=True)
+    accumulator.corpus_hash = hashlib.sha256(f"{accumulator.corpus_hash or ''}\n{added_key}".encode("UTF-8")).hexdigest()
+
+    save_rel_pos_accumulator(ModelFilepaths.REL_POS_ACCUMULATOR, accumulator)
+
+    print(f"Added {accumulator.section_count - section_count} sections from {len(filepaths)} files, {accumulator.section_count} sections in total")
+
+    unsigned_pos_mat, signed_pos_mat, word_indexes = accumulator.matrices(word_count_max=WORD_COUNT_MAX)
+
+    assert isinstance(unsigned_pos_mat, np.ndarray) and isinstance(signed_pos_mat, np.ndarray)
+
+    corpus_hash = accumulator.corpus_hash
+
+    create_models(
+        pos_mat=unsigned_pos_mat,
+        word_indexes=word_indexes,
+        data_filepath=ModelFilepaths.WORD_REL_POS_UNSIGNED,
+        word_indexes_filepath=ModelFilepaths.WORD_REL_POS_UNSIGNED_WORD_INDEXES,
+        principal_components_filepath=ModelFilepaths.PRINCIPAL_COMPONENTS_WORD_REL_POS_UNSIGNED,
+        pca_filepath=ModelFilepaths.PCA_WORD_REL_POS_UNSIGNED,
+        bundle_filepath=ModelFilepaths.BUNDLE_WORD_REL_POS_UNSIGNED,
+        neighbour_index_filepath=ModelFilepaths.NEIGHBOUR_INDEX_WORD_REL_POS_UNSIGNED,
+        signed=False,
+        corpus_hash=corpus_hash
+    )
+
+    create_models(
+        pos_mat=signed_pos_mat,
+        word_indexes=word_indexes,
+        data_filepath=ModelFilepaths.WORD_REL_POS_SIGNED,
+        word_indexes_filepath=ModelFilepaths.WORD_REL_POS_SIGNED_WORD_INDEXES,
+        principal_components_filepath=ModelFilepaths.PRINCIPAL_COMPONENTS_WORD_REL_POS_SIGNED,
+        pca_filepath=ModelFilepaths.PCA_WORD_REL_POS_SIGNED,
+        bundle_filepath=ModelFilepaths.BUNDLE_WORD_REL_POS_SIGNED,
+        neighbour_index_filepath=ModelFilepaths.NEIGHBOUR_INDEX_WORD_REL_POS_SIGNED,
+        signed=True,
+        corpus_hash=corpus_hash
+    )
+
+
+if __name__ == "__main__":
+    main()
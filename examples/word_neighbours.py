@@ -0,0 +1,18 @@
+import sys
+from saved_models import load_neighbour_index, load_word_indexes, ModelFilepaths
+from neighbours import nearest_words
+
+
+def main():
+
+    index = load_neighbour_index(ModelFilepaths.NEIGHBOUR_INDEX_WORD_REL_POS_UNSIGNED)
+    word_indexes = load_word_indexes(ModelFilepaths.WORD_REL_POS_UNSIGNED_WORD_INDEXES)
+
+    words = [word for word in sys.argv[1:] if word in word_indexes] or ["good", "bad", "film"]
+
+    for word, neighbours in zip(words, nearest_words(index, word_indexes, words, 10, approximate=True)):
+        print(f"{word}: " + ", ".join(f"{neighbour} ({similarity:.2f})" for neighbour, similarity in neighbours))
+
+
+if __name__ == "__main__":
+    main()
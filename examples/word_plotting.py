@@ -13,8 +13,7 @@ def main():
 
     ax.scatter(data[:,0], data[:,1])
 
-    for i in islice(word_indexes.iterate_from(), 1000):
-        word = word_indexes.get_from(i)
+    for i, word in enumerate(islice(word_indexes, 1000)):
         ax.annotate(word, (data[i,0],data[i,1]))
 
     plt.show()
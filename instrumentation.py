@@ -0,0 +1,308 @@
+from typing import Any, Callable, Dict, List, Optional, TypeVar, cast
+from functools import wraps
+from pathlib import Path
+from time import perf_counter
+import json
+import os
+import sys
+import threading
+
+
+_DEFAULT_SAMPLE_INTERVAL: float = 0.01
+"""The default time, in seconds, between samples of the memory used"""
+
+_F = TypeVar("_F", bound=Callable[..., Any])
+
+
+def _current_rss() -> int:
+    """Returns the resident memory of the process in bytes. Where this can't be read, the peak resident memory so far is returned instead, or 0 where neither can be read"""
+
+    try:
+        with open("/proc/self/statm", "rb") as file:
+            return int(file.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError, AttributeError):
+        pass
+
+    # The resource module is only available on Unix
+
+    try:
+        import resource
+    except ImportError:
+        return 0
+
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+class _SpanTotals:
+    """The totals of every run of spans with the same path"""
+
+    def __init__(self):
+        self.calls: int = 0
+        self.seconds: float = 0
+        self.max_seconds: float = 0
+        self.peak_rss: int = 0
+        self.counters: Dict[str, float] = {}
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "calls": self.calls,
+            "seconds": self.seconds,
+            "max_seconds": self.max_seconds,
+            "peak_rss_mb": self.peak_rss / 1e6,
+            "counters": dict(self.counters),
+            "rates": { f"{name}_per_s": value / self.seconds for name, value in self.counters.items() if self.seconds > 0 },
+        }
+
+
+class _ActiveSpan:
+
+    def __init__(self, path: str, start: float, rss: int):
+        self.path = path
+        self.start = start
+        self.peak_rss = rss
+        self.counters: Dict[str, float] = {}
+
+
+class _Recorder:
+    """Records the spans and counters of a run. Spans are nested separately in each thread. Memory is sampled by a background thread"""
+
+    def __init__(self, sample_interval: Optional[float]):
+
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._totals: Dict[str, _SpanTotals] = {}
+        self._active: List[_ActiveSpan] = []
+        self._start = perf_counter()
+        self._peak_rss = _current_rss()
+
+        self._stop = threading.Event()
+        self._sampler: Optional[threading.Thread] = None
+
+        if sample_interval is not None:
+            self._sampler = threading.Thread(target=self.__sample, args=(sample_interval,), name="instrumentation-sampler", daemon=True)
+            self._sampler.start()
+
+    def __sample(self, interval: float) -> None:
+        while not self._stop.wait(interval):
+            self.__record_rss(_current_rss())
+
+    def __record_rss(self, rss: int) -> None:
+        with self._lock:
+            self._peak_rss = max(self._peak_rss, rss)
+            for span in self._active:
+                span.peak_rss = max(span.peak_rss, rss)
+
+    def __stack(self) -> List[_ActiveSpan]:
+        stack = getattr(self._local, "stack", None)
+        if stack is None:
+            stack = self._local.stack = []
+        return stack
+
+    def enter(self, name: str) -> _ActiveSpan:
+
+        stack = self.__stack()
+        path = f"{stack[-1].path}/{name}" if stack else name
+        rss = _current_rss()
+
+        span = _ActiveSpan(path, perf_counter(), rss)
+        stack.append(span)
+
+        with self._lock:
+            self._active.append(span)
+            self._peak_rss = max(self._peak_rss, rss)
+
+        return span
+
+    def exit(self, span: _ActiveSpan) -> None:
+
+        seconds = perf_counter() - span.start
+        self.__record_rss(_current_rss())
+
+        stack = self.__stack()
+        stack.remove(span)
+
+        with self._lock:
+
+            self._active.remove(span)
+
+            totals = self._totals.get(span.path)
+            if totals is None:
+                totals = self._totals[span.path] = _SpanTotals()
+
+            totals.calls += 1
+            totals.seconds += seconds
+            totals.max_seconds = max(totals.max_seconds, seconds)
+            totals.peak_rss = max(totals.peak_rss, span.peak_rss)
+
+            for name, value in span.counters.items():
+                totals.counters[name] = totals.counters.get(name, 0) + value
+
+    def count(self, name: str, amount: float) -> None:
+        """Adds to a counter of the innermost span of the current thread. Counts made outside of any span are kept under the path "" """
+
+        stack = self.__stack()
+
+        if stack:
+            counters = stack[-1].counters
+            counters[name] = counters.get(name, 0) + amount
+        else:
+            with self._lock:
+                totals = self._totals.get("")
+                if totals is None:
+                    totals = self._totals[""] = _SpanTotals()
+                totals.counters[name] = totals.counters.get(name, 0) + amount
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._sampler is not None:
+            self._sampler.join()
+
+    def report(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "wall_seconds": perf_counter() - self._start,
+                "peak_rss_mb": max(self._peak_rss, _current_rss()) / 1e6,
+                "spans": { path: totals.to_dict() for path, totals in sorted(self._totals.items()) },
+            }
+
+
+_recorder: Optional[_Recorder] = None
+"""The recorder of the current run, or None when instrumentation is disabled"""
+
+
+def enable(sample_interval: Optional[float] = _DEFAULT_SAMPLE_INTERVAL) -> None:
+    """Starts recording spans and counters, discarding anything recorded before.
+
+Parameters:
+
+    sample_interval (optional) - the time, in seconds, between samples of the memory used, which give the peak memory of each span. \
+If None, memory is only measured when spans start and end
+
+Only the current process is instrumented, so work done by worker processes is only seen as the time that the spans around it take.
+"""
+
+    global _recorder
+
+    disable()
+    _recorder = _Recorder(sample_interval)
+
+
+def disable() -> Optional[Dict[str, Any]]:
+    """Stops recording. Returns the report of what was recorded, or None if instrumentation wasn't enabled"""
+
+    global _recorder
+
+    if _recorder is None:
+        return None
+
+    recorder = _recorder
+    _recorder = None
+
+    recorder.stop()
+
+    return recorder.report()
+
+
+def is_enabled() -> bool:
+    return _recorder is not None
+
+
+class _Span:
+
+    __slots__ = ("_name", "_recorder", "_span")
+
+    def __init__(self, name: str, recorder: _Recorder):
+        self._name = name
+        self._recorder = recorder
+        self._span: Optional[_ActiveSpan] = None
+
+    def __enter__(self) -> None:
+        self._span = self._recorder.enter(self._name)
+
+    def __exit__(self, *_: Any) -> None:
+        if self._span is not None:
+            self._recorder.exit(self._span)
+            self._span = None
+
+
+class _NullSpan:
+
+    def __enter__(self) -> None:
+        pass
+
+    def __exit__(self, *_: Any) -> None:
+        pass
+
+
+_NULL_SPAN: _NullSpan = _NullSpan()
+
+
+def span(name: str) -> Any:
+    """Returns a context manager which times the code run within it as a span with the given name. \
+Spans started within other spans are recorded under the path of their outer spans, such as "learn_word_rel_pos/covariance_matrix". \
+When instrumentation is disabled, this does nothing"""
+
+    recorder = _recorder
+
+    if recorder is None:
+        return _NULL_SPAN
+
+    return _Span(name, recorder)
+
+
+def count(name: str, amount: float = 1) -> None:
+    """Adds to a named counter of the current span, such as the number of tokens processed. \
+The report gives each counter's rate over the time of its span as well as its total. When instrumentation is disabled, this does nothing"""
+
+    recorder = _recorder
+
+    if recorder is not None:
+        recorder.count(name, amount)
+
+
+def instrumented(name: str) -> Callable[[_F], _F]:
+    """A decorator which runs each call of a function as a span with the given name. When instrumentation is disabled, the function is just called"""
+
+    def decorator(function: _F) -> _F:
+
+        @wraps(function)
+        def wrapper(*args: Any, **kwargs: Any) -> Any:
+
+            recorder = _recorder
+
+            if recorder is None:
+                return function(*args, **kwargs)
+
+            active = recorder.enter(name)
+            try:
+                return function(*args, **kwargs)
+            finally:
+                recorder.exit(active)
+
+        return cast(_F, wrapper)
+
+    return decorator
+
+
+def report() -> Optional[Dict[str, Any]]:
+    """Returns what has been recorded so far, or None if instrumentation isn't enabled.
+
+The report has the total wall time and peak resident memory since instrumentation was enabled and, for each span path, \
+the number of calls, the total and longest time, the peak resident memory while the span ran, the counters and the counters' rates per second.
+"""
+
+    recorder = _recorder
+
+    return None if recorder is None else recorder.report()
+
+
+def write_report(filepath: Path) -> None:
+    """Writes the report of what has been recorded so far to a JSON file"""
+
+    run_report = report()
+
+    if run_report is None:
+        raise ValueError("Instrumentation isn't enabled")
+
+    filepath.write_text(json.dumps(run_report, indent=2))
@@ -1,18 +1,448 @@
-from typing import Tuple, Set, DefaultDict, Optional, List
-from collections import defaultdict
+from typing import Tuple, Optional, List, Dict, Union
+from concurrent.futures import ProcessPoolExecutor, Future, wait, FIRST_COMPLETED, ALL_COMPLETED
 import numpy as np
 import numpy.typing as npt
 from progress import Progress
-from bij_map import BijMap
+from vocabulary import Vocabulary
 from text_source import ITextSource
+from tokenizing import section_batches
+from sparse_matrix import CSRMatrix
 from check import check
+from instrumentation import instrumented, count
 
 
+_BATCH_TOKENS: int = 1 << 18
+"""Approximate number of tokens whose word pairs are gathered together before being added to the running totals"""
+
+_DENSE_MAX_CELLS: int = 1 << 24
+"""The largest number of cells (vocabulary size squared) that pair totals will be accumulated densely for. Larger vocabularies are accumulated sparsely"""
+
+_COMPACT_MIN_PAIRS: int = 1 << 20
+"""The fewest pending pairs that sparse pair totals are merged into their stored totals for"""
+
+_SHARD_MIN_TOKENS: int = 1 << 16
+"""The fewest tokens given to a worker process at once when accumulating in parallel, so that small batches from the text source aren't split into shards too small to be worth sending to another process"""
+
+
+class _PairTotals:
+    """Running totals of the number of occurences and total distance of ordered pairs of word IDs.
+
+Only pairs where the second word comes after the first are stored. The totals for the other direction are recovered from these when the output is built.
+
+Sparse totals are keyed by `first << 32 | second`, which doesn't depend on the number of word IDs, so they can grow without re-keying the stored pairs. \
+New pairs are appended to a list of pending totals which are only merged into the sorted stored totals once they are as many as the stored ones, \
+so each pair is only merged a logarithmic number of times however many batches are added.
+"""
+
+    def __init__(self, size: int, dense: Optional[bool] = None):
+        """Parameters:
+
+    size - the number of word IDs
+
+    dense (optional) - whether to store a total for every possible pair. Defaults to storing them densely when there are at most `_DENSE_MAX_CELLS` possible pairs
+"""
+
+        self._size = size
+        self._dense = (size * size <= _DENSE_MAX_CELLS) if dense is None else dense
+
+        if self._dense:
+            self._counts = np.zeros(shape=(size*size,), dtype=np.int64)
+            self._dists = np.zeros(shape=(size*size,), dtype=np.int64)
+        else:
+            self._keys = np.zeros(shape=(0,), dtype=np.int64)
+            self._counts = np.zeros(shape=(0,), dtype=np.int64)
+            self._dists = np.zeros(shape=(0,), dtype=np.int64)
+            self._pending: List[Tuple[npt.NDArray[np.int64], npt.NDArray[np.int64], npt.NDArray[np.int64]]] = []
+            self._pending_length = 0
+
+    @property
+    def size(self) -> int:
+        """The number of word IDs"""
+        return self._size
+
+    def keys_of(self, firsts: npt.NDArray[np.int64], seconds: npt.NDArray[np.int64]) -> npt.NDArray[np.int64]:
+        """Returns the pair keys of pairs of word IDs, as taken by `add` and `add_totals`"""
+
+        if self._dense:
+            return firsts*self._size + seconds
+        else:
+            return (firsts << 32) | seconds
+
+    def add(self, keys: npt.NDArray[np.int64], dists: npt.NDArray[np.int64]) -> None:
+        """Adds a single occurence of each pair key with its corresponding distance"""
+
+        if self._dense:
+            self._counts += np.bincount(keys, minlength=self._size*self._size)
+            self._dists += np.bincount(keys, weights=dists, minlength=self._size*self._size).astype(np.int64)
+        else:
+            self.__add_reduced(keys, np.ones_like(keys), dists)
+
+    def add_totals(self,
+                   keys: npt.NDArray[np.int64],
+                   counts: npt.NDArray[np.int64],
+                   dists: npt.NDArray[np.int64]) -> None:
+        """Adds already-totalled counts and total distances of pair keys, which may repeat"""
+
+        if self._dense:
+            self._counts += np.bincount(keys, weights=counts, minlength=self._size*self._size).astype(np.int64)
+            self._dists += np.bincount(keys, weights=dists, minlength=self._size*self._size).astype(np.int64)
+        else:
+            self.__add_reduced(keys, counts, dists)
+
+    def add_items(self,
+                  firsts: npt.NDArray[np.int64],
+                  seconds: npt.NDArray[np.int64],
+                  counts: npt.NDArray[np.int64],
+                  dists: npt.NDArray[np.int64]) -> None:
+        """Adds the totals of pairs given as returned by `items`, where each pair occurs at most once"""
+
+        keys = self.keys_of(firsts, seconds)
+
+        if self._dense:
+            self._counts[keys] += counts
+            self._dists[keys] += dists
+        else:
+            self.__add_reduced(keys, counts, dists)
+
+    def resize(self, size: int) -> None:
+        """Increases the number of word IDs, keeping the existing totals. \
+Sparse totals are keyed independently of the number of word IDs so this is immediate for them, \
+while dense totals are copied into totals of the new size, which are sparse if the new size is too large to store densely"""
+
+        if size < self._size:
+            raise ValueError(size)
+
+        if size == self._size:
+            return
+
+        if not self._dense:
+            self._size = size
+            return
+
+        resized = _PairTotals(size)
+        resized.add_items(*self.items())
+
+        self._size = resized._size
+        self._dense = resized._dense
+        self._counts = resized._counts
+        self._dists = resized._dists
+
+        if not self._dense:
+            self._keys = resized._keys
+            self._pending = resized._pending
+            self._pending_length = resized._pending_length
+
+    def __add_reduced(self,
+                      keys: npt.NDArray[np.int64],
+                      counts: npt.NDArray[np.int64],
+                      dists: npt.NDArray[np.int64]) -> None:
+        """Adds totals to the sparse totals. The new totals are reduced and left pending until there are enough of them to be worth merging into the stored totals"""
+
+        keys, counts, dists = _reduce_keys(keys, counts, dists)
+
+        self._pending.append((keys, counts, dists))
+        self._pending_length += len(keys)
+
+        if self._pending_length >= max(len(self._keys), _COMPACT_MIN_PAIRS):
+            self.__compact()
+
+    def __compact(self) -> None:
+        """Merges the pending sparse totals into the stored totals"""
+
+        if not self._pending:
+            return
+
+        pending_keys, pending_counts, pending_dists = zip(*self._pending)
+
+        self._keys, self._counts, self._dists = _reduce_keys(
+            np.concatenate((self._keys,) + pending_keys),
+            np.concatenate((self._counts,) + pending_counts),
+            np.concatenate((self._dists,) + pending_dists)
+        )
+
+        self._pending = []
+        self._pending_length = 0
+
+    def items(self) -> Tuple[npt.NDArray[np.int64], npt.NDArray[np.int64], npt.NDArray[np.int64], npt.NDArray[np.int64]]:
+        """Returns the first word IDs, second word IDs, counts and total distances of all the pairs that have occured"""
+
+        if self._dense:
+            keys = np.flatnonzero(self._counts)
+            return keys // self._size, keys % self._size, self._counts[keys], self._dists[keys]
+        else:
+            self.__compact()
+            return self._keys >> 32, self._keys & 0xFFFFFFFF, self._counts, self._dists
+
+
+def _reduce_keys(keys: npt.NDArray[np.int64],
+                 *values: npt.NDArray[np.int64]) -> Tuple[npt.NDArray[np.int64], ...]:
+    """Sums together the values with matching keys. Returns the sorted unique keys followed by the summed values for each"""
+
+    unique_keys, inverse = np.unique(keys, return_inverse=True)
+
+    return (unique_keys,) + tuple(
+        np.bincount(inverse, weights=vals, minlength=len(unique_keys)).astype(np.int64)
+        for vals in values
+    )
+
+
+def _accumulate_sections(totals: _PairTotals,
+                         ids: npt.NDArray[np.int32],
+                         offsets: npt.NDArray[np.int64],
+                         max_look_dist: int) -> None:
+    """Adds the forward pairs of words in some sections to the pair totals. \
+Words with a negative ID are skipped but still count towards the distances between the other words. \
+`offsets` should start at 0 and end at `len(ids)`"""
+
+    section_of = np.repeat(np.arange(len(offsets)-1), np.diff(offsets))
+    wide_ids = ids.astype(np.int64)
+    counted = wide_ids >= 0
+
+    keys: List[npt.NDArray[np.int64]] = []
+    dists: List[npt.NDArray[np.int64]] = []
+
+    for dist in range(1, min(max_look_dist, len(ids)-1)+1):
+
+        valid = (section_of[:-dist] == section_of[dist:]) & counted[:-dist] & counted[dist:]
+
+        pair_keys = totals.keys_of(wide_ids[:-dist][valid], wide_ids[dist:][valid])
+
+        keys.append(pair_keys)
+        dists.append(np.full_like(pair_keys, dist))
+
+    if keys:
+        pair_keys = np.concatenate(keys)
+        count("pairs", len(pair_keys))
+        totals.add(pair_keys, np.concatenate(dists))
+
+
+def _extend(xs: npt.NDArray, length: int, fill_value: int) -> npt.NDArray:
+    """Pads the end of a vector with a fill value so that it has a given length"""
+    return np.concatenate((xs, np.full(shape=(length-len(xs),), fill_value=fill_value, dtype=xs.dtype)))
+
+
+def _accumulate_shard(size: int,
+                      ids: npt.NDArray[np.int32],
+                      offsets: npt.NDArray[np.int64],
+                      max_look_dist: int) -> Tuple[npt.NDArray[np.int64], npt.NDArray[np.int64], npt.NDArray[np.int64], npt.NDArray[np.int64]]:
+    """Accumulates new pair totals for some sections. This is the task run by each worker process when accumulating in parallel.
+
+The totals are accumulated sparsely and only the pairs that occured are returned, as from `_PairTotals.items`, \
+so the work and the data sent back for a shard are bounded by the size of the shard rather than by the number of possible pairs"""
+
+    totals = _PairTotals(size, dense=False)
+
+    for start, stop in section_batches(offsets, _BATCH_TOKENS):
+        _accumulate_sections(
+            totals,
+            ids[offsets[start]:offsets[stop]],
+            offsets[start:stop+1] - offsets[start],
+            max_look_dist
+        )
+
+    return totals.items()
+
+
+def _symmetric_totals(totals: _PairTotals) -> Tuple[npt.NDArray[np.int64], npt.NDArray[np.int64], npt.NDArray[np.int64], npt.NDArray[np.int64]]:
+    """Converts forward pair totals into totals in both directions.
+
+Returns:
+
+    keys - sorted flattened indexes (`i*N + j`) into an NxN matrix, where N is the size of the pair totals
+
+    counts - the number of times each pair occured
+
+    unsigned_dists - the total absolute distance of each pair
+
+    signed_dists - the total distance of each pair, where distances from a word back to an earlier word are counted negatively
+"""
+
+    rows, cols, counts, dists = totals.items()
+    N = totals.size
+
+    keys, counts, unsigned_dists, signed_dists = _reduce_keys(
+        np.concatenate((rows*N + cols, cols*N + rows)),
+        np.concatenate((counts, counts)),
+        np.concatenate((dists, dists)),
+        np.concatenate((dists, np.negative(dists)))
+    )
+
+    return keys, counts, unsigned_dists, signed_dists
+
+
+def _average_matrix(keys: npt.NDArray[np.int64],
+                    counts: npt.NDArray[np.int64],
+                    dists: npt.NDArray[np.int64],
+                    N: int) -> npt.NDArray[np.float32]:
+    """Builds an NxN matrix of average distances from flattened pair totals, using infinity for pairs that never occured"""
+
+    check(bool(np.all(counts > 0)))
+
+    matrix = np.ones(shape=(N,N), dtype=np.float32) * np.inf
+    matrix.flat[keys] = dists / counts
+
+    return matrix
+
+
+def _average_sparse_matrix(keys: npt.NDArray[np.int64],
+                           counts: npt.NDArray[np.int64],
+                           dists: npt.NDArray[np.int64],
+                           N: int) -> CSRMatrix:
+    """Builds a sparse NxN matrix of average distances from flattened pair totals, where pairs that never occured are missing"""
+
+    check(bool(np.all(counts > 0)))
+
+    return CSRMatrix.from_flat_keys(keys, (dists / counts).astype(np.float32), (N,N))
+
+
+def _most_common(word_counts: npt.NDArray[np.int64], word_count_max: Optional[int]) -> npt.NDArray[np.int64]:
+    """Returns the sorted IDs of the `word_count_max` most common words, with ties broken by the lower ID, or all the IDs if `word_count_max` isn't given"""
+
+    if (word_count_max) and (word_count_max < len(word_counts)):
+        return np.sort(np.argsort(-word_counts, kind="stable")[:word_count_max])
+    else:
+        return np.arange(len(word_counts))
+
+
+def _learn_pair_totals(text_source: ITextSource,
+                       max_look_dist: int,
+                       word_count_max: Optional[int],
+                       workers: int,
+                       progress: Optional[Progress]) -> Tuple[_PairTotals, Vocabulary]:
+    """Reads a text source and accumulates the totals of the pairs of words in it.
+
+This is done in two passes over the text source. Firstly, the words are counted and the ones not being output are discarded. \
+Then the pairs are only accumulated between the remaining words, so the memory needed for the pairs is bounded by the size of the output rather than by the size of the whole vocabulary. \
+The text source is read one batch at a time, so only one batch of the text needs to be in memory at once.
+
+Returns:
+
+    totals - the forward pair totals, keyed by output index
+
+    word_indexes - the output index of each word being output
+"""
+
+    if (word_count_max) and (word_count_max < 1):
+        raise ValueError(word_count_max)
+
+    if max_look_dist <= 0:
+        raise ValueError(max_look_dist)
+
+    if workers < 1:
+        raise ValueError(workers)
+
+    # Count the words
+
+    words: List[str] = []
+    word_counts = np.zeros(shape=(0,), dtype=np.int64)
+    section_count: int = 0
+
+    for encoded in text_source.iter_section_ids():
+
+        words = encoded.words
+        section_count += encoded.section_count
+
+        word_counts = _extend(word_counts, len(words), 0)
+        word_counts += np.bincount(encoded.ids, minlength=len(words))
+
+    # Filter words used by occurence count (if requested)
+
+    considered = _most_common(word_counts, word_count_max)
+
+    word_indexes = Vocabulary(words[word_id] for word_id in considered)
+
+    # Accumulate the pairs, with the words not being output given an ID of -1
+
+    if progress:
+        progress.max = section_count
+
+    totals = _PairTotals(len(considered))
+
+    remap = np.zeros(shape=(0,), dtype=np.int32)
+    """Maps the word IDs of the text source to output indexes. \
+The text source could give different IDs when it is read again, so this is built from the words themselves"""
+
+    executor = ProcessPoolExecutor(max_workers=workers) if workers > 1 else None
+    futures: Dict[Future[Tuple[npt.NDArray[np.int64], npt.NDArray[np.int64], npt.NDArray[np.int64], npt.NDArray[np.int64]]], int] = {}
+
+    def merge_completed(return_when: str) -> None:
+        done, _ = wait(futures, return_when=return_when)
+        for future in done:
+            totals.add_items(*future.result())
+            shard_section_count = futures.pop(future)
+            if progress:
+                progress.next(shard_section_count)
+
+    try:
+
+        for encoded in text_source.iter_section_ids():
+
+            if len(encoded.words) > len(remap):
+                remap = np.concatenate((
+                    remap,
+                    word_indexes.encode(encoded.words[len(remap):], missing=-1)
+                ))
+
+            ids = remap[encoded.ids]
+            offsets = encoded.offsets
+
+            count("tokens", len(ids))
+
+            if executor is None:
+
+                # Accumulate in batches of whole sections to bound the memory used by the gathered pairs
+
+                for start, stop in section_batches(offsets, _BATCH_TOKENS):
+
+                    _accumulate_sections(
+                        totals,
+                        ids[offsets[start]:offsets[stop]],
+                        offsets[start:stop+1] - offsets[start],
+                        max_look_dist
+                    )
+
+                    if progress:
+                        progress.next(stop-start)
+
+            else:
+
+                # Give each worker an equal share of the tokens, but no fewer than `_SHARD_MIN_TOKENS`, and sum together the totals they produce.
+                # Only a limited number of shards are left waiting so that the text source is read no faster than it is processed
+
+                shard_tokens = max(-(-len(ids) // workers), _SHARD_MIN_TOKENS)
+
+                for start, stop in section_batches(offsets, shard_tokens):
+
+                    if len(futures) >= 2*workers:
+                        merge_completed(FIRST_COMPLETED)
+
+                    future = executor.submit(
+                        _accumulate_shard,
+                        totals.size,
+                        ids[offsets[start]:offsets[stop]],
+                        offsets[start:stop+1] - offsets[start],
+                        max_look_dist
+                    )
+                    futures[future] = stop-start
+
+        if futures:
+            merge_completed(ALL_COMPLETED)
+
+    finally:
+        if executor is not None:
+            executor.shutdown(cancel_futures=True)
+
+    return totals, word_indexes
+
+
+@instrumented("learn_word_rel_pos")
 def learn_word_rel_pos(text_source: ITextSource,
                        max_look_dist: int,
                        signed: bool = False,
                        word_count_max: Optional[int] = None,
-                       progress: Optional[Progress] = None) -> Tuple[npt.NDArray[np.float32], BijMap[str, int]]:
+                       progress: Optional[Progress] = None,
+                       sparse: bool = False,
+                       workers: int = 1) -> Tuple[Union[npt.NDArray[np.float32], CSRMatrix], Vocabulary]:
     """Takes a text source and returns a large matrix of the average distances between any two words.
 
 Parameters:
@@ -24,147 +454,270 @@ Parameters:
     signed - if true, will count words before a word negatively instead of just looking at absolute distances
 
     word_count_max (optional) - if provided, this positive integer will determine the maximum number of words to include in the output. \
-The words kept will be the most common words in the texts
+The words kept will be the most common words in the texts, with ties broken by which word occurs first
+
+    progress (optional) - optional progress tracker. Will be configured so that it starts at 0 and, when the function completes, it will be finished
 
-    progress (optional) - optional progress tracker. Will be configured so that it starts at 0 and, when the function completes, it will be finished. \
-To acheive this, it may be set to have, for example, half of it dedicated to the first half of the function and half to the other, even if one half is much \
-faster than the other.
+    sparse (optional) - if true, the matrix is returned as a `CSRMatrix` where pairs of words that never occur near each other are missing, instead of a dense matrix. \
+Most pairs of words in a large vocabulary never occur near each other, so this uses much less memory
+
+    workers (optional) - the number of processes to accumulate the word pairs with. The sections of the text are split evenly between the processes, \
+in shards of at least `_SHARD_MIN_TOKENS` tokens. Defaults to accumulating in the current process
 
 Returns:
 
     matrix - an NxN matrix describing the average distance from one word to another. \
-The value `matrix[i,j]` gives you the average distance from an instance of word i to an instance of word j
+The value `matrix[i,j]` gives you the average distance from an instance of word i to an instance of word j. \
+If words i and j never occur near each other then this is infinity, or missing for a sparse matrix
 
-    words - a vector of N strings describing which words correspond to which indexes in the matrix
+    words - a vocabulary of N words describing which words correspond to which indexes in the matrix. Words are indexed in order of first occurence
 """
 
-    if (word_count_max) and (word_count_max < 1):
-        raise ValueError(word_count_max)
+    totals, word_indexes = _learn_pair_totals(text_source, max_look_dist, word_count_max, workers, progress)
 
-    if max_look_dist <= 0:
-        raise ValueError(max_look_dist)
+    keys, counts, unsigned_dists, signed_dists = _symmetric_totals(totals)
 
-    discovered_words: Set[str] = set()
-    """All the words discovered so far"""
+    average = _average_sparse_matrix if sparse else _average_matrix
+    matrix = average(keys, counts, signed_dists if signed else unsigned_dists, word_indexes.size)
+
+    if progress:
+        progress.finish()
+
+    return matrix, word_indexes
 
-    tot_dists: DefaultDict[Tuple[str, str], int] = defaultdict(lambda: 0)
-    """Dictionary mapping pairs of words to the total distance found from the first word of the pair to the second so far"""
 
-    word_occurence_counts: DefaultDict[str, int] = defaultdict(lambda: 0)
-    """Dictionary mapping words to the number of occurences of the word"""
+@instrumented("learn_word_rel_pos_both")
+def learn_word_rel_pos_both(text_source: ITextSource,
+                            max_look_dist: int,
+                            word_count_max: Optional[int] = None,
+                            progress: Optional[Progress] = None,
+                            sparse: bool = False,
+                            workers: int = 1) -> Tuple[Union[npt.NDArray[np.float32], CSRMatrix], Union[npt.NDArray[np.float32], CSRMatrix], Vocabulary]:
+    """Like `learn_word_rel_pos` but returns both the unsigned and the signed matrices, having only read the text source once.
 
-    pair_occurence_counts: DefaultDict[Tuple[str, str], int] = defaultdict(lambda: 0)
-    """Dictionary mapping pairs of words to the number of times that they've occured near each other"""
+The pair counts are the same for both matrices so only the total distances differ between them. \
+If `sparse` is true then both matrices are sparse and have the same stored entries.
+
+Returns:
+
+    unsigned_matrix - the matrix that `learn_word_rel_pos` gives with `signed=False`
+
+    signed_matrix - the matrix that `learn_word_rel_pos` gives with `signed=True`
+
+    words - the words corresponding to the indexes of both matrices
+"""
 
-    _sections = text_source.read_all_sections()
+    totals, word_indexes = _learn_pair_totals(text_source, max_look_dist, word_count_max, workers, progress)
+
+    keys, counts, unsigned_dists, signed_dists = _symmetric_totals(totals)
+
+    average = _average_sparse_matrix if sparse else _average_matrix
+    unsigned_matrix = average(keys, counts, unsigned_dists, word_indexes.size)
+    signed_matrix = average(keys, counts, signed_dists, word_indexes.size)
 
     if progress:
-        progress.max = len(_sections)*2
+        progress.finish()
 
-    for section in _sections:
+    return unsigned_matrix, signed_matrix, word_indexes
 
-        for main_index in range(0, len(section)):
 
-            curr_word: str = section[main_index].word
-            if curr_word not in discovered_words:
-                discovered_words.add(curr_word)
-            word_occurence_counts[curr_word] += 1
+class RelPosAccumulator:
+    """Running totals of the words and word pairs of a growing collection of texts, from which the relative position matrices can be made at any time.
 
-            for search_index in range(
-                max(0, main_index-max_look_dist),
-                min(main_index+max_look_dist+1, len(section))
-            ):
+Unlike `learn_word_rel_pos`, which only returns the averages, this keeps the number of occurences and total distance of every pair of words within `max_look_dist` of each other. \
+New texts can then be added with `update`, or totals accumulated separately can be combined with `merge`, in time proportional to the new text rather than to everything accumulated so far.
 
-                if search_index == main_index:
-                    continue
+The totals are kept for every word seen, so that the most common words can be chosen when the matrices are made. \
+Most pairs of words in a large vocabulary never occur near each other so only the pairs that have occured are stored.
+"""
 
-                search_word: str = section[search_index].word
-                if search_word not in discovered_words:
-                    discovered_words.add(search_word)
+    def __init__(self, max_look_dist: int, corpus_hash: Optional[str] = None):
+        """Parameters:
 
-                pair: Tuple[str, str] = (curr_word, search_word)
-                pair_occurence_counts[pair] += 1
-                tot_dists[pair] += (search_index-main_index) if signed else abs(search_index-main_index)
+    max_look_dist - a positive integer describing the maximum distance to search from one word to look for nearby words in either direction
 
-        if progress:
-            progress.next()
+    corpus_hash (optional) - a hash identifying the texts accumulated. This isn't changed by `update` or `merge`, \
+so it is up to the caller to set it to a new hash as texts are added
+"""
 
-    # Checks for development
+        if max_look_dist <= 0:
+            raise ValueError(max_look_dist)
+
+        self._max_look_dist = max_look_dist
+        self.corpus_hash = corpus_hash
+        self._vocabulary = Vocabulary()
+        self._word_counts = np.zeros(shape=(0,), dtype=np.int64)
+        self._section_count = 0
+
+        # The totals are always sparse so that growing the vocabulary never copies them
+
+        self._totals = _PairTotals(0, dense=False)
+
+    @classmethod
+    def from_totals(cls,
+                    max_look_dist: int,
+                    vocabulary: Vocabulary,
+                    word_counts: npt.NDArray[np.int64],
+                    section_count: int,
+                    firsts: npt.NDArray[np.integer],
+                    seconds: npt.NDArray[np.integer],
+                    counts: npt.NDArray[np.int64],
+                    dists: npt.NDArray[np.int64],
+                    corpus_hash: Optional[str] = None) -> "RelPosAccumulator":
+        """Makes an accumulator from totals previously given by `pair_totals` and the other properties of an accumulator"""
 
-    check(all([(a in discovered_words) and (b in discovered_words) for (a,b) in tot_dists.keys()]))
+        if len(word_counts) != len(vocabulary):
+            raise ValueError("There should be a word count for each word of the vocabulary")
 
-    check(all([(a in discovered_words) and (b in discovered_words) for (a,b) in pair_occurence_counts.keys()]))
+        if not (len(firsts) == len(seconds) == len(counts) == len(dists)):
+            raise ValueError("The pair totals should all have the same length")
 
-    check(all([pair_occurence_counts[(a,b)] == pair_occurence_counts[(b,a)] for (a,b) in pair_occurence_counts.keys()]))
+        accumulator = cls(max_look_dist, corpus_hash)
+        accumulator._vocabulary = Vocabulary(vocabulary)
+        accumulator._word_counts = np.array(word_counts, dtype=np.int64)
+        accumulator._section_count = section_count
 
-    check(all([pair_occurence_counts[(a,b)] == pair_occurence_counts[(b,a)] for (a,b) in pair_occurence_counts.keys()]))
+        accumulator._totals = _PairTotals(len(vocabulary), dense=False)
+        accumulator._totals.add_items(
+            np.asarray(firsts, dtype=np.int64),
+            np.asarray(seconds, dtype=np.int64),
+            np.asarray(counts, dtype=np.int64),
+            np.asarray(dists, dtype=np.int64)
+        )
 
-    # Filter words used by occurence count (if requested)
+        return accumulator
 
-    considered_words: Set[str]
+    @property
+    def max_look_dist(self) -> int:
+        return self._max_look_dist
 
-    if (word_count_max) and (word_count_max < len(discovered_words)):
+    @property
+    def vocabulary(self) -> Vocabulary:
+        """Every word seen so far, in order of first occurence. This shouldn't be modified"""
+        return self._vocabulary
 
-        considered_words = set(sorted(discovered_words, key=lambda w: word_occurence_counts[w], reverse=True)[:word_count_max])
+    @property
+    def word_counts(self) -> npt.NDArray[np.int64]:
+        """The number of occurences of each word of the vocabulary"""
+        return self._word_counts
 
-    else:
+    @property
+    def section_count(self) -> int:
+        return self._section_count
 
-        considered_words = discovered_words
+    def pair_totals(self) -> Tuple[npt.NDArray[np.int64], npt.NDArray[np.int64], npt.NDArray[np.int64], npt.NDArray[np.int64]]:
+        """Returns the first word indexes, second word indexes, counts and total distances of all the pairs of words that have occured, where the second word came after the first"""
+        return self._totals.items()
 
-    # Construct output arrays
+    def __grow(self, size: int) -> None:
+        self._word_counts = _extend(self._word_counts, size, 0)
+        self._totals.resize(size)
 
-    N = len(considered_words)
+    @instrumented("RelPosAccumulator.update")
+    def update(self, text_source: ITextSource) -> None:
+        """Adds the words and word pairs of a text source to the totals. The text source is read once, one batch at a time"""
 
-    matrix = np.ones(shape=(N,N), dtype=np.float32) * np.inf
-    word_indexes = BijMap[str, int]()
-    word_indexes_index: int = 0
+        remap = np.zeros(shape=(0,), dtype=np.int32)
+        """Maps the word IDs of the text source to indexes of the vocabulary"""
 
-    if progress:
-        progress.max = len(tot_dists)*2
-        progress.start()  # Reset
-        progress.next(len(tot_dists))  # Move to halfway
+        for encoded in text_source.iter_section_ids():
 
-    for pair in tot_dists:
+            if len(encoded.words) > len(remap):
+                remap = np.concatenate((
+                    remap,
+                    np.array([self._vocabulary.add(word) for word in encoded.words[len(remap):]], dtype=np.int32)
+                ))
+                self.__grow(len(self._vocabulary))
 
-        word_1, word_2 = pair
+            ids = remap[encoded.ids]
+            offsets = encoded.offsets
 
-        # Only use words meant to be included
-        if (word_1 not in considered_words) or (word_2 not in considered_words):
-            continue
+            count("tokens", len(ids))
 
-        # Add word if they weren't there before
+            self._word_counts += np.bincount(ids, minlength=len(self._vocabulary))
+            self._section_count += encoded.section_count
 
-        if word_indexes.to_contains(word_1):
-            word_index_1 = word_indexes.get_to(word_1)
-        else:
-            word_index_1 = word_indexes_index
-            word_indexes_index += 1
-            word_indexes.set_to(word_1, word_index_1)
+            for start, stop in section_batches(offsets, _BATCH_TOKENS):
+                _accumulate_sections(
+                    self._totals,
+                    ids[offsets[start]:offsets[stop]],
+                    offsets[start:stop+1] - offsets[start],
+                    self._max_look_dist
+                )
 
-        if word_indexes.to_contains(word_2):
-            word_index_2 = word_indexes.get_to(word_2)
-        else:
-            word_index_2 = word_indexes_index
-            word_indexes_index += 1
-            word_indexes.set_to(word_2, word_index_2)
+    def merge(self, other: "RelPosAccumulator") -> None:
+        """Adds the totals of another accumulator, such as one that accumulated different texts in another process, to these totals. \
+The words of the other accumulator that haven't been seen are added to the end of the vocabulary"""
 
-        # Insert the pair's value
+        if other.max_look_dist != self._max_look_dist:
+            raise ValueError("Accumulators with different maximum look distances can't be merged")
 
-        tot = tot_dists[pair]
-        num = pair_occurence_counts[pair]
+        remap = np.array([self._vocabulary.add(word) for word in other.vocabulary], dtype=np.int64)
+        self.__grow(len(self._vocabulary))
 
-        avg_dist = tot / num
+        firsts, seconds, counts, dists = other.pair_totals()
 
-        matrix[word_index_1,word_index_2] = avg_dist
+        self._word_counts[remap] += other.word_counts
+        self._section_count += other.section_count
+        self._totals.add_totals(self._totals.keys_of(remap[firsts], remap[seconds]), counts, dists)
 
-        # Update progress
+    def __output_totals(self, word_count_max: Optional[int]) -> Tuple[_PairTotals, Vocabulary]:
+        """Returns the pair totals of only the words being output, keyed by output index, and the vocabulary of those words"""
 
-        if progress:
-            progress.next()
+        considered = _most_common(self._word_counts, word_count_max)
 
-    if progress:
-        progress.finish()
+        output_indexes = np.full(shape=(len(self._vocabulary),), fill_value=-1, dtype=np.int64)
+        output_indexes[considered] = np.arange(len(considered))
 
-    # Return outputs
+        firsts, seconds, counts, dists = self._totals.items()
+        firsts, seconds = output_indexes[firsts], output_indexes[seconds]
+        kept = (firsts >= 0) & (seconds >= 0)
 
-    return matrix, word_indexes
+        totals = _PairTotals(len(considered))
+        totals.add_totals(totals.keys_of(firsts[kept], seconds[kept]), counts[kept], dists[kept])
+
+        return totals, Vocabulary(self._vocabulary.decode(considered))
+
+    def matrix(self,
+               signed: bool = False,
+               word_count_max: Optional[int] = None,
+               sparse: bool = False) -> Tuple[Union[npt.NDArray[np.float32], CSRMatrix], Vocabulary]:
+        """Makes the matrix of average distances between words from the totals so far. \
+This is the same as `learn_word_rel_pos` gives for all the texts accumulated, when each text ends at the end of a section.
+
+Parameters:
+
+    signed (optional) - if true, will count words before a word negatively instead of just looking at absolute distances
+
+    word_count_max (optional) - if provided, the maximum number of words to include in the output. \
+The words kept will be the most common words, with ties broken by which word occured first
+
+    sparse (optional) - if true, the matrix is returned as a `CSRMatrix` where pairs of words that never occur near each other are missing
+
+Returns:
+
+    matrix - an NxN matrix describing the average distance from one word to another, as `learn_word_rel_pos` returns
+
+    words - a vocabulary of the N words corresponding to the indexes of the matrix
+"""
+
+        totals, word_indexes = self.__output_totals(word_count_max)
+
+        keys, counts, unsigned_dists, signed_dists = _symmetric_totals(totals)
+
+        average = _average_sparse_matrix if sparse else _average_matrix
+
+        return average(keys, counts, signed_dists if signed else unsigned_dists, word_indexes.size), word_indexes
+
+    def matrices(self,
+                 word_count_max: Optional[int] = None,
+                 sparse: bool = False) -> Tuple[Union[npt.NDArray[np.float32], CSRMatrix], Union[npt.NDArray[np.float32], CSRMatrix], Vocabulary]:
+        """Like `matrix` but makes both the unsigned and the signed matrices, as `learn_word_rel_pos_both` returns"""
+
+        totals, word_indexes = self.__output_totals(word_count_max)
+
+        keys, counts, unsigned_dists, signed_dists = _symmetric_totals(totals)
+
+        average = _average_sparse_matrix if sparse else _average_matrix
+
+        return average(keys, counts, unsigned_dists, word_indexes.size), average(keys, counts, signed_dists, word_indexes.size), word_indexes
@@ -0,0 +1,332 @@
+from typing import List, Literal, Optional, Tuple
+import numpy as np
+import numpy.typing as npt
+from check import check_is_mat
+from vocabulary import Vocabulary
+
+
+Metric = Literal["cosine", "euclidean"]
+
+
+_QUERY_CHUNK_CELLS: int = 1 << 22
+"""The approximate number of query-to-vector scores that are made at once when querying exactly"""
+
+_DEFAULT_PROBES: int = 8
+
+
+class IVFLists:
+    """The inverted file (IVF) lists of an approximate neighbour index. Each indexed vector is put in the list of its nearest centroid
+
+Attributes:
+
+    centroids - an LxD array of the centroid of each list
+
+    offsets - an (L+1)-vector where the members of list `i` are `members[offsets[i]:offsets[i+1]]`
+
+    members - the indexes of the vectors in each list, concatenated
+"""
+
+    def __init__(self,
+                 centroids: npt.NDArray[np.float32],
+                 offsets: npt.NDArray[np.int64],
+                 members: npt.NDArray[np.int64]):
+
+        self.centroids = centroids
+        self.offsets = offsets
+        self.members = members
+
+    @property
+    def list_count(self) -> int:
+        return len(self.centroids)
+
+
+def _top_k(scores: npt.NDArray, k: int) -> npt.NDArray[np.int64]:
+    """Returns the positions of the k largest scores of each row, in decreasing order of score"""
+
+    if k < scores.shape[1]:
+        candidates = np.argpartition(-scores, k-1, axis=1)[:,:k]
+    else:
+        candidates = np.broadcast_to(np.arange(scores.shape[1]), scores.shape)
+
+    order = np.argsort(-np.take_along_axis(scores, candidates, axis=1), axis=1, kind="stable")
+
+    return np.take_along_axis(candidates, order, axis=1)
+
+
+def _normalized_rows(xs: npt.NDArray) -> npt.NDArray[np.float32]:
+    norms = np.linalg.norm(xs, axis=1, keepdims=True)
+    return (xs / np.where(norms == 0, 1, norms)).astype(np.float32)
+
+
+class NeighbourIndex:
+    """An index of vectors, such as the PCA projections of words, for finding the nearest of them to query vectors.
+
+Queries can be answered exactly, by scoring every indexed vector with a matrix product, or approximately using IVF lists built with `build_ivf`. \
+Approximate queries only score the vectors in the lists whose centroids are nearest to each query.
+"""
+
+    def __init__(self,
+                 vectors: npt.NDArray,
+                 metric: Metric = "cosine",
+                 ivf: Optional[IVFLists] = None,
+                 normalized: bool = False):
+        """Parameters:
+
+    vectors - an NxD array of the vectors to index. For the cosine metric, these are normalized when the index is created
+
+    metric (optional) - how to measure how near vectors are. Either "cosine" for cosine similarity or "euclidean" for Euclidean distance
+
+    ivf (optional) - IVF lists for approximate queries, as previously built by `build_ivf` for the same vectors
+
+    normalized (optional) - whether the vectors are already normalized, as the `vectors` of a cosine index are. \
+If so, they are used as they are rather than being copied, so memory-mapped vectors stay memory-mapped
+"""
+
+        check_is_mat(vectors, "vectors should be a matrix")
+
+        if metric not in ("cosine", "euclidean"):
+            raise ValueError(metric)
+
+        self._metric: Metric = metric
+        self._vectors: npt.NDArray[np.float32] = np.asanyarray(vectors, dtype=np.float32) if (metric == "euclidean") or normalized else _normalized_rows(vectors)
+        self._square_norms: npt.NDArray[np.float32] = np.einsum("ij,ij->i", self._vectors, self._vectors)
+        self._ivf: Optional[IVFLists] = ivf
+
+    @property
+    def metric(self) -> Metric:
+        return self._metric
+
+    @property
+    def vectors(self) -> npt.NDArray[np.float32]:
+        """The indexed vectors, as they are stored. For the cosine metric, these are normalized"""
+        return self._vectors
+
+    @property
+    def ivf(self) -> Optional[IVFLists]:
+        return self._ivf
+
+    def __len__(self) -> int:
+        return self._vectors.shape[0]
+
+    def build_ivf(self, list_count: Optional[int] = None, iterations: int = 10, seed: int = 0) -> None:
+        """Builds the IVF lists used for approximate queries by clustering the indexed vectors with k-means.
+
+Parameters:
+
+    list_count (optional) - the number of lists. Defaults to the square root of the number of vectors
+
+    iterations (optional) - the number of iterations of k-means
+
+    seed (optional) - the seed for choosing the starting centroids
+"""
+
+        N = len(self)
+
+        if list_count is None:
+            list_count = max(1, int(np.sqrt(N)))
+
+        if not (1 <= list_count <= max(1, N)):
+            raise ValueError(list_count)
+
+        rng = np.random.default_rng(seed)
+        centroids = self._vectors[rng.choice(N, size=list_count, replace=False)].copy() if N > 0 \
+            else np.zeros(shape=(list_count, self._vectors.shape[1]), dtype=np.float32)
+
+        assignments = np.zeros(shape=(N,), dtype=np.int64)
+
+        for _ in range(iterations):
+
+            assignments = self.__nearest_centroids(centroids)
+
+            sums = np.stack([
+                np.bincount(assignments, weights=self._vectors[:,d], minlength=list_count)
+                for d in range(self._vectors.shape[1])
+            ], axis=1)
+            sizes = np.bincount(assignments, minlength=list_count)
+
+            # Centroids without any vectors are left where they are
+
+            nonempty = sizes > 0
+            centroids[nonempty] = sums[nonempty] / sizes[nonempty,np.newaxis]
+
+            if self._metric == "cosine":
+                centroids = _normalized_rows(centroids)
+
+        assignments = self.__nearest_centroids(centroids)
+
+        offsets = np.zeros(shape=(list_count+1,), dtype=np.int64)
+        np.cumsum(np.bincount(assignments, minlength=list_count), out=offsets[1:])
+
+        self._ivf = IVFLists(centroids.astype(np.float32), offsets, np.argsort(assignments, kind="stable"))
+
+    def __nearest_centroids(self, centroids: npt.NDArray) -> npt.NDArray[np.int64]:
+        """Returns the index of the nearest centroid to each indexed vector, by Euclidean distance"""
+
+        # |v - c|^2 = |v|^2 - 2 v.c + |c|^2 and the first term is the same for every centroid
+
+        half_square_norms = np.einsum("ij,ij->i", centroids, centroids) / 2
+        chunk_rows = max(1, _QUERY_CHUNK_CELLS // max(1, len(centroids)))
+
+        return np.concatenate([
+            np.argmax(self._vectors[start:start+chunk_rows] @ centroids.T - half_square_norms, axis=1)
+            for start in range(0, len(self), chunk_rows)
+        ] + [np.zeros(shape=(0,), dtype=np.int64)]).astype(np.int64)
+
+    def __scores(self, queries: npt.NDArray[np.float32], vectors: npt.NDArray[np.float32], square_norms: npt.NDArray[np.float32]) -> npt.NDArray[np.float32]:
+        """Scores how near each indexed vector is to each query, where larger scores are nearer. For the Euclidean metric, the scores are negative square distances"""
+
+        products = queries @ vectors.T
+
+        if self._metric == "cosine":
+            return products
+
+        return 2*products - square_norms - np.einsum("ij,ij->i", queries, queries)[:,np.newaxis]
+
+    def __results(self, scores: npt.NDArray[np.float32]) -> npt.NDArray[np.float32]:
+        """Converts scores to the values returned by queries"""
+        if self._metric == "cosine":
+            return scores
+        return np.sqrt(np.maximum(-scores, 0))
+
+    def query(self,
+              queries: npt.NDArray,
+              k: int,
+              approximate: bool = False,
+              probes: int = _DEFAULT_PROBES) -> Tuple[npt.NDArray[np.int64], npt.NDArray[np.float32]]:
+        """Finds the nearest indexed vectors to some query vectors.
+
+Parameters:
+
+    queries - a QxD array of query vectors, or a single D-vector
+
+    k - the number of neighbours to find for each query
+
+    approximate (optional) - if true, only the vectors in the IVF lists nearest to each query are looked at. `build_ivf` must have been used first
+
+    probes (optional) - the number of IVF lists to look in for approximate queries. More lists gives more accurate results but takes longer
+
+Returns:
+
+    indexes - a Qxk array of the indexes of the nearest vectors to each query, nearest first. \
+When fewer than k vectors are looked at, the remaining indexes are -1
+
+    values - a Qxk array of the cosine similarity or Euclidean distance of each of the neighbours. Where the index is -1 this is NaN
+"""
+
+        single = queries.ndim == 1
+        queries = np.atleast_2d(np.asarray(queries, dtype=np.float32))
+
+        if queries.shape[1] != self._vectors.shape[1]:
+            raise ValueError("Queries have a different dimension to the indexed vectors")
+
+        if k < 1:
+            raise ValueError(k)
+
+        if self._metric == "cosine":
+            queries = _normalized_rows(queries)
+
+        if approximate:
+            indexes, values = self.__query_approximate(queries, k, probes)
+        else:
+            indexes, values = self.__query_exact(queries, k)
+
+        return (indexes[0], values[0]) if single else (indexes, values)
+
+    def __empty_results(self, Q: int, k: int) -> Tuple[npt.NDArray[np.int64], npt.NDArray[np.float32]]:
+        return np.full(shape=(Q, k), fill_value=-1, dtype=np.int64), np.full(shape=(Q, k), fill_value=np.nan, dtype=np.float32)
+
+    def __query_exact(self, queries: npt.NDArray[np.float32], k: int) -> Tuple[npt.NDArray[np.int64], npt.NDArray[np.float32]]:
+
+        indexes, values = self.__empty_results(queries.shape[0], k)
+        found = min(k, len(self))
+
+        if found == 0:
+            return indexes, values
+
+        # The queries are scored in chunks to bound the memory used by the scores
+
+        chunk_rows = max(1, _QUERY_CHUNK_CELLS // len(self))
+
+        for start in range(0, queries.shape[0], chunk_rows):
+
+            scores = self.__scores(queries[start:start+chunk_rows], self._vectors, self._square_norms)
+            top = _top_k(scores, found)
+
+            indexes[start:start+chunk_rows,:found] = top
+            values[start:start+chunk_rows,:found] = self.__results(np.take_along_axis(scores, top, axis=1))
+
+        return indexes, values
+
+    def __query_approximate(self, queries: npt.NDArray[np.float32], k: int, probes: int) -> Tuple[npt.NDArray[np.int64], npt.NDArray[np.float32]]:
+
+        if self._ivf is None:
+            raise ValueError("build_ivf must be used before making approximate queries")
+
+        if probes < 1:
+            raise ValueError(probes)
+
+        ivf = self._ivf
+        probes = min(probes, ivf.list_count)
+
+        indexes, values = self.__empty_results(queries.shape[0], k)
+
+        # The lists to look in are those whose centroids are nearest to each query
+
+        centroid_scores = self.__scores(queries, ivf.centroids, np.einsum("ij,ij->i", ivf.centroids, ivf.centroids))
+        probed_lists = _top_k(centroid_scores, probes)
+
+        for i, lists in enumerate(probed_lists):
+
+            candidates = np.concatenate([ivf.members[ivf.offsets[j]:ivf.offsets[j+1]] for j in lists])
+
+            if len(candidates) == 0:
+                continue
+
+            scores = self.__scores(queries[i:i+1], self._vectors[candidates], self._square_norms[candidates])
+            found = min(k, len(candidates))
+            top = _top_k(scores, found)[0]
+
+            indexes[i,:found] = candidates[top]
+            values[i,:found] = self.__results(scores[0,top])
+
+        return indexes, values
+
+
+def nearest_words(index: NeighbourIndex,
+                  vocabulary: Vocabulary,
+                  words: List[str],
+                  k: int,
+                  approximate: bool = False,
+                  probes: int = _DEFAULT_PROBES) -> List[List[Tuple[str, float]]]:
+    """Finds the nearest words to some words, using an index of the vectors of the words of a vocabulary.
+
+Parameters:
+
+    index - an index of the vector of each word of the vocabulary, in order of index
+
+    vocabulary - the vocabulary of the index
+
+    words - the words to find the nearest words to
+
+    k - the number of nearest words to find for each word. The word itself isn't included
+
+    approximate (optional) - whether to make approximate queries
+
+    probes (optional) - the number of IVF lists to look in for approximate queries
+
+Returns:
+
+    neighbours - for each word, a list of the nearest words with their cosine similarity or Euclidean distance, nearest first
+"""
+
+    ids = vocabulary.encode(words)
+
+    indexes, values = index.query(index.vectors[ids], k+1, approximate=approximate, probes=probes)
+
+    neighbours: List[List[Tuple[str, float]]] = []
+
+    for word_id, word_indexes, word_values in zip(ids, indexes, values):
+        keep = (word_indexes != word_id) & (word_indexes >= 0)
+        neighbours.append(list(zip(vocabulary.decode(word_indexes[keep][:k]), word_values[keep][:k].tolist())))
+
+    return neighbours
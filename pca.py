@@ -1,22 +1,36 @@
-from typing import Optional
+from typing import Optional, Callable, Tuple, Union
 import numpy as np
 from numpy import typing as npt
 from numpy import linalg
 from check import *
 from progress import Progress
+from sparse_matrix import CSRMatrix
+from instrumentation import instrumented, count
 
 
 class DimensionTooHighError(Exception):
     pass
 
 
-def covariance_matrix(xs: npt.NDArray, progress: Optional[Progress] = None) -> npt.NDArray:
+_COVARIANCE_CHUNK_ROWS: int = 1024
+"""The default number of rows of data used at once when creating a covariance matrix"""
+
+
+@instrumented("covariance_matrix")
+def covariance_matrix(xs: npt.NDArray,
+                      progress: Optional[Progress] = None,
+                      chunk_rows: int = _COVARIANCE_CHUNK_ROWS) -> npt.NDArray:
     """Returns a scaled covariance matrix created from the input data
 
 Parameters:
 
     xs - a NxM array of input data
 
+    progress (optional) - a progress tracker, advanced by the number of rows in each chunk
+
+    chunk_rows (optional) - the number of rows of data to use at once. \
+Extra memory used is bounded by that needed for a chunk of this many rows in single-precision
+
 Returns:
 
     cov_mat - an MxM real-symmetric scaled covariance matrix from the input data. Note that the result will not be normalised so only the proportions are valid
@@ -24,25 +38,29 @@ Returns:
 
     check_is_mat(xs, "Input must be a matrix")
 
+    if chunk_rows < 1:
+        raise ValueError(chunk_rows)
+
     N = xs.shape[0]
     M = xs.shape[1]
 
+    count("rows", N)
+
     cov_mat = np.zeros(shape=(M,M), dtype=np.float32)
 
     if progress:
         progress.max = N
 
-    # Using Python iteration due to memory limitations for larger data sets
+    # The rows are used in chunks as the whole data set may not fit in memory in single-precision
 
-    for i in range(N):
+    for start in range(0, N, chunk_rows):
 
-        if progress:
-            progress.next()
+        chunk = np.asarray(xs[start:start+chunk_rows], dtype=np.float32)
+
+        cov_mat += chunk.T @ chunk
 
-        cov_mat += np.matmul(
-            xs[i,:,np.newaxis],
-            xs[i,:,np.newaxis].T
-        )
+        if progress:
+            progress.next(chunk.shape[0])
 
     if progress:
         progress.finish()
@@ -52,46 +70,224 @@ Returns:
     return cov_mat
 
 
-def principal_components(m: npt.NDArray) -> npt.NDArray:
+_DIRECT_EIGENSOLVER_MAX_DIM: int = 2000
+"""The largest matrix size for which the leading principal components are found with a full eigendecomposition. \
+Above this, if only a few components are wanted, they are found iteratively instead"""
+
+_SUBSPACE_MAX_ITERATIONS: int = 30
+"""The most iterations of subspace iteration run before giving up on the eigenvectors converging"""
+
+_SUBSPACE_TOLERANCE: float = 1e-5
+"""The largest residual `|Av - λv|` of an eigenvector found by subspace iteration, relative to the largest eigenvalue, for it to have converged"""
+
+_SUBSPACE_OVERSAMPLING: int = 10
+"""The fewest extra vectors iterated alongside those wanted. As many extra vectors as wanted ones are iterated if that's more, \
+as the last of the wanted vectors converge at a rate set by the gap between their eigenvalues and the eigenvalue of the first vector not iterated"""
+
+
+def _leading_eigenvectors(apply: Callable[[npt.NDArray[np.float64]], npt.NDArray[np.float64]],
+                          M: int,
+                          k: int,
+                          seed: int = 0,
+                          max_products: Optional[int] = None) -> Tuple[npt.NDArray[np.float64], bool]:
+    """Finds the eigenvectors with the largest eigenvalues of a real-symmetric positive semi-definite operator using randomized subspace iteration.
+
+The leading vectors are locked once they have converged, so that only the vectors which haven't yet are multiplied by the operator again.
+
+Parameters:
+
+    apply - a function which multiplies an Mxp matrix by the MxM operator
+
+    M - the dimension of the operator
+
+    k - the number of eigenvectors to find
+
+    seed (optional) - the seed for the random starting vectors
+
+    max_products (optional) - if provided, the iteration is given up once about this many vectors have been multiplied by the operator
+
+Returns:
+
+    evecs - a kxM array of unit eigenvectors, ordered by decreasing eigenvalue
+
+    converged - whether the residuals of the eigenvectors fell within `_SUBSPACE_TOLERANCE`. \
+If not, the eigenvectors are those found after `_SUBSPACE_MAX_ITERATIONS` iterations or `max_products` products
+"""
+
+    p = min(M, max(2*k, k + _SUBSPACE_OVERSAMPLING))
+
+    rng = np.random.default_rng(seed)
+
+    q, _ = linalg.qr(apply(rng.standard_normal(size=(M,p))))
+    aq = apply(q)
+    products = 2*p
+
+    for _ in range(_SUBSPACE_MAX_ITERATIONS):
+
+        # Rayleigh-Ritz projection of the operator onto the subspace found so far.
+        # As `aq` is already known, the vectors found multiplied by the operator, and so their residuals, only need products with the small projected matrix
+
+        t = q.T @ aq
+        evals, evecs = linalg.eigh((t + t.T) / 2)
+        evals, evecs = evals[::-1], evecs[:,::-1]
+
+        vectors = q @ evecs
+        applied = aq @ evecs
+
+        residuals = linalg.norm(applied[:,:k] - vectors[:,:k] * evals[:k], axis=0)
+        converged = residuals <= _SUBSPACE_TOLERANCE * max(evals[0] if k else 0, np.finfo(np.float64).tiny)
+
+        locked = k if np.all(converged) else int(np.argmin(converged))
+
+        if (locked == k) or ((max_products is not None) and (products >= max_products)):
+            break
+
+        # The locked vectors are kept as they are and the others are replaced by their products with the operator, made orthogonal to the locked ones
+
+        q, _ = linalg.qr(np.concatenate((vectors[:,:locked], applied[:,locked:]), axis=1))
+        q[:,:locked] = vectors[:,:locked]
+
+        aq = np.concatenate((applied[:,:locked], apply(q[:,locked:])), axis=1)
+        products += p - locked
+
+    return vectors[:,:k].T, locked == k
+
+
+@instrumented("principal_components")
+def principal_components(m: npt.NDArray, k: Optional[int] = None) -> npt.NDArray:
     """Returns an ordered list of the unit-vector principal components of a covariance matrix using Principal Component Analysis
 
 Parameters:
 
-    m - an NxN covariance matrix of numeric values
+    m - an NxN real-symmetric covariance matrix of numeric values
+
+    k (optional) - if provided, only the k leading principal components are returned. \
+When these are only a small part of a large matrix's components, they are found by subspace iteration instead of a full eigendecomposition. \
+If the iteration doesn't converge, such as when the matrix's leading eigenvalues are too close together, the full eigendecomposition is used after all
 
 Returns:
 
-    axes - an NxN array of principal components where each value is a unit N-vector
+    axes - a kxN array of principal components where each value is a unit N-vector. If `k` isn't provided then this is NxN
 """
 
     check_is_mat(m, "m must be a matrix (ie an array with ndim=2)")
     check_mat_square(m, "m must be a square matrix")
 
-    evals, evecs = linalg.eig(m)
-    evecs = evecs.T
+    N = m.shape[0]
+
+    if k is None:
+        k = N
+
+    if not (0 <= k <= N):
+        raise ValueError(k)
+
+    count("components", k)
+
+    dtype = m.dtype if np.issubdtype(m.dtype, np.floating) else np.float64
 
-    sort_order = np.argsort(evals)[::-1]
+    if (N > _DIRECT_EIGENSOLVER_MAX_DIM) and (2*k < N):
 
-    ordered_evecs = evecs[sort_order,:]
+        # The matrix is multiplied in its own precision, so only the iterated vectors are converted rather than the whole matrix
 
-    return ordered_evecs
+        float_m = np.asarray(m, dtype=dtype)
 
+        # A full eigendecomposition takes a few times as long as multiplying the matrix by N vectors, so the iteration is given up by then
+
+        evecs, converged = _leading_eigenvectors(lambda q: (float_m @ q.astype(dtype)).astype(np.float64), N, k, max_products=N)
+
+        if converged:
+            return evecs.astype(dtype)
+
+    # The eigenvalues from eigh are in ascending order
+
+    evals, evecs = linalg.eigh(m)
+
+    return evecs[:,::-1][:,:k].T.astype(dtype)
+
+
+def _gram_product(xs: npt.NDArray, q: npt.NDArray[np.float64], chunk_rows: int) -> npt.NDArray[np.float64]:
+    """Returns `xs.T @ xs @ q`, using the rows of `xs` in chunks so that `xs.T @ xs` is never created"""
+
+    out = np.zeros(shape=(xs.shape[1], q.shape[1]), dtype=np.float64)
+
+    for start in range(0, xs.shape[0], chunk_rows):
+        chunk = np.asarray(xs[start:start+chunk_rows], dtype=np.float64)
+        out += chunk.T @ (chunk @ q)
+
+    return out
+
+
+@instrumented("truncated_principal_components")
+def truncated_principal_components(xs: Union[npt.NDArray, CSRMatrix],
+                                   N: int,
+                                   chunk_rows: int = _COVARIANCE_CHUNK_ROWS) -> npt.NDArray[np.float32]:
+    """Returns the N leading unit-vector principal components of some data without creating its covariance matrix.
+
+The components are found by subspace iteration on the covariance matrix, where the covariance matrix is applied implicitly by multiplying by the data and then by its transpose. \
+This means that the memory used only grows with N and the dimensionality of the data, rather than with the square of the dimensionality.
+
+Parameters:
 
-def project_to_components(xs: npt.NDArray, comps: npt.NDArray) -> npt.NDArray:
+    xs - a PxM array of input data. This may also be a `CSRMatrix`, whose missing entries count as zero
+
+    N - the number of components to find
+
+    chunk_rows (optional) - the number of rows of data to use at once. Not used for sparse data
+
+Returns:
+
+    axes - an NxM array of principal components, as would be given by `principal_components(covariance_matrix(xs), N)`
+"""
+
+    check_is_mat(xs, "xs should be a matrix")
+
+    M = xs.shape[1]
+
+    if not (0 <= N <= M):
+        raise DimensionTooHighError()
+
+    if chunk_rows < 1:
+        raise ValueError(chunk_rows)
+
+    count("rows", xs.shape[0])
+    count("components", N)
+
+    apply: Callable[[npt.NDArray[np.float64]], npt.NDArray[np.float64]]
+
+    if isinstance(xs, CSRMatrix):
+        apply = lambda q: xs.transpose_dot(xs.dot(q))
+    else:
+        apply = lambda q: _gram_product(xs, q, chunk_rows)
+
+    # The components are only wanted approximately, so they are used even if the iteration didn't converge
+
+    evecs, _ = _leading_eigenvectors(apply, M, N)
+
+    return evecs.astype(np.float32)
+
+
+def project_to_components(xs: Union[npt.NDArray, CSRMatrix], comps: npt.NDArray) -> npt.NDArray:
     return xs @ comps.T
 
 
-def pca(xs: npt.NDArray, N: int, covarince_matrix_progress: Optional[Progress] = None) -> npt.NDArray:
+def pca(xs: Union[npt.NDArray, CSRMatrix],
+        N: int,
+        covarince_matrix_progress: Optional[Progress] = None,
+        truncated: bool = False) -> npt.NDArray:
     """Uses Principal Component Analysis (PCA) to reduce the dimensionality of some data points
 
 Parameters:
 
-    xs - a PxM array with the data the reduce the dimensionality of
+    xs - a PxM array with the data the reduce the dimensionality of. \
+This may also be a `CSRMatrix`, whose missing entries count as zero, in which case the components are always found as if `truncated` were true
 
     N - the number of dimensions to reduce the data to. If this is greater than the current dimensionality of the data then an exception is thrown
 
     covariance_matrix_progress (optional) - a progress tracker to use for showing the progress of the covariance matrix creation
 
+    truncated (optional) - if true, the components are found with `truncated_principal_components` so that no covariance matrix is created. \
+This is much faster and uses much less memory when N is small compared to the dimensionality of the data
+
 Returns:
 
     ys - a PxN array of the data after having its dimensionality reduce through PCA
@@ -102,11 +298,107 @@ Returns:
     if N > xs.shape[1]:
         raise DimensionTooHighError()
 
-    cov_mat = covariance_matrix(xs, progress=covarince_matrix_progress)
-    comps = principal_components(cov_mat)[:N]
+    comps: npt.NDArray
+
+    if truncated or isinstance(xs, CSRMatrix):
+        comps = truncated_principal_components(xs, N)
+    else:
+        cov_mat = covariance_matrix(xs, progress=covarince_matrix_progress)
+        comps = principal_components(cov_mat, N)
 
     # comps is NxM
 
     ys = project_to_components(xs, comps)
 
     return ys
+
+
+class IncrementalPCA:
+    """Principal Component Analysis that is fitted on rows of data given a batch at a time.
+
+The same components are found as by `pca` on all of the rows given so far, but only the MxM covariance matrix is kept rather than the rows themselves. \
+More rows can be given after the components have been used, and the components are then found again from the updated covariance matrix.
+"""
+
+    def __init__(self, n_components: int):
+        """Parameters:
+
+    n_components - the number of dimensions to reduce the data to
+"""
+
+        if n_components < 0:
+            raise ValueError(n_components)
+
+        self._n_components = n_components
+        self._n_samples_seen: int = 0
+        self._cov_mat: Optional[npt.NDArray[np.float64]] = None
+        self._components: Optional[npt.NDArray] = None
+
+    @property
+    def n_components(self) -> int:
+        return self._n_components
+
+    @property
+    def n_samples_seen_(self) -> int:
+        """The number of rows of data that have been fitted on"""
+        return self._n_samples_seen
+
+    @property
+    def components_(self) -> npt.NDArray:
+        """The principal components of all of the rows fitted on so far, as an NxM array. \
+These are found when first needed after new rows have been fitted on"""
+
+        if self._cov_mat is None:
+            raise ValueError("No data has been fitted on")
+
+        if self._components is None:
+            self._components = principal_components(self._cov_mat, self._n_components).astype(np.float32)
+
+        return self._components
+
+    def partial_fit(self, batch: npt.NDArray, progress: Optional[Progress] = None) -> "IncrementalPCA":
+        """Adds some rows of data to those fitted on
+
+Parameters:
+
+    batch - a PxM array of rows of data. As the rows are used in chunks, this may be memory-mapped
+
+    progress (optional) - a progress tracker for the rows of the batch
+
+Returns:
+
+    self - this object
+"""
+
+        check_is_mat(batch, "batch should be a matrix")
+
+        M = batch.shape[1]
+
+        if self._cov_mat is None:
+            if self._n_components > M:
+                raise DimensionTooHighError()
+            self._cov_mat = np.zeros(shape=(M,M), dtype=np.float64)
+        elif M != self._cov_mat.shape[0]:
+            raise ValueError("batch has a different number of columns to the previous batches")
+
+        self._cov_mat += covariance_matrix(batch, progress=progress)
+        self._n_samples_seen += batch.shape[0]
+        self._components = None
+
+        return self
+
+    def transform(self, batch: npt.NDArray) -> npt.NDArray:
+        """Reduces the dimensionality of some rows of data using the current principal components
+
+Parameters:
+
+    batch - a PxM array of rows of data
+
+Returns:
+
+    ys - a PxN array of the rows projected onto the principal components
+"""
+
+        check_is_mat(batch, "batch should be a matrix")
+
+        return project_to_components(batch, self.components_)
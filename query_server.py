@@ -0,0 +1,497 @@
+from typing import Any, Dict, Hashable, List, Optional, Tuple
+from collections import OrderedDict
+from pathlib import Path
+from time import perf_counter
+from urllib.parse import urlsplit, parse_qsl
+import argparse
+import asyncio
+import json
+import math
+import numpy as np
+import numpy.typing as npt
+from neighbours import NeighbourIndex
+from saved_models import ModelBundle, load_bundle, load_neighbour_index
+from sparse_matrix import CSRMatrix
+
+
+_DEFAULT_COMPONENTS: int = 50
+"""The default number of leading principal components of the words' projections that are compared"""
+
+_DEFAULT_CACHE_SIZE: int = 4096
+
+_DEFAULT_MAX_BATCH: int = 64
+"""The default largest number of neighbour queries answered together"""
+
+_DEFAULT_MAX_WAIT: float = 0.001
+"""The default longest time, in seconds, that a neighbour query waits for others to be batched with"""
+
+_MAX_K: int = 1000
+
+_ENDPOINTS: Tuple[str, ...] = ("/lookup", "/neighbours", "/distance")
+
+
+class LatencyHistogram:
+    """A histogram of latencies with buckets whose bounds double, from 10 microseconds to about 20 seconds"""
+
+    _BOUNDS: List[float] = [1e-5 * 2**i for i in range(22)]
+
+    def __init__(self):
+        self._counts: List[int] = [0] * (len(self._BOUNDS) + 1)
+        self._count: int = 0
+        self._total: float = 0
+
+    @property
+    def count(self) -> int:
+        return self._count
+
+    def record(self, seconds: float) -> None:
+
+        bucket = 0
+        while (bucket < len(self._BOUNDS)) and (seconds > self._BOUNDS[bucket]):
+            bucket += 1
+
+        self._counts[bucket] += 1
+        self._count += 1
+        self._total += seconds
+
+    def percentile(self, p: float) -> float:
+        """Returns an upper bound of the latency that p percent of the recorded latencies are at most. Latencies above the last bucket give infinity"""
+
+        if self._count == 0:
+            return 0
+
+        target = math.ceil(self._count * p / 100)
+        seen = 0
+
+        for bucket, count in enumerate(self._counts):
+            seen += count
+            if seen >= max(1, target):
+                return self._BOUNDS[bucket] if bucket < len(self._BOUNDS) else math.inf
+
+        return math.inf
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "count": self._count,
+            "mean_ms": 1e3 * self._total / self._count if self._count else 0,
+            "p50_ms": 1e3 * self.percentile(50),
+            "p95_ms": 1e3 * self.percentile(95),
+            "p99_ms": 1e3 * self.percentile(99),
+            "buckets": {
+                f"<={1e3 * bound:g}ms": count
+                for bound, count in zip(self._BOUNDS, self._counts) if count > 0
+            } | ({ "overflow": self._counts[-1] } if self._counts[-1] > 0 else {}),
+        }
+
+
+class _LRUCache:
+
+    def __init__(self, capacity: int):
+        self._capacity = capacity
+        self._entries: OrderedDict[Hashable, Any] = OrderedDict()
+        self.hits: int = 0
+        self.misses: int = 0
+
+    def get(self, key: Hashable) -> Optional[Any]:
+
+        if key in self._entries:
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return self._entries[key]
+
+        self.misses += 1
+        return None
+
+    def put(self, key: Hashable, value: Any) -> None:
+
+        if self._capacity <= 0:
+            return
+
+        self._entries[key] = value
+        self._entries.move_to_end(key)
+
+        while len(self._entries) > self._capacity:
+            self._entries.popitem(last=False)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+class _NeighbourBatcher:
+    """Collects neighbour queries made at about the same time so that they are answered by a single query of the index"""
+
+    def __init__(self, index: NeighbourIndex, max_batch: int, max_wait: float):
+
+        self._index = index
+        self._max_batch = max_batch
+        self._max_wait = max_wait
+
+        self._pending: List[Tuple[npt.NDArray[np.float32], int, bool, asyncio.Future]] = []
+        self._flush_handle: Optional[asyncio.TimerHandle] = None
+
+        self.batch_count: int = 0
+        self.query_count: int = 0
+
+    async def query(self, vector: npt.NDArray[np.float32], k: int, approximate: bool) -> Tuple[npt.NDArray[np.int64], npt.NDArray[np.float32]]:
+
+        loop = asyncio.get_running_loop()
+        future: asyncio.Future = loop.create_future()
+
+        self._pending.append((vector, k, approximate, future))
+
+        if len(self._pending) >= self._max_batch:
+            self._flush()
+        elif self._flush_handle is None:
+            self._flush_handle = loop.call_later(self._max_wait, self._flush)
+
+        return await future
+
+    def _flush(self) -> None:
+
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+
+        pending, self._pending = self._pending, []
+
+        if pending:
+            self.batch_count += 1
+            self.query_count += len(pending)
+
+        for approximate in (False, True):
+
+            group = [item for item in pending if item[2] == approximate]
+
+            if not group:
+                continue
+
+            try:
+                indexes, values = self._index.query(
+                    np.stack([vector for vector, _, _, _ in group]),
+                    max(k for _, k, _, _ in group),
+                    approximate=approximate
+                )
+            except Exception as e:
+                for _, _, _, future in group:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+
+            for i, (_, k, _, future) in enumerate(group):
+                if not future.done():
+                    future.set_result((indexes[i,:k], values[i,:k]))
+
+
+class QueryError(Exception):
+    """An error in a query, which is answered with the given HTTP status"""
+
+    def __init__(self, status: int, message: str):
+        super().__init__(message)
+        self.status = status
+        self.message = message
+
+
+class WordQueryService:
+    """Answers lookup, neighbour and distance queries about the words of a model, which is loaded once and kept.
+
+Endpoints:
+
+    /lookup?word=W - the index of a word and its projection onto the leading principal components
+
+    /neighbours?word=W&k=K&approximate=0|1 - the K nearest words to a word by the cosine similarity of their projections, \
+given as "similarity", or by their Euclidean distance, given as "distance", if the index uses the Euclidean metric
+
+    /distance?a=A&b=B - the normalized relative position of two words and the cosine similarity of their projections
+
+    /stats - the latency histogram of each endpoint, the sizes of neighbour query batches and the result cache statistics
+"""
+
+    def __init__(self,
+                 bundle: ModelBundle,
+                 index: Optional[NeighbourIndex] = None,
+                 components: int = _DEFAULT_COMPONENTS,
+                 cache_size: int = _DEFAULT_CACHE_SIZE,
+                 max_batch: int = _DEFAULT_MAX_BATCH,
+                 max_wait: float = _DEFAULT_MAX_WAIT):
+        """Parameters:
+
+    bundle - the model to answer queries about
+
+    index (optional) - a neighbour index over the projections of the model's words. If not provided, an exact index over the leading principal components is made
+
+    components (optional) - the number of leading principal components of the projections that are looked up and compared, if no index is provided
+
+    cache_size (optional) - the number of query results kept in the least-recently-used cache
+
+    max_batch (optional) - the largest number of neighbour queries answered together
+
+    max_wait (optional) - the longest time, in seconds, a neighbour query waits for others to be batched with
+"""
+
+        self._bundle = bundle
+        self._vocabulary = bundle.word_indexes
+        self._index = index if index is not None else NeighbourIndex(bundle.projections[:,:components])
+
+        self._cache = _LRUCache(cache_size)
+        self._batcher = _NeighbourBatcher(self._index, max_batch, max_wait)
+        self._latencies: Dict[str, LatencyHistogram] = {}
+
+    @property
+    def index(self) -> NeighbourIndex:
+        return self._index
+
+    def __word_id(self, params: Dict[str, str], name: str) -> int:
+
+        if name not in params:
+            raise QueryError(400, f"Missing parameter {name}")
+
+        word = params[name]
+
+        if word not in self._vocabulary:
+            raise QueryError(404, f"Unknown word {word}")
+
+        return self._vocabulary.index_of(word)
+
+    def __rel_pos(self, i: int, j: int) -> Optional[float]:
+
+        rel_pos = self._bundle.rel_pos
+
+        value = rel_pos.value_at(i, j, missing_value=math.inf) if isinstance(rel_pos, CSRMatrix) else float(rel_pos[i,j])
+
+        return value if math.isfinite(value) else None
+
+    def lookup(self, params: Dict[str, str]) -> Dict[str, Any]:
+
+        word_id = self.__word_id(params, "word")
+
+        return {
+            "word": params["word"],
+            "index": word_id,
+            "vector": self._bundle.projections[word_id,:self._index.vectors.shape[1]].tolist(),
+        }
+
+    async def neighbours(self, params: Dict[str, str]) -> Dict[str, Any]:
+
+        word_id = self.__word_id(params, "word")
+
+        try:
+            k = int(params.get("k", "10"))
+        except ValueError:
+            raise QueryError(400, "k should be an integer")
+
+        if not (1 <= k <= _MAX_K):
+            raise QueryError(400, f"k should be from 1 to {_MAX_K}")
+
+        approximate = params.get("approximate", "0") not in ("0", "false", "")
+
+        if approximate and (self._index.ivf is None):
+            raise QueryError(400, "The index doesn't support approximate queries")
+
+        indexes, values = await self._batcher.query(self._index.vectors[word_id], k+1, approximate)
+
+        keep = (indexes != word_id) & (indexes >= 0)
+
+        value_name = "similarity" if self._index.metric == "cosine" else "distance"
+
+        return {
+            "word": params["word"],
+            "neighbours": [
+                { "word": word, value_name: value }
+                for word, value in zip(self._vocabulary.decode(indexes[keep][:k]), values[keep][:k].tolist())
+            ],
+        }
+
+    def distance(self, params: Dict[str, str]) -> Dict[str, Any]:
+
+        a = self.__word_id(params, "a")
+        b = self.__word_id(params, "b")
+
+        vectors = self._index.vectors
+
+        if self._index.metric == "cosine":
+            similarity = float(vectors[a] @ vectors[b])
+        else:
+            norms = float(np.linalg.norm(vectors[a]) * np.linalg.norm(vectors[b]))
+            similarity = float(vectors[a] @ vectors[b]) / norms if norms > 0 else 0
+
+        return {
+            "a": params["a"],
+            "b": params["b"],
+            "rel_pos": self.__rel_pos(a, b),
+            "similarity": similarity,
+        }
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "latency": { path: histogram.to_dict() for path, histogram in self._latencies.items() },
+            "neighbour_batches": {
+                "count": self._batcher.batch_count,
+                "mean_size": self._batcher.query_count / self._batcher.batch_count if self._batcher.batch_count else 0,
+            },
+            "cache": {
+                "size": len(self._cache),
+                "hits": self._cache.hits,
+                "misses": self._cache.misses,
+            },
+        }
+
+    async def handle(self, path: str, params: Dict[str, str]) -> Tuple[int, Dict[str, Any]]:
+        """Answers a query. Returns the HTTP status and the JSON body of the response"""
+
+        start = perf_counter()
+
+        if path == "/stats":
+            return 200, self.stats()
+
+        key = (path, tuple(sorted(params.items())))
+        cached = self._cache.get(key)
+
+        status: int
+        body: Dict[str, Any]
+
+        if cached is not None:
+            status, body = 200, cached
+        else:
+            try:
+                if path == "/lookup":
+                    body = self.lookup(params)
+                elif path == "/neighbours":
+                    body = await self.neighbours(params)
+                elif path == "/distance":
+                    body = self.distance(params)
+                else:
+                    raise QueryError(404, f"Unknown endpoint {path}")
+                status = 200
+                self._cache.put(key, body)
+            except QueryError as e:
+                status, body = e.status, { "error": e.message }
+
+        endpoint = path if path in _ENDPOINTS else "other"
+        self._latencies.setdefault(endpoint, LatencyHistogram()).record(perf_counter() - start)
+
+        return status, body
+
+
+_REASONS: Dict[int, str] = { 200: "OK", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed" }
+
+
+async def _handle_connection(service: WordQueryService, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+    """Answers the HTTP requests of a connection, keeping it open between requests unless asked not to"""
+
+    try:
+
+        while True:
+
+            request_line = await reader.readline()
+            if not request_line:
+                break
+
+            headers: Dict[str, str] = {}
+
+            while True:
+                line = await reader.readline()
+                if line in (b"\r\n", b"\n", b""):
+                    break
+                name, _, value = line.decode("latin-1").partition(":")
+                headers[name.strip().lower()] = value.strip()
+
+            parts = request_line.decode("latin-1").split()
+
+            if len(parts) != 3:
+                break
+
+            method, target, version = parts
+
+            if "content-length" in headers:
+                await reader.readexactly(int(headers["content-length"]))
+
+            status: int
+            body: Dict[str, Any]
+
+            if method != "GET":
+                status, body = 405, { "error": "Only GET is supported" }
+            else:
+                url = urlsplit(target)
+                status, body = await service.handle(url.path, dict(parse_qsl(url.query)))
+
+            keep_alive = (version == "HTTP/1.1") and (headers.get("connection", "").lower() != "close")
+
+            payload = json.dumps(body).encode("UTF-8")
+
+            writer.write(
+                f"HTTP/1.1 {status} {_REASONS.get(status, '')}\r\n"
+                f"Content-Type: application/json\r\n"
+                f"Content-Length: {len(payload)}\r\n"
+                f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n"
+                f"\r\n".encode("latin-1") + payload
+            )
+            await writer.drain()
+
+            if not keep_alive:
+                break
+
+    except (ConnectionError, asyncio.IncompleteReadError, ValueError):
+        pass
+
+    finally:
+        writer.close()
+
+
+async def start_server(service: WordQueryService,
+                       host: str = "127.0.0.1",
+                       port: int = 8080,
+                       unix_socket: Optional[Path] = None) -> asyncio.AbstractServer:
+    """Starts serving queries over HTTP, on a TCP port or on a Unix socket if one is given"""
+
+    async def handle(reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        await _handle_connection(service, reader, writer)
+
+    if unix_socket is not None:
+        return await asyncio.start_unix_server(handle, path=str(unix_socket))
+    else:
+        return await asyncio.start_server(handle, host=host, port=port)
+
+
+def load_service(bundle_filepath: Path,
+                 neighbour_index_filepath: Optional[Path] = None,
+                 components: int = _DEFAULT_COMPONENTS,
+                 cache_size: int = _DEFAULT_CACHE_SIZE) -> WordQueryService:
+    """Creates a query service for a saved model, memory-mapping the model's files"""
+
+    bundle = load_bundle(bundle_filepath, mmap=True)
+    index = load_neighbour_index(neighbour_index_filepath, mmap=True) if neighbour_index_filepath is not None else None
+
+    return WordQueryService(bundle, index=index, components=components, cache_size=cache_size)
+
+
+def main():
+
+    parser = argparse.ArgumentParser(description="Serves word similarity queries about a saved model over HTTP")
+    parser.add_argument("--bundle", type=Path, required=True, help="the model bundle, as saved by saved_models.save_bundle")
+    parser.add_argument("--neighbour-index", type=Path, default=None, help="a saved neighbour index over the model's projections")
+    parser.add_argument("--components", type=int, default=_DEFAULT_COMPONENTS)
+    parser.add_argument("--cache-size", type=int, default=_DEFAULT_CACHE_SIZE)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080, help="the port to listen on, or 0 for any free port")
+    parser.add_argument("--unix-socket", type=Path, default=None, help="a Unix socket to listen on instead of a TCP port")
+    args = parser.parse_args()
+
+    async def run() -> None:
+
+        service = load_service(args.bundle, args.neighbour_index, components=args.components, cache_size=args.cache_size)
+        server = await start_server(service, host=args.host, port=args.port, unix_socket=args.unix_socket)
+
+        address = args.unix_socket if args.unix_socket is not None else "{}:{}".format(*server.sockets[0].getsockname()[:2])
+        print(f"Listening on {address}", flush=True)
+
+        async with server:
+            await server.serve_forever()
+
+    try:
+        asyncio.run(run())
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,153 @@
+from typing import Optional, Tuple
+import numpy as np
+import numpy.typing as npt
+from check import check_is_mat
+from sparse_matrix import CSRMatrix
+
+
+_CHUNK_ROWS: int = 256
+"""The default number of rows of a matrix that are processed at once"""
+
+
+def _out_buffer(xs: npt.NDArray, out: Optional[npt.NDArray]) -> npt.NDArray[np.float32]:
+
+    if out is None:
+        return np.empty(shape=xs.shape, dtype=np.float32)
+
+    if out.shape != xs.shape:
+        raise ValueError("out has a different shape to the input")
+
+    return out
+
+
+def _finite_stats(pos_mat: npt.NDArray, chunk_rows: int) -> Tuple[float, float, float]:
+    """Returns the sum, minimum and maximum of the finite entries of a matrix, looking at one chunk of rows at a time"""
+
+    total: float = 0
+    minimum: float = np.inf
+    maximum: float = -np.inf
+
+    for start in range(0, pos_mat.shape[0], chunk_rows):
+
+        chunk = pos_mat[start:start+chunk_rows]
+        values = chunk[np.isfinite(chunk)]
+
+        total += float(np.sum(values, dtype=np.float64))
+        minimum = min(minimum, float(np.min(values, initial=np.inf)))
+        maximum = max(maximum, float(np.max(values, initial=-np.inf)))
+
+    return total, minimum, maximum
+
+
+def normalize_rel_pos(pos_mat: npt.NDArray,
+                      out: Optional[npt.NDArray] = None,
+                      chunk_rows: int = _CHUNK_ROWS) -> npt.NDArray:
+    """Normalizes a dense matrix of average relative positions of words, as made by `learn_word_rel_pos`.
+
+The matrix is offset by the mean of all its entries, where infinite entries count as zero, and is then scaled so that the largest magnitude of a finite entry is 1. \
+Infinite entries stay infinite.
+
+The largest magnitude is found from the smallest and largest finite entries, so the matrix is only read twice, and no temporary arrays larger than a chunk of rows are made.
+
+Parameters:
+
+    pos_mat - an NxN matrix of average relative positions. This may be memory-mapped
+
+    out (optional) - the array to write the normalized matrix to. This may be `pos_mat` itself to normalize it in-place. If not provided, a new array is created
+
+    chunk_rows (optional) - the number of rows to process at once
+
+Returns:
+
+    normalized - the normalized matrix, which is `out` if it was provided
+"""
+
+    check_is_mat(pos_mat, "pos_mat should be a matrix")
+
+    if chunk_rows < 1:
+        raise ValueError(chunk_rows)
+
+    out = _out_buffer(pos_mat, out)
+
+    total, minimum, maximum = _finite_stats(pos_mat, chunk_rows)
+
+    mean = total / pos_mat.size if pos_mat.size > 0 else 0
+
+    # The infinite entries count as zero in the largest magnitude too
+
+    normalization_factor = max(maximum - mean, mean - minimum, 0)
+
+    for start in range(0, pos_mat.shape[0], chunk_rows):
+        chunk_out = out[start:start+chunk_rows]
+        np.subtract(pos_mat[start:start+chunk_rows], mean, out=chunk_out)
+        np.divide(chunk_out, normalization_factor, out=chunk_out)
+
+    return out
+
+
+def exp_map_rel_pos(normalized: npt.NDArray,
+                    out: Optional[npt.NDArray] = None,
+                    chunk_rows: int = _CHUNK_ROWS) -> npt.NDArray:
+    """Maps each entry `x` of a normalized dense relative position matrix to `exp(-x)`. Infinite entries map to zero.
+
+Parameters:
+
+    normalized - an NxN normalized matrix of relative positions, as made by `normalize_rel_pos`
+
+    out (optional) - the array to write the mapped matrix to. This may be `normalized` itself to map it in-place. If not provided, a new array is created
+
+    chunk_rows (optional) - the number of rows to process at once
+
+Returns:
+
+    mapped - the mapped matrix, which is `out` if it was provided
+"""
+
+    check_is_mat(normalized, "normalized should be a matrix")
+
+    if chunk_rows < 1:
+        raise ValueError(chunk_rows)
+
+    out = _out_buffer(normalized, out)
+
+    for start in range(0, normalized.shape[0], chunk_rows):
+        chunk_out = out[start:start+chunk_rows]
+        np.negative(normalized[start:start+chunk_rows], out=chunk_out)
+        np.exp(chunk_out, out=chunk_out)
+
+    return out
+
+
+def normalize_rel_pos_sparse(matrix: CSRMatrix) -> CSRMatrix:
+    """Normalizes a sparse matrix of average relative positions of words, as made by `learn_word_rel_pos` with `sparse=True`.
+
+The stored entries are offset by the mean of the whole matrix, where missing entries count as zero, and are then scaled so that the largest magnitude is 1. \\
+This gives the stored entries of the dense matrix that would be normalized in the same way with infinite entries counting as zero, and missing entries stay missing.
+
+Parameters:
+
+    matrix - a sparse NxN matrix of average relative positions
+
+Returns:
+
+    normalized - a sparse matrix with the same stored entries, normalized
+"""
+
+    mean = np.sum(matrix.data, dtype=np.float64) / (matrix.shape[0] * matrix.shape[1])
+
+    offset = matrix.data - mean
+
+    normalization_factor = np.max(np.abs(offset), initial=0)
+
+    return matrix.with_data((offset / normalization_factor).astype(np.float32))
+
+
+def exp_map_rel_pos_sparse(normalized: CSRMatrix) -> CSRMatrix:
+    """Maps each stored entry of a normalized sparse relative position matrix `x` to `exp(-x)`.
+
+Missing entries are left missing, which means that they count as zero when the mapped matrix is multiplied, as the infinite entries of a dense matrix would map to.
+"""
+
+    mapped: npt.NDArray[np.float32] = np.exp(np.negative(normalized.data))
+
+    return normalized.with_data(mapped)
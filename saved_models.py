@@ -1,7 +1,14 @@
+from typing import Optional, Literal, Union, Dict
 from pathlib import Path
 import numpy.typing as npt
 import numpy as np
 from bij_map import BijMap
+from vocabulary import Vocabulary
+from neighbours import NeighbourIndex, IVFLists
+from sparse_matrix import CSRMatrix
+from learn import RelPosAccumulator
+from array_bundle import write_array_bundle, read_array_bundle, encode_strings, decode_strings, InvalidArrayBundleError
+from instrumentation import instrumented
 
 
 class ModelFilepaths:
@@ -13,21 +20,54 @@ class ModelFilepaths:
     PRINCIPAL_COMPONENTS_WORD_REL_POS_SIGNED = Path("saved_models", "principal_components_word_rel_pos_signed.npy")
     PCA_WORD_REL_POS_UNSIGNED = Path("saved_models", "pca_word_rel_pos_unsigned.npy")
     PCA_WORD_REL_POS_SIGNED = Path("saved_models", "pca_word_rel_pos_signed.npy")
+    SPARSE_WORD_REL_POS_UNSIGNED = Path("saved_models", "word_rel_pos_unsigned_sparse.npz")
+    SPARSE_WORD_REL_POS_SIGNED = Path("saved_models", "word_rel_pos_signed_sparse.npz")
+    BUNDLE_WORD_REL_POS_UNSIGNED = Path("saved_models", "word_rel_pos_unsigned.bundle")
+    BUNDLE_WORD_REL_POS_SIGNED = Path("saved_models", "word_rel_pos_signed.bundle")
+    NEIGHBOUR_INDEX_WORD_REL_POS_UNSIGNED = Path("saved_models", "neighbour_index_word_rel_pos_unsigned.bundle")
+    NEIGHBOUR_INDEX_WORD_REL_POS_SIGNED = Path("saved_models", "neighbour_index_word_rel_pos_signed.bundle")
+    REL_POS_ACCUMULATOR = Path("saved_models", "rel_pos_accumulator.bundle")
 
 
+@instrumented("save_matrix")
 def save_matrix(filepath: Path, data: npt.NDArray) -> None:
     with filepath.open("wb") as file:
         np.save(file, data, allow_pickle=False)
 
 
-def load_matrix(filepath: Path) -> npt.NDArray:
-    with filepath.open("rb") as file:
-        data = np.load(file, allow_pickle=False)
+@instrumented("load_matrix")
+def load_matrix(filepath: Path, mmap_mode: Optional[Literal["r", "r+", "c"]] = None) -> npt.NDArray:
+    """Loads a matrix saved by `save_matrix`.
+
+If `mmap_mode` is given, the matrix is memory-mapped with that mode (as for `np.memmap`) instead of being read into memory. \
+Processes mapping the same file then share its pages, and loading takes the same time whatever the size of the file.
+"""
+
+    if mmap_mode is not None:
+        data = np.load(filepath, mmap_mode=mmap_mode, allow_pickle=False)
+    else:
+        with filepath.open("rb") as file:
+            data = np.load(file, allow_pickle=False)
+
     assert isinstance(data, np.ndarray)
     return data
 
 
-def save_word_indexes(filepath: Path, bm: BijMap[str, int]) -> None:
+@instrumented("save_sparse_matrix")
+def save_sparse_matrix(filepath: Path, data: CSRMatrix) -> None:
+    with filepath.open("wb") as file:
+        np.savez(file, indptr=data.indptr, indices=data.indices, data=data.data, shape=np.array(data.shape, dtype=np.int64))
+
+
+@instrumented("load_sparse_matrix")
+def load_sparse_matrix(filepath: Path) -> CSRMatrix:
+    with np.load(filepath, allow_pickle=False) as arrays:
+        shape = arrays["shape"]
+        return CSRMatrix(arrays["indptr"], arrays["indices"], arrays["data"], (int(shape[0]), int(shape[1])))
+
+
+@instrumented("save_word_indexes")
+def save_word_indexes(filepath: Path, bm: Union[BijMap[str, int], Vocabulary]) -> None:
     with filepath.open("w+") as file:
         for a in bm.iterate_to():
             b = bm.get_to(a)
@@ -35,7 +75,8 @@ def save_word_indexes(filepath: Path, bm: BijMap[str, int]) -> None:
             file.write(f"{a}:{str(b)}\n")
 
 
-def load_word_indexes(filepath: Path) -> BijMap[str, int]:
+@instrumented("load_word_indexes")
+def load_word_indexes(filepath: Path) -> Vocabulary:
 
     bm = BijMap[str, int]()
 
@@ -52,4 +93,191 @@ def load_word_indexes(filepath: Path) -> BijMap[str, int]:
             raise Exception("Invalid file")
         bm.set_to(a, b)
 
-    return bm
+    try:
+        return Vocabulary.from_bij_map(bm)
+    except ValueError:
+        raise Exception("Invalid file")
+
+
+_BUNDLE_FORMAT_VERSION: int = 1
+
+
+class ModelBundle:
+    """A trained word relative position model, with everything needed to use it, that is saved to and loaded from a single file
+
+Attributes:
+
+    word_indexes - the index of each word in the matrices
+
+    rel_pos - the NxN normalized relative position matrix, dense or sparse
+
+    principal_components - the principal components of the mapped relative position matrix, as a KxN matrix
+
+    projections - the mapped relative position matrix projected onto the principal components, as an NxK matrix
+
+    max_look_dist - the maximum distance between words that was looked at when learning the model
+
+    signed - whether the relative positions are signed
+
+    corpus_hash (optional) - a hash identifying the text that the model was learnt from
+"""
+
+    def __init__(self,
+                 word_indexes: Vocabulary,
+                 rel_pos: Union[npt.NDArray, CSRMatrix],
+                 principal_components: npt.NDArray,
+                 projections: npt.NDArray,
+                 max_look_dist: int,
+                 signed: bool,
+                 corpus_hash: Optional[str] = None):
+
+        self.word_indexes = word_indexes
+        self.rel_pos = rel_pos
+        self.principal_components = principal_components
+        self.projections = projections
+        self.max_look_dist = max_look_dist
+        self.signed = signed
+        self.corpus_hash = corpus_hash
+
+
+@instrumented("save_bundle")
+def save_bundle(filepath: Path, bundle: ModelBundle) -> None:
+    """Saves a model to a single file. The arrays are stored uncompressed and aligned so that `load_bundle` can memory-map them"""
+
+    words_blob, words_offsets = encode_strings(bundle.word_indexes.words)
+
+    arrays: Dict[str, npt.NDArray] = {
+        "words_blob": words_blob,
+        "words_offsets": words_offsets,
+        "principal_components": bundle.principal_components,
+        "projections": bundle.projections,
+    }
+
+    if isinstance(bundle.rel_pos, CSRMatrix):
+        arrays["rel_pos_indptr"] = bundle.rel_pos.indptr
+        arrays["rel_pos_indices"] = bundle.rel_pos.indices
+        arrays["rel_pos_data"] = bundle.rel_pos.data
+    else:
+        arrays["rel_pos"] = bundle.rel_pos
+
+    write_array_bundle(filepath, {
+        "version": _BUNDLE_FORMAT_VERSION,
+        "max_look_dist": bundle.max_look_dist,
+        "signed": bundle.signed,
+        "corpus_hash": bundle.corpus_hash,
+        "sparse": isinstance(bundle.rel_pos, CSRMatrix),
+        "shape": list(bundle.rel_pos.shape),
+    }, arrays)
+
+
+@instrumented("load_bundle")
+def load_bundle(filepath: Path, mmap: bool = True) -> ModelBundle:
+    """Loads a model saved by `save_bundle`. If `mmap` is true then the matrices are memory-mapped read-only rather than read into memory"""
+
+    metadata, arrays = read_array_bundle(filepath, mmap=mmap)
+
+    if metadata.get("version") != _BUNDLE_FORMAT_VERSION:
+        raise InvalidArrayBundleError(filepath)
+
+    word_indexes = Vocabulary(decode_strings(arrays["words_blob"], arrays["words_offsets"]))
+
+    rel_pos: Union[npt.NDArray, CSRMatrix]
+
+    if metadata["sparse"]:
+        shape = metadata["shape"]
+        rel_pos = CSRMatrix(arrays["rel_pos_indptr"], arrays["rel_pos_indices"], arrays["rel_pos_data"], (shape[0], shape[1]))
+    else:
+        rel_pos = arrays["rel_pos"]
+
+    return ModelBundle(
+        word_indexes,
+        rel_pos,
+        arrays["principal_components"],
+        arrays["projections"],
+        metadata["max_look_dist"],
+        metadata["signed"],
+        metadata["corpus_hash"]
+    )
+
+
+_NEIGHBOUR_INDEX_FORMAT_VERSION: int = 1
+
+
+@instrumented("save_neighbour_index")
+def save_neighbour_index(filepath: Path, index: NeighbourIndex) -> None:
+    """Saves a neighbour index, including its IVF lists if it has them, so that `load_neighbour_index` can memory-map it"""
+
+    arrays: Dict[str, npt.NDArray] = { "vectors": index.vectors }
+
+    if index.ivf is not None:
+        arrays["ivf_centroids"] = index.ivf.centroids
+        arrays["ivf_offsets"] = index.ivf.offsets
+        arrays["ivf_members"] = index.ivf.members
+
+    write_array_bundle(filepath, {
+        "version": _NEIGHBOUR_INDEX_FORMAT_VERSION,
+        "metric": index.metric,
+    }, arrays)
+
+
+@instrumented("load_neighbour_index")
+def load_neighbour_index(filepath: Path, mmap: bool = True) -> NeighbourIndex:
+
+    metadata, arrays = read_array_bundle(filepath, mmap=mmap)
+
+    if metadata.get("version") != _NEIGHBOUR_INDEX_FORMAT_VERSION:
+        raise InvalidArrayBundleError(filepath)
+
+    ivf: Optional[IVFLists] = None
+
+    if "ivf_centroids" in arrays:
+        ivf = IVFLists(arrays["ivf_centroids"], arrays["ivf_offsets"], arrays["ivf_members"])
+
+    return NeighbourIndex(arrays["vectors"], metadata["metric"], ivf=ivf, normalized=True)
+
+
+_ACCUMULATOR_FORMAT_VERSION: int = 1
+
+
+@instrumented("save_rel_pos_accumulator")
+def save_rel_pos_accumulator(filepath: Path, accumulator: RelPosAccumulator) -> None:
+    """Saves the totals of a relative position accumulator so that more texts can be added to them later"""
+
+    words_blob, words_offsets = encode_strings(accumulator.vocabulary.words)
+    firsts, seconds, counts, dists = accumulator.pair_totals()
+
+    write_array_bundle(filepath, {
+        "version": _ACCUMULATOR_FORMAT_VERSION,
+        "max_look_dist": accumulator.max_look_dist,
+        "section_count": accumulator.section_count,
+        "corpus_hash": accumulator.corpus_hash,
+    }, {
+        "words_blob": words_blob,
+        "words_offsets": words_offsets,
+        "word_counts": accumulator.word_counts,
+        "pair_firsts": firsts.astype(np.int32),
+        "pair_seconds": seconds.astype(np.int32),
+        "pair_counts": counts,
+        "pair_dists": dists,
+    })
+
+
+@instrumented("load_rel_pos_accumulator")
+def load_rel_pos_accumulator(filepath: Path) -> RelPosAccumulator:
+
+    metadata, arrays = read_array_bundle(filepath, mmap=False)
+
+    if metadata.get("version") != _ACCUMULATOR_FORMAT_VERSION:
+        raise InvalidArrayBundleError(filepath)
+
+    return RelPosAccumulator.from_totals(
+        metadata["max_look_dist"],
+        Vocabulary(decode_strings(arrays["words_blob"], arrays["words_offsets"])),
+        arrays["word_counts"],
+        metadata["section_count"],
+        arrays["pair_firsts"],
+        arrays["pair_seconds"],
+        arrays["pair_counts"],
+        arrays["pair_dists"],
+        metadata.get("corpus_hash")
+    )
@@ -0,0 +1,178 @@
+from typing import Tuple, Optional
+import numpy as np
+import numpy.typing as npt
+
+
+_PRODUCT_CHUNK_CELLS: int = 1 << 22
+"""The approximate number of values in the temporary array of products used when multiplying by a sparse matrix"""
+
+
+class CSRMatrix:
+    """A sparse matrix in compressed sparse row (CSR) form, where only some entries are stored.
+
+The stored entries of row i are `data[indptr[i]:indptr[i+1]]`, in the columns `indices[indptr[i]:indptr[i+1]]`, with the columns of each row in increasing order. \
+Entries that aren't stored are missing rather than zero, and what a missing entry means is up to the user of the matrix. \
+When multiplying by the matrix, missing entries count as zero.
+"""
+
+    def __init__(self,
+                 indptr: npt.NDArray[np.int64],
+                 indices: npt.NDArray[np.int32],
+                 data: npt.NDArray,
+                 shape: Tuple[int, int]):
+
+        if (len(indptr) != shape[0]+1) or (len(indices) != len(data)) or (indptr[-1] != len(data)):
+            raise ValueError("Inconsistent sparse matrix arrays")
+
+        self._indptr = np.asarray(indptr, dtype=np.int64)
+        self._indices = np.asarray(indices, dtype=np.int32)
+        self._data = np.asarray(data)
+        self._shape = (int(shape[0]), int(shape[1]))
+
+        self.__rows: Optional[npt.NDArray[np.int64]] = None
+        self.__transposed: Optional[CSRMatrix] = None
+
+    @classmethod
+    def from_flat_keys(cls,
+                       keys: npt.NDArray[np.int64],
+                       data: npt.NDArray,
+                       shape: Tuple[int, int]) -> "CSRMatrix":
+        """Creates a matrix from the flattened indexes (`i*shape[1] + j`) of its stored entries, which must be sorted and unique"""
+
+        rows = keys // shape[1]
+        indptr = np.zeros(shape=(shape[0]+1,), dtype=np.int64)
+        np.cumsum(np.bincount(rows, minlength=shape[0]), out=indptr[1:])
+
+        return cls(indptr, (keys % shape[1]).astype(np.int32), data, shape)
+
+    @classmethod
+    def from_dense(cls, m: npt.NDArray, missing_value: float = 0) -> "CSRMatrix":
+        """Creates a matrix storing the entries of a dense matrix that aren't equal to the missing value"""
+
+        keys = np.flatnonzero(m != missing_value)
+        return cls.from_flat_keys(keys, m.flat[keys], m.shape)
+
+    @property
+    def indptr(self) -> npt.NDArray[np.int64]:
+        return self._indptr
+
+    @property
+    def indices(self) -> npt.NDArray[np.int32]:
+        return self._indices
+
+    @property
+    def data(self) -> npt.NDArray:
+        return self._data
+
+    @property
+    def shape(self) -> Tuple[int, int]:
+        return self._shape
+
+    @property
+    def nnz(self) -> int:
+        """The number of stored entries"""
+        return len(self._data)
+
+    @property
+    def dtype(self) -> np.dtype:
+        return self._data.dtype
+
+    @property
+    def ndim(self) -> int:
+        return 2
+
+    def rows(self) -> npt.NDArray[np.int64]:
+        """Returns the row of each stored entry"""
+
+        if self.__rows is None:
+            self.__rows = np.repeat(np.arange(self._shape[0]), np.diff(self._indptr))
+
+        return self.__rows
+
+    def with_data(self, data: npt.NDArray) -> "CSRMatrix":
+        """Returns a matrix with the same stored entries as this one but with different values for them"""
+
+        if len(data) != self.nnz:
+            raise ValueError("Wrong number of values")
+
+        out = CSRMatrix(self._indptr, self._indices, data, self._shape)
+        out.__rows = self.__rows
+        return out
+
+    def to_dense(self, missing_value: float = 0) -> npt.NDArray:
+        """Returns the matrix as a dense array, with missing entries given the missing value"""
+
+        out = np.full(shape=self._shape, fill_value=missing_value, dtype=self._data.dtype)
+        out[self.rows(), self._indices] = self._data
+        return out
+
+    def transposed(self) -> "CSRMatrix":
+        """Returns the transpose of this matrix. This is kept once created, as multiplying by the transpose uses it"""
+
+        if self.__transposed is None:
+
+            order = np.argsort(self._indices, kind="stable")
+
+            indptr = np.zeros(shape=(self._shape[1]+1,), dtype=np.int64)
+            np.cumsum(np.bincount(self._indices, minlength=self._shape[1]), out=indptr[1:])
+
+            self.__transposed = CSRMatrix(indptr, self.rows()[order].astype(np.int32), self._data[order], (self._shape[1], self._shape[0]))
+            self.__transposed.__transposed = self
+
+        return self.__transposed
+
+    def dot(self, b: npt.NDArray) -> npt.NDArray[np.float64]:
+        """Returns the product of this matrix with a dense matrix or vector `b`"""
+
+        b2 = b.reshape((b.shape[0], -1))
+
+        if b2.shape[0] != self._shape[1]:
+            raise ValueError("Mismatched dimensions")
+
+        out = np.zeros(shape=(self._shape[0], b2.shape[1]), dtype=np.float64)
+
+        # The products of the entries are made for blocks of rows at a time to bound the memory used by them
+
+        max_entries = max(1, _PRODUCT_CHUNK_CELLS // max(1, b2.shape[1]))
+        row_start = 0
+
+        while row_start < self._shape[0]:
+
+            row_stop = int(np.searchsorted(self._indptr, self._indptr[row_start] + max_entries, side="right")) - 1
+            row_stop = min(max(row_stop, row_start+1), self._shape[0])
+
+            start, stop = self._indptr[row_start], self._indptr[row_stop]
+
+            if start < stop:
+
+                products = self._data[start:stop,np.newaxis] * b2[self._indices[start:stop]]
+
+                row_offsets = self._indptr[row_start:row_stop] - start
+                nonempty = np.flatnonzero(np.diff(self._indptr[row_start:row_stop+1]) > 0)
+
+                out[row_start + nonempty] = np.add.reduceat(products, row_offsets[nonempty], axis=0)
+
+            row_start = row_stop
+
+        return out.reshape((self._shape[0],) + b.shape[1:])
+
+    def transpose_dot(self, b: npt.NDArray) -> npt.NDArray[np.float64]:
+        """Returns the product of the transpose of this matrix with a dense matrix or vector `b`"""
+        return self.transposed().dot(b)
+
+    def __matmul__(self, b: npt.NDArray) -> npt.NDArray[np.float64]:
+        return self.dot(b)
+
+    def value_at(self, i: int, j: int, missing_value: float = 0) -> float:
+        """Returns a single entry of the matrix, or the missing value if it isn't stored"""
+
+        if not ((0 <= i < self._shape[0]) and (0 <= j < self._shape[1])):
+            raise IndexError((i, j))
+
+        start, stop = self._indptr[i], self._indptr[i+1]
+        position = start + int(np.searchsorted(self._indices[start:stop], j))
+
+        if (position < stop) and (self._indices[position] == j):
+            return float(self._data[position])
+
+        return missing_value
@@ -0,0 +1,70 @@
+import pytest
+import numpy as np
+from pathlib import Path
+from array_bundle import write_array_bundle, read_array_bundle, encode_strings, decode_strings, InvalidArrayBundleError
+
+
+_ARRAYS = {
+    "a": np.arange(10, dtype=np.float32).reshape((2, 5)),
+    "b": np.array([1, -2, 3], dtype=np.int64),
+    "empty": np.zeros(shape=(0, 3), dtype=np.int32),
+    "c": np.frombuffer(b"xyz", dtype=np.uint8),
+}
+
+
+@pytest.mark.parametrize("mmap", [False, True])
+def test_round_trip(tmp_path: Path, mmap: bool):
+
+    write_array_bundle(tmp_path/"x.bundle", { "name": "test", "n": 3 }, _ARRAYS)
+
+    metadata, arrays = read_array_bundle(tmp_path/"x.bundle", mmap=mmap)
+
+    assert metadata == { "name": "test", "n": 3 }
+    assert list(arrays) == list(_ARRAYS)
+
+    for name, array in _ARRAYS.items():
+        assert arrays[name].dtype == array.dtype
+        assert np.array_equal(arrays[name], array)
+
+    if mmap:
+        assert isinstance(arrays["a"], np.memmap)
+
+
+def test_arrays_aligned(tmp_path: Path):
+
+    write_array_bundle(tmp_path/"x.bundle", {}, _ARRAYS)
+
+    _, arrays = read_array_bundle(tmp_path/"x.bundle")
+
+    for name in ["a", "b", "c"]:
+        assert isinstance(arrays[name], np.memmap)
+        assert arrays[name].offset % 64 == 0
+
+
+def test_invalid_file(tmp_path: Path):
+
+    (tmp_path/"x.bundle").write_bytes(b"not a bundle")
+
+    with pytest.raises(InvalidArrayBundleError):
+        read_array_bundle(tmp_path/"x.bundle")
+
+
+def test_truncated_file(tmp_path: Path):
+
+    write_array_bundle(tmp_path/"x.bundle", {}, _ARRAYS)
+
+    data = (tmp_path/"x.bundle").read_bytes()
+    (tmp_path/"x.bundle").write_bytes(data[:-64])
+
+    with pytest.raises(InvalidArrayBundleError):
+        read_array_bundle(tmp_path/"x.bundle")
+
+
+@pytest.mark.parametrize("strings", [
+    [],
+    [""],
+    ["a", "bc", "", "d:e", "ünï\ncode"],
+])
+def test_strings_round_trip(strings):
+    blob, offsets = encode_strings(strings)
+    assert decode_strings(blob, offsets) == strings
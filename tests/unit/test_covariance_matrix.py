@@ -119,3 +119,23 @@ def test_dimensions(xs: npt.NDArray):
 def test_values(xs: npt.NDArray, ys: npt.NDArray):
     out = covariance_matrix(xs)
     assert_matrices_proportional(out, ys)
+
+
+@pytest.mark.parametrize("chunk_rows", [1, 2, 3, 100])
+@pytest.mark.parametrize(("xs", "ys"), _CASES)
+def test_chunking(xs: npt.NDArray, ys: npt.NDArray, chunk_rows: int):
+    out = covariance_matrix(xs, chunk_rows=chunk_rows)
+    assert out.dtype == np.float32
+    assert_matrices_proportional(out, ys)
+
+
+def test_large_matches_outer_products():
+
+    rng = np.random.default_rng(0)
+    xs = rng.normal(size=(300, 40)).astype(np.float32)
+
+    expected = np.zeros(shape=(40, 40), dtype=np.float64)
+    for row in xs.astype(np.float64):
+        expected += np.outer(row, row)
+
+    assert_arrays_close(covariance_matrix(xs, chunk_rows=64), expected, rtol=1e-4, atol=1e-3)
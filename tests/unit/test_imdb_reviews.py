@@ -0,0 +1,32 @@
+from itertools import islice
+import pytest
+from example_data.text.imdb_reviews import review_filepaths, iter_reviews, load_reviews
+
+
+def test_filepaths_sorted_by_id():
+
+    filepaths = review_filepaths()
+    first_directory = [path for path in filepaths if path.parent == filepaths[0].parent]
+
+    assert len(set(filepaths)) == len(filepaths)
+    assert [int(path.stem.split("_")[0]) for path in first_directory] == sorted(int(path.stem.split("_")[0]) for path in first_directory)
+
+
+def test_threaded_matches_serial():
+
+    serial = load_reviews(workers=1)
+
+    assert len(serial) == len(review_filepaths())
+    assert load_reviews(workers=4) == serial
+
+
+def test_stream_in_order():
+
+    filepaths = review_filepaths()
+
+    assert list(islice(iter_reviews(workers=3), 200)) == [path.read_text(encoding="UTF-8") for path in filepaths[:200]]
+
+
+def test_invalid_workers():
+    with pytest.raises(ValueError):
+        next(iter_reviews(workers=0))
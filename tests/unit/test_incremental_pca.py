@@ -0,0 +1,66 @@
+import pytest
+import numpy as np
+from _test_util import *
+from pca import DimensionTooHighError, IncrementalPCA, pca
+
+
+def _data(P: int, M: int, seed: int = 0) -> npt.NDArray[np.float32]:
+    rng = np.random.default_rng(seed)
+    return (rng.standard_normal((P, M)) * np.linspace(10, 1, M)).astype(np.float32)
+
+
+@pytest.mark.parametrize(("batch_rows", "N"), [
+    (1, 2),
+    (7, 3),
+    (50, 5),
+    (200, 5),
+])
+def test_matches_pca(batch_rows: int, N: int):
+
+    xs = _data(200, 8)
+
+    model = IncrementalPCA(N)
+    for start in range(0, xs.shape[0], batch_rows):
+        model.partial_fit(xs[start:start+batch_rows])
+
+    assert model.n_samples_seen_ == xs.shape[0]
+
+    expected = pca(xs, N)
+    out = model.transform(xs)
+
+    assert out.shape == expected.shape
+    out = out * np.where(np.sum(out * expected, axis=0) < 0, -1, 1)
+    assert np.allclose(out, expected, atol=1e-2)
+
+
+def test_refits_after_new_rows():
+
+    xs = _data(100, 6)
+    ys = _data(100, 6, seed=1)[:,::-1]
+
+    model = IncrementalPCA(2).partial_fit(xs)
+    before = model.components_.copy()
+
+    model.partial_fit(ys)
+    after = model.components_
+
+    expected = IncrementalPCA(2).partial_fit(np.concatenate([xs, ys])).components_
+
+    assert not np.allclose(np.abs(before), np.abs(after), atol=1e-2)
+    assert np.allclose(np.abs(np.sum(after * expected, axis=1)), 1, atol=1e-4)
+
+
+def test_unfitted():
+    with pytest.raises(ValueError):
+        IncrementalPCA(1).components_
+
+
+def test_mismatched_columns():
+    model = IncrementalPCA(1).partial_fit(np.ones(shape=(2, 3), dtype=np.float32))
+    with pytest.raises(ValueError):
+        model.partial_fit(np.ones(shape=(2, 4), dtype=np.float32))
+
+
+def test_too_many_components():
+    with pytest.raises(DimensionTooHighError):
+        IncrementalPCA(4).partial_fit(np.ones(shape=(2, 3), dtype=np.float32))
@@ -0,0 +1,130 @@
+from typing import Iterator
+from pathlib import Path
+import json
+import sys
+import numpy as np
+import pytest
+import instrumentation
+from instrumentation import span, count, instrumented
+from tokenizing import tokenize
+from text_source import RawTextSource
+from learn import learn_word_rel_pos
+from pca import covariance_matrix, principal_components
+from saved_models import save_matrix, load_matrix
+
+
+@pytest.fixture
+def enabled() -> Iterator[None]:
+    instrumentation.enable(sample_interval=None)
+    try:
+        yield
+    finally:
+        instrumentation.disable()
+
+
+def test_disabled_does_nothing():
+
+    assert not instrumentation.is_enabled()
+    assert instrumentation.report() is None
+    assert instrumentation.disable() is None
+
+    with span("a"):
+        count("things", 3)
+
+    @instrumented("f")
+    def f(x: int) -> int:
+        return x + 1
+
+    assert f(1) == 2
+
+
+def test_spans_and_counters(enabled: None):
+
+    @instrumented("outer")
+    def outer() -> None:
+        count("items", 2)
+        with span("inner"):
+            count("items", 5)
+        with span("inner"):
+            count("items", 1)
+
+    outer()
+    outer()
+
+    spans = instrumentation.report()["spans"]  # type: ignore
+
+    assert set(spans) == { "outer", "outer/inner" }
+    assert spans["outer"]["calls"] == 2
+    assert spans["outer"]["counters"] == { "items": 4 }
+    assert spans["outer/inner"]["calls"] == 4
+    assert spans["outer/inner"]["counters"] == { "items": 12 }
+    assert spans["outer"]["seconds"] >= spans["outer"]["max_seconds"] > 0
+    assert spans["outer"]["rates"]["items_per_s"] == pytest.approx(4 / spans["outer"]["seconds"])
+
+
+def test_span_ended_by_exception(enabled: None):
+
+    with pytest.raises(ValueError):
+        with span("failing"):
+            raise ValueError()
+
+    with span("after"):
+        pass
+
+    assert set(instrumentation.report()["spans"]) == { "failing", "after" }  # type: ignore
+
+
+def test_memory_sampled():
+
+    instrumentation.enable(sample_interval=0.001)
+
+    with span("allocating"):
+        data = np.ones(shape=(1 << 24,), dtype=np.uint8)
+        del data
+
+    report = instrumentation.disable()
+
+    assert report is not None
+    assert report["spans"]["allocating"]["peak_rss_mb"] > 0
+    assert report["peak_rss_mb"] >= report["spans"]["allocating"]["peak_rss_mb"]
+
+
+def test_pipeline_instrumented(enabled: None, tmp_path: Path):
+
+    tokens = tokenize("one two. three")
+    source = RawTextSource("one two. three two one. two")
+    source.read_all_sections()
+    matrix, _ = learn_word_rel_pos(source, max_look_dist=3)
+    mapped = np.where(np.isfinite(matrix), matrix, 0)
+    principal_components(covariance_matrix(mapped))
+    save_matrix(tmp_path/"m.npy", mapped)
+    load_matrix(tmp_path/"m.npy")
+
+    instrumentation.write_report(tmp_path/"report.json")
+    spans = json.loads((tmp_path/"report.json").read_text())["spans"]
+
+    assert spans["tokenize"]["counters"] == { "characters": 14, "tokens": len(tokens) }
+    assert spans["read_all_sections"]["counters"] == { "sections": 3, "tokens": 6 }
+    assert spans["learn_word_rel_pos"]["counters"]["tokens"] == 6
+    assert spans["learn_word_rel_pos"]["counters"]["pairs"] > 0
+    assert spans["covariance_matrix"]["counters"] == { "rows": 3 }
+    assert spans["principal_components"]["counters"] == { "components": 3 }
+    assert {"save_matrix", "load_matrix"} <= set(spans)
+
+
+def test_write_report_disabled(tmp_path: Path):
+    with pytest.raises(ValueError):
+        instrumentation.write_report(tmp_path/"report.json")
+
+
+def test_without_resource_module(monkeypatch: pytest.MonkeyPatch):
+
+    # The resource module doesn't exist on Windows, which also has no /proc
+
+    def no_file(*args, **kwargs):
+        raise OSError()
+
+    monkeypatch.setitem(sys.modules, "resource", None)
+    monkeypatch.setattr(instrumentation, "open", no_file, raising=False)
+
+    assert instrumentation._current_rss() == 0
@@ -1,8 +1,10 @@
-from typing import Dict, List, Tuple, Iterable
+from typing import Dict, List, Tuple, Iterable, Optional
 import numpy as np
 import pytest
-from learn import learn_word_rel_pos
+import learn
+from learn import learn_word_rel_pos, learn_word_rel_pos_both
 from text_source import RawTextSource
+from example_data.text.wikipedia_articles import load_text as load_wikipedia_text
 
 
 _CASES: List[Tuple[str, Iterable[Tuple[Tuple[str, str], Tuple[float, float]]], int, int]] = [
@@ -152,3 +154,124 @@ def test_values_signed(in_text: str, tests: Dict[Tuple[str, str], Tuple[float, f
         i2 = word_indexes.get_to(pair[1])
 
         assert np.isclose(mat[i1,i2], exp_vals[1]), f"Failed with {pair[0]}-{pair[1]}. Expected {exp_vals[1]}, got {mat[i1,i2]}"
+
+
+def _reference_word_rel_pos(sections: List[List[str]], max_look_dist: int, signed: bool) -> Dict[Tuple[str, str], float]:
+    """Straightforward implementation of the average distances between each pair of words to compare against"""
+
+    tot_dists: Dict[Tuple[str, str], int] = {}
+    counts: Dict[Tuple[str, str], int] = {}
+
+    for section in sections:
+        for i, word_1 in enumerate(section):
+            for j in range(max(0, i-max_look_dist), min(i+max_look_dist+1, len(section))):
+                if i != j:
+                    pair = (word_1, section[j])
+                    tot_dists[pair] = tot_dists.get(pair, 0) + ((j-i) if signed else abs(j-i))
+                    counts[pair] = counts.get(pair, 0) + 1
+
+    return { pair: tot_dists[pair] / counts[pair] for pair in counts }
+
+
+_REFERENCE_TEXTS: List[str] = [
+    "the cat sat on the mat. the dog sat on the cat\nthe end",
+    "a b a b a b a. c. a c a c",
+    load_wikipedia_text("frances-cleveland")[:5000],
+]
+
+
+@pytest.mark.parametrize("signed", [False, True])
+@pytest.mark.parametrize("max_look_dist", [1, 3, 20])
+@pytest.mark.parametrize("in_text", _REFERENCE_TEXTS)
+def test_matches_reference(in_text: str, max_look_dist: int, signed: bool):
+
+    source = RawTextSource(in_text)
+    sections = [[token.word for token in section] for section in source.read_all_sections()]
+
+    expected = _reference_word_rel_pos(sections, max_look_dist, signed)
+
+    mat, word_indexes = learn_word_rel_pos(source, max_look_dist=max_look_dist, signed=signed)
+
+    assert mat.shape[0] == word_indexes.size == len({ word for section in sections for word in section })
+
+    for word_1 in word_indexes.iterate_to():
+        for word_2 in word_indexes.iterate_to():
+            value = mat[word_indexes.get_to(word_1), word_indexes.get_to(word_2)]
+            if (word_1, word_2) in expected:
+                assert np.isclose(value, expected[(word_1, word_2)]), f"Failed with {word_1}-{word_2}"
+            else:
+                assert value == np.inf, f"Failed with {word_1}-{word_2}"
+
+
+def test_most_common_words_kept():
+
+    source = RawTextSource("c b a b a a. d d d d")
+
+    mat, word_indexes = learn_word_rel_pos(source, max_look_dist=5, word_count_max=2)
+
+    assert mat.shape == (2, 2)
+    assert set(word_indexes.iterate_to()) == { "a", "d" }
+
+
+@pytest.mark.parametrize(("in_text", "tests", "max_look_dist", "word_count_max"), _CASES)
+def test_both_matches_separate(in_text: str, tests: Dict[Tuple[str, str], Tuple[float, float]], max_look_dist: int, word_count_max: int):
+
+    source = RawTextSource(in_text)
+
+    unsigned_mat, signed_mat, word_indexes = learn_word_rel_pos_both(source, max_look_dist=max_look_dist, word_count_max=word_count_max)
+
+    exp_unsigned_mat, exp_unsigned_word_indexes = learn_word_rel_pos(source, max_look_dist=max_look_dist, signed=False, word_count_max=word_count_max)
+    exp_signed_mat, exp_signed_word_indexes = learn_word_rel_pos(source, max_look_dist=max_look_dist, signed=True, word_count_max=word_count_max)
+
+    assert list(word_indexes.iterate_to()) == list(exp_unsigned_word_indexes.iterate_to()) == list(exp_signed_word_indexes.iterate_to())
+    assert np.array_equal(unsigned_mat, exp_unsigned_mat)
+    assert np.array_equal(signed_mat, exp_signed_mat)
+
+
+def test_discarded_words_keep_distances():
+
+    source = RawTextSource("a x b a y b")
+
+    unsigned_mat, signed_mat, word_indexes = learn_word_rel_pos_both(source, max_look_dist=5, word_count_max=2)
+
+    a = word_indexes.get_to("a")
+    b = word_indexes.get_to("b")
+
+    assert word_indexes.size == 2
+    assert np.isclose(unsigned_mat[a,b], 2.5)
+    assert np.isclose(signed_mat[a,b], 2)
+    assert np.isclose(unsigned_mat[a,a], 3)
+
+
+@pytest.mark.parametrize("word_count_max", [None, 50])
+def test_workers_match_serial(word_count_max: Optional[int], monkeypatch: pytest.MonkeyPatch):
+
+    # The text is smaller than the minimum shard size, which is lowered so that it is still split between the workers
+
+    monkeypatch.setattr(learn, "_SHARD_MIN_TOKENS", 100)
+
+    source = RawTextSource(load_wikipedia_text("github")[:20000])
+
+    serial = learn_word_rel_pos_both(source, max_look_dist=10, word_count_max=word_count_max)
+    parallel = learn_word_rel_pos_both(source, max_look_dist=10, word_count_max=word_count_max, workers=3)
+
+    assert list(serial[2].iterate_to()) == list(parallel[2].iterate_to())
+    assert np.array_equal(serial[0], parallel[0])
+    assert np.array_equal(serial[1], parallel[1])
+
+
+@pytest.mark.parametrize("word_count_max", [None, 50])
+@pytest.mark.parametrize("in_text", _REFERENCE_TEXTS)
+def test_sparse_matches_dense(in_text: str, word_count_max: Optional[int]):
+
+    source = RawTextSource(in_text)
+
+    unsigned_mat, signed_mat, word_indexes = learn_word_rel_pos_both(source, max_look_dist=10, word_count_max=word_count_max)
+    sparse_unsigned_mat, sparse_signed_mat, sparse_word_indexes = learn_word_rel_pos_both(source, max_look_dist=10, word_count_max=word_count_max, sparse=True)
+    sparse_single_mat, _ = learn_word_rel_pos(source, max_look_dist=10, signed=True, word_count_max=word_count_max, sparse=True)
+
+    assert list(word_indexes.iterate_to()) == list(sparse_word_indexes.iterate_to())
+    assert sparse_unsigned_mat.nnz == np.count_nonzero(np.isfinite(unsigned_mat))
+    assert np.array_equal(sparse_unsigned_mat.to_dense(np.inf), unsigned_mat)
+    assert np.array_equal(sparse_signed_mat.to_dense(np.inf), signed_mat)
+    assert np.array_equal(sparse_single_mat.to_dense(np.inf), signed_mat)
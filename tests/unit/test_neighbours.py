@@ -0,0 +1,110 @@
+import pytest
+import numpy as np
+from neighbours import NeighbourIndex, nearest_words
+from vocabulary import Vocabulary
+
+
+def _clustered_vectors(N: int, D: int, clusters: int, seed: int = 0) -> np.ndarray:
+    rng = np.random.default_rng(seed)
+    centres = rng.standard_normal((clusters, D)) * 5
+    return (centres[rng.integers(0, clusters, N)] + rng.standard_normal((N, D))).astype(np.float32)
+
+
+def _brute_force(vectors: np.ndarray, queries: np.ndarray, k: int, metric: str):
+    if metric == "cosine":
+        v = vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+        q = queries / np.linalg.norm(queries, axis=1, keepdims=True)
+        values = q @ v.T
+        order = np.argsort(-values, axis=1, kind="stable")[:,:k]
+    else:
+        values = np.linalg.norm(queries[:,np.newaxis,:] - vectors[np.newaxis,:,:], axis=2)
+        order = np.argsort(values, axis=1, kind="stable")[:,:k]
+    return order, np.take_along_axis(values, order, axis=1)
+
+
+@pytest.mark.parametrize("metric", ["cosine", "euclidean"])
+@pytest.mark.parametrize("k", [1, 5, 300])
+def test_exact_matches_brute_force(metric: str, k: int):
+
+    vectors = _clustered_vectors(200, 8, 5)
+    queries = _clustered_vectors(30, 8, 5, seed=1)
+
+    index = NeighbourIndex(vectors, metric=metric)  # type: ignore
+    indexes, values = index.query(queries, k)
+
+    exp_indexes, exp_values = _brute_force(vectors, queries, k, metric)
+    found = min(k, len(vectors))
+
+    assert indexes.shape == values.shape == (30, k)
+    assert np.allclose(values[:,:found], exp_values, atol=1e-4)
+    assert np.mean(indexes[:,:found] == exp_indexes) > 0.99
+    assert np.all(indexes[:,found:] == -1)
+    assert np.all(np.isnan(values[:,found:]))
+
+
+def test_exact_in_chunks(monkeypatch: pytest.MonkeyPatch):
+
+    import neighbours
+    monkeypatch.setattr(neighbours, "_QUERY_CHUNK_CELLS", 100)
+
+    vectors = _clustered_vectors(50, 4, 3)
+    queries = _clustered_vectors(20, 4, 3, seed=1)
+
+    indexes, values = NeighbourIndex(vectors, metric="euclidean").query(queries, 3)
+    exp_indexes, exp_values = _brute_force(vectors, queries, 3, "euclidean")
+
+    assert np.array_equal(indexes, exp_indexes)
+    assert np.allclose(values, exp_values, atol=1e-4)
+
+
+def test_single_query():
+
+    vectors = _clustered_vectors(40, 4, 3)
+    index = NeighbourIndex(vectors)
+
+    indexes, values = index.query(vectors[7], 3)
+
+    assert indexes.shape == values.shape == (3,)
+    assert indexes[0] == 7
+    assert np.isclose(values[0], 1)
+
+
+@pytest.mark.parametrize("metric", ["cosine", "euclidean"])
+def test_approximate_recall(metric: str):
+
+    vectors = _clustered_vectors(2000, 16, 20)
+    queries = _clustered_vectors(100, 16, 20, seed=1)
+
+    index = NeighbourIndex(vectors, metric=metric)  # type: ignore
+    index.build_ivf(list_count=40)
+
+    assert index.ivf is not None
+    assert np.array_equal(np.sort(index.ivf.members), np.arange(len(vectors)))
+
+    exact, _ = index.query(queries, 10)
+    approximate, _ = index.query(queries, 10, approximate=True, probes=8)
+
+    recall = np.mean([len(set(a) & set(e)) / 10 for a, e in zip(approximate, exact)])
+    assert recall > 0.9
+
+    # Looking in every list gives the exact results
+
+    everything, _ = index.query(queries, 10, approximate=True, probes=40)
+    assert np.array_equal(everything, exact)
+
+
+def test_approximate_needs_ivf():
+    with pytest.raises(ValueError):
+        NeighbourIndex(_clustered_vectors(10, 2, 2)).query(np.ones(2), 1, approximate=True)
+
+
+def test_nearest_words():
+
+    vocabulary = Vocabulary(["a", "b", "c", "d"])
+    vectors = np.array([[1, 0], [0.9, 0.1], [0, 1], [-1, 0]], dtype=np.float32)
+
+    neighbours = nearest_words(NeighbourIndex(vectors), vocabulary, ["a", "c"], 2)
+
+    assert [word for word, _ in neighbours[0]] == ["b", "c"]
+    assert [word for word, _ in neighbours[1]] == ["b", "a"]
+    assert np.isclose(neighbours[1][1][1], 0)
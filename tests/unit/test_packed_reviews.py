@@ -0,0 +1,61 @@
+from pathlib import Path
+import numpy as np
+import pytest
+from example_data.text.imdb_reviews import review_filepaths, load_reviews, load_reviews_joined
+from example_data.text.imdb_reviews.packed import pack_reviews, PackedReviews, SPLITS, SENTIMENTS
+from array_bundle import InvalidArrayBundleError, write_array_bundle
+
+
+@pytest.fixture(scope="module")
+def packed(tmp_path_factory: pytest.TempPathFactory) -> PackedReviews:
+    filepath = tmp_path_factory.mktemp("packed")/"reviews.bundle"
+    pack_reviews(filepath)
+    return PackedReviews(filepath)
+
+
+def test_matches_files(packed: PackedReviews):
+    assert packed.load_reviews() == load_reviews()
+    assert packed.load_reviews_joined() == load_reviews_joined()
+
+
+def test_indexing(packed: PackedReviews):
+
+    filepaths = review_filepaths()
+
+    assert len(packed) == len(filepaths)
+
+    for i in [0, 1, 12_499, 12_500, len(filepaths)-1]:
+        assert packed[i] == filepaths[i].read_text(encoding="UTF-8")
+
+    assert packed[-1] == packed[len(packed)-1]
+
+    with pytest.raises(IndexError):
+        packed[len(packed)]
+
+
+def test_labels(packed: PackedReviews):
+
+    for i, path in enumerate(review_filepaths()[::997]):
+        i *= 997
+        review_id, rating = path.stem.split("_")
+        assert packed.review_ids[i] == int(review_id)
+        assert packed.ratings[i] == int(rating)
+        assert SPLITS[packed.splits[i]] == path.parent.parent.name
+        assert SENTIMENTS[packed.sentiments[i]] == path.parent.name
+
+
+def test_indexes_of(packed: PackedReviews):
+
+    positive_tests = packed.indexes_of(split="testing", sentiment="pos")
+
+    assert np.all(packed.ratings[positive_tests] >= 7)
+    assert np.all(packed.splits[positive_tests] == SPLITS.index("testing"))
+    assert len(packed.indexes_of()) == len(packed)
+
+
+def test_invalid_version(tmp_path: Path):
+
+    write_array_bundle(tmp_path/"x.bundle", { "version": 0 }, {})
+
+    with pytest.raises(InvalidArrayBundleError):
+        PackedReviews(tmp_path/"x.bundle")
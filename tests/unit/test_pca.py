@@ -173,7 +173,18 @@ def test_dimensions(xs: npt.NDArray, N: int, ys: npt.NDArray):
     assert out.shape[1] == N
 
 
+def _match_component_signs(out: npt.NDArray, ys: npt.NDArray) -> npt.NDArray:
+    """Principal components are only defined up to their sign, so this flips the projections onto any component that points the opposite way to the expected one"""
+    return out * np.where(np.sum(out * ys, axis=0) < 0, -1, 1)
+
+
 @pytest.mark.parametrize(("xs", "N", "ys"), _CASES)
 def test_values(xs: npt.NDArray, N: int, ys: npt.NDArray):
-    out = pca(xs, N)
+    out = _match_component_signs(pca(xs, N), ys)
+    assert_vectors_colinear(ys, out, allow_zero=True, atol=0.1)
+
+
+@pytest.mark.parametrize(("xs", "N", "ys"), _CASES)
+def test_truncated_values(xs: npt.NDArray, N: int, ys: npt.NDArray):
+    out = _match_component_signs(pca(xs, N, truncated=True), ys)
     assert_vectors_colinear(ys, out, allow_zero=True, atol=0.1)
@@ -1,6 +1,7 @@
 import pytest
 import numpy as np
 from _test_util import *
+import pca
 from pca import principal_components
 
 
@@ -86,3 +87,81 @@ def test_dimensions(xs: npt.NDArray):
 def test_values(xs: npt.NDArray, ys: npt.NDArray):
     out = principal_components(xs)
     assert_vectors_colinear(out, ys)
+
+
+@pytest.mark.parametrize(("xs", "ys"), _CASES)
+def test_top_k(xs: npt.NDArray, ys: npt.NDArray):
+    for k in range(xs.shape[0]+1):
+        out = principal_components(xs, k)
+        assert out.shape == (k, xs.shape[0])
+        assert_vectors_colinear(out, ys[:k], allow_zero=True)
+
+
+def test_real_output():
+    out = principal_components(np.array([[2, 1], [1, 2]], dtype=np.float32))
+    assert out.dtype == np.float32
+
+
+def _decaying_spectrum_matrix(M: int, seed: int) -> npt.NDArray:
+    rng = np.random.default_rng(seed)
+    q, _ = np.linalg.qr(rng.standard_normal(size=(M, M)))
+    evals = 100 * (0.7 ** np.arange(M))
+    return (q * evals) @ q.T
+
+
+@pytest.mark.parametrize("k", [1, 3, 10])
+def test_iterative_matches_direct(k: int, monkeypatch: pytest.MonkeyPatch):
+
+    m = _decaying_spectrum_matrix(120, seed=k)
+
+    expected = principal_components(m, k)
+
+    monkeypatch.setattr(pca, "_DIRECT_EIGENSOLVER_MAX_DIM", 10)
+
+    out = principal_components(m, k)
+
+    assert out.shape == (k, 120)
+    assert_arrays_close(np.linalg.norm(out, axis=1), np.ones(k), atol=1e-6)
+    assert_arrays_close(np.abs(np.sum(out * expected, axis=1)), np.ones(k), atol=1e-4)
+
+
+def test_iterative_falls_back_to_direct(monkeypatch: pytest.MonkeyPatch):
+
+    m = _decaying_spectrum_matrix(120, seed=0)
+
+    expected = principal_components(m, 3)
+
+    # A single iteration doesn't converge, so the direct eigendecomposition is used instead
+
+    monkeypatch.setattr(pca, "_DIRECT_EIGENSOLVER_MAX_DIM", 10)
+    monkeypatch.setattr(pca, "_SUBSPACE_MAX_ITERATIONS", 1)
+
+    assert np.array_equal(principal_components(m, 3), expected)
+
+
+def test_iterative_converges_on_large_matrix(monkeypatch: pytest.MonkeyPatch):
+
+    # The eigenvalues are like those of the covariance matrices of word relative positions, with a few large eigenvalues followed by a slowly decaying tail of close ones
+
+    M = 2100
+    k = 50
+
+    rng = np.random.default_rng(0)
+    q, _ = np.linalg.qr(rng.standard_normal(size=(M, M)))
+    evals = np.concatenate(([1, 0.1, 0.01], 0.005 * (1 + np.arange(M-3) / 3) ** -0.35))
+    m = ((q * evals) @ q.T).astype(np.float32)
+
+    converged = []
+    leading_eigenvectors = pca._leading_eigenvectors
+
+    def spy(*args, **kwargs):
+        result = leading_eigenvectors(*args, **kwargs)
+        converged.append(result[1])
+        return result
+
+    monkeypatch.setattr(pca, "_leading_eigenvectors", spy)
+
+    out = principal_components(m, k)
+
+    assert converged == [True]
+    assert_arrays_close(np.abs(np.sum(out * q[:,:k].T, axis=1)), np.ones(k), atol=1e-3)
@@ -0,0 +1,174 @@
+import asyncio
+import json
+import math
+import pytest
+import numpy as np
+from query_server import WordQueryService, LatencyHistogram, start_server, _LRUCache
+from saved_models import ModelBundle
+from sparse_matrix import CSRMatrix
+from vocabulary import Vocabulary
+from neighbours import NeighbourIndex
+
+
+_WORDS = ["a", "b", "c", "d"]
+
+
+def _service(sparse: bool = False, **kwargs) -> WordQueryService:
+
+    rel_pos = np.array([
+        [0.1, 0.2, np.inf, 0.4],
+        [0.2, 0.1, 0.3, np.inf],
+        [np.inf, 0.3, 0.1, 0.5],
+        [0.4, np.inf, 0.5, 0.1],
+    ], dtype=np.float32)
+
+    projections = np.array([[1, 0], [0.9, 0.1], [0, 1], [-1, 0]], dtype=np.float32)
+
+    bundle = ModelBundle(
+        Vocabulary(_WORDS),
+        CSRMatrix.from_dense(rel_pos, missing_value=np.inf) if sparse else rel_pos,
+        np.identity(2, dtype=np.float32),
+        projections,
+        max_look_dist=5,
+        signed=False
+    )
+
+    return WordQueryService(bundle, **kwargs)
+
+
+def test_lookup():
+
+    # The projection is given as it is, rather than normalized as the cosine index stores it
+
+    status, body = asyncio.run(_service().handle("/lookup", { "word": "b" }))
+    assert status == 200
+    assert body["index"] == 1
+    assert np.allclose(body["vector"], [0.9, 0.1])
+
+
+def test_neighbours():
+    status, body = asyncio.run(_service().handle("/neighbours", { "word": "a", "k": "2" }))
+    assert status == 200
+    assert [neighbour["word"] for neighbour in body["neighbours"]] == ["b", "c"]
+    assert all("similarity" in neighbour for neighbour in body["neighbours"])
+
+
+def test_euclidean_neighbours():
+
+    projections = np.array([[1, 0], [0.9, 0.1], [0, 1], [-1, 0]], dtype=np.float32)
+
+    status, body = asyncio.run(_service(index=NeighbourIndex(projections, metric="euclidean")).handle("/neighbours", { "word": "a", "k": "2" }))
+    assert status == 200
+    assert [neighbour["word"] for neighbour in body["neighbours"]] == ["b", "c"]
+    assert np.allclose([neighbour["distance"] for neighbour in body["neighbours"]], [math.sqrt(0.02), math.sqrt(2)])
+
+
+@pytest.mark.parametrize("sparse", [False, True])
+def test_distance(sparse: bool):
+
+    service = _service(sparse=sparse)
+
+    status, body = asyncio.run(service.handle("/distance", { "a": "a", "b": "d" }))
+    assert status == 200
+    assert np.isclose(body["rel_pos"], 0.4)
+    assert np.isclose(body["similarity"], -1)
+
+    _, body = asyncio.run(service.handle("/distance", { "a": "a", "b": "c" }))
+    assert body["rel_pos"] is None
+
+
+@pytest.mark.parametrize(("path", "params", "status"), [
+    ("/lookup", { "word": "zzz" }, 404),
+    ("/lookup", {}, 400),
+    ("/neighbours", { "word": "a", "k": "x" }, 400),
+    ("/neighbours", { "word": "a", "approximate": "1" }, 400),
+    ("/nothing", {}, 404),
+])
+def test_errors(path, params, status: int):
+    assert asyncio.run(_service().handle(path, params))[0] == status
+
+
+def test_cache():
+
+    service = _service(cache_size=1)
+
+    async def run():
+        await service.handle("/lookup", { "word": "a" })
+        await service.handle("/lookup", { "word": "a" })
+        await service.handle("/lookup", { "word": "b" })
+        await service.handle("/lookup", { "word": "a" })
+
+    asyncio.run(run())
+
+    assert service.stats()["cache"] == { "size": 1, "hits": 1, "misses": 3 }
+
+
+def test_lru_eviction():
+
+    cache = _LRUCache(2)
+    cache.put("a", 1)
+    cache.put("b", 2)
+    cache.get("a")
+    cache.put("c", 3)
+
+    assert cache.get("b") is None
+    assert cache.get("a") == 1
+    assert cache.get("c") == 3
+
+
+def test_neighbour_queries_batched():
+
+    service = _service(max_batch=3, max_wait=10)
+
+    async def run():
+        return await asyncio.gather(*[service.handle("/neighbours", { "word": word, "k": "1" }) for word in ["a", "b", "c"]])
+
+    results = asyncio.run(run())
+
+    assert [body["neighbours"][0]["word"] for _, body in results] == ["b", "a", "b"]
+    assert service.stats()["neighbour_batches"] == { "count": 1, "mean_size": 3 }
+
+
+def test_latency_histogram():
+
+    histogram = LatencyHistogram()
+
+    for seconds in [1e-6, 1e-4, 1e-4, 1e-3, 100]:
+        histogram.record(seconds)
+
+    assert histogram.count == 5
+    assert histogram.percentile(20) == 1e-5
+    assert 1e-4 <= histogram.percentile(60) < 2e-4
+    assert histogram.percentile(100) == math.inf
+
+
+def test_http():
+
+    service = _service()
+
+    async def request(reader, writer, target: str):
+        writer.write(f"GET {target} HTTP/1.1\r\nHost: localhost\r\n\r\n".encode())
+        await writer.drain()
+        status_line = await reader.readline()
+        headers = {}
+        while (line := await reader.readline()) != b"\r\n":
+            name, _, value = line.decode().partition(":")
+            headers[name.lower()] = value.strip()
+        body = json.loads(await reader.readexactly(int(headers["content-length"])))
+        return int(status_line.split()[1]), body
+
+    async def run():
+        server = await start_server(service, port=0)
+        port = server.sockets[0].getsockname()[1]
+        async with server:
+            reader, writer = await asyncio.open_connection("127.0.0.1", port)
+            first = await request(reader, writer, "/neighbours?word=a&k=1")
+            second = await request(reader, writer, "/lookup?word=zzz")
+            writer.close()
+            return first, second
+
+    (status, body), (missing_status, _) = asyncio.run(run())
+
+    assert status == 200
+    assert body["neighbours"][0]["word"] == "b"
+    assert missing_status == 404
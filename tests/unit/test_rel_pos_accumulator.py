@@ -0,0 +1,142 @@
+from typing import List, Optional
+from pathlib import Path
+import numpy as np
+import pytest
+import learn
+from learn import learn_word_rel_pos_both, RelPosAccumulator
+from text_source import RawTextSource
+from saved_models import save_rel_pos_accumulator, load_rel_pos_accumulator
+from example_data.text.wikipedia_articles import load_text as load_wikipedia_text
+
+
+def _texts() -> List[str]:
+    return [load_wikipedia_text(name) for name in ["frances-cleveland", "google", "github"]]
+
+
+def _assert_matches_learned(accumulator: RelPosAccumulator, texts: List[str], word_count_max: Optional[int], sparse: bool = False):
+
+    unsigned_mat, signed_mat, word_indexes = learn_word_rel_pos_both(RawTextSource("".join(texts)), max_look_dist=7, word_count_max=word_count_max, sparse=sparse)
+    acc_unsigned_mat, acc_signed_mat, acc_word_indexes = accumulator.matrices(word_count_max=word_count_max, sparse=sparse)
+
+    assert acc_word_indexes == word_indexes
+
+    if sparse:
+        assert np.array_equal(acc_unsigned_mat.to_dense(np.inf), unsigned_mat.to_dense(np.inf))
+        assert np.array_equal(acc_signed_mat.to_dense(np.inf), signed_mat.to_dense(np.inf))
+    else:
+        assert np.array_equal(acc_unsigned_mat, unsigned_mat)
+        assert np.array_equal(acc_signed_mat, signed_mat)
+
+
+@pytest.mark.parametrize("word_count_max", [None, 50, 300])
+def test_updates_match_learned(word_count_max: Optional[int]):
+
+    texts = _texts()
+    accumulator = RelPosAccumulator(max_look_dist=7)
+
+    for text in texts:
+        accumulator.update(RawTextSource(text))
+
+    _assert_matches_learned(accumulator, texts, word_count_max)
+
+
+@pytest.mark.parametrize("word_count_max", [None, 100])
+def test_merge_matches_learned(word_count_max: Optional[int]):
+
+    texts = _texts()
+
+    first = RelPosAccumulator(max_look_dist=7)
+    first.update(RawTextSource(texts[0]))
+
+    second = RelPosAccumulator(max_look_dist=7)
+    second.update(RawTextSource(texts[1]))
+    second.update(RawTextSource(texts[2]))
+
+    first.merge(second)
+
+    assert first.section_count == sum(RawTextSource(text).read_all_section_ids().section_count for text in texts)
+    _assert_matches_learned(first, texts, word_count_max)
+
+
+def test_sparse_totals_match_learned(monkeypatch: pytest.MonkeyPatch):
+
+    # Totals for vocabularies of more than a few words are kept sparsely
+
+    monkeypatch.setattr(learn, "_DENSE_MAX_CELLS", 16)
+
+    texts = _texts()
+    accumulator = RelPosAccumulator(max_look_dist=7)
+
+    for text in texts:
+        accumulator.update(RawTextSource(text))
+
+    _assert_matches_learned(accumulator, texts, 200, sparse=True)
+
+
+def test_pending_totals_compacted(monkeypatch: pytest.MonkeyPatch):
+
+    # Small batches and compaction thresholds make the pending totals be merged many times, at different sizes
+
+    monkeypatch.setattr(learn, "_BATCH_TOKENS", 500)
+    monkeypatch.setattr(learn, "_COMPACT_MIN_PAIRS", 1)
+
+    texts = _texts()
+    accumulator = RelPosAccumulator(max_look_dist=7)
+
+    for text in texts:
+        accumulator.update(RawTextSource(text))
+
+    _assert_matches_learned(accumulator, texts, None)
+
+
+def test_single_matrix():
+
+    accumulator = RelPosAccumulator(max_look_dist=2)
+    accumulator.update(RawTextSource("word more more more."))
+
+    matrix, word_indexes = accumulator.matrix(signed=True)
+
+    assert word_indexes.words == ["word", "more"]
+    assert np.array_equal(matrix, np.array([[np.inf, 1.5], [-1.5, 0]], dtype=np.float32))
+    assert np.array_equal(accumulator.word_counts, [1, 3])
+
+
+def test_empty():
+
+    matrix, word_indexes = RelPosAccumulator(max_look_dist=3).matrix()
+
+    assert len(word_indexes) == 0
+    assert matrix.shape == (0, 0)
+
+
+def test_merge_different_look_dists():
+    with pytest.raises(ValueError):
+        RelPosAccumulator(max_look_dist=3).merge(RelPosAccumulator(max_look_dist=4))
+
+
+def test_invalid_look_dist():
+    with pytest.raises(ValueError):
+        RelPosAccumulator(max_look_dist=0)
+
+
+def test_save_load_round_trip(tmp_path: Path):
+
+    texts = _texts()
+
+    accumulator = RelPosAccumulator(max_look_dist=7, corpus_hash="abc")
+    accumulator.update(RawTextSource(texts[0]))
+    accumulator.update(RawTextSource(texts[1]))
+
+    save_rel_pos_accumulator(tmp_path/"acc.bundle", accumulator)
+    loaded = load_rel_pos_accumulator(tmp_path/"acc.bundle")
+
+    assert loaded.max_look_dist == accumulator.max_look_dist
+    assert loaded.section_count == accumulator.section_count
+    assert loaded.corpus_hash == "abc"
+    assert loaded.vocabulary == accumulator.vocabulary
+    assert np.array_equal(loaded.word_counts, accumulator.word_counts)
+
+    # Updating the loaded totals is the same as having accumulated everything at once
+
+    loaded.update(RawTextSource(texts[2]))
+    _assert_matches_learned(loaded, texts, 300)
@@ -0,0 +1,83 @@
+import pytest
+import numpy as np
+from learn import learn_word_rel_pos
+from text_source import RawTextSource
+from pca import pca
+from rel_pos_mapping import normalize_rel_pos, exp_map_rel_pos, normalize_rel_pos_sparse, exp_map_rel_pos_sparse
+from example_data.text.wikipedia_articles import load_text as load_wikipedia_text
+
+
+def _dense_pipeline(pos_mat: np.ndarray):
+    """The dense normalization and mapping from `examples/create_models_word_rel_pos.py`"""
+
+    offset_pos_mat = pos_mat-np.mean(np.where(pos_mat == np.inf, 0, pos_mat))
+    normalization_factor = np.max(np.where(pos_mat == np.inf, 0, np.abs(offset_pos_mat)))
+    normalized_pos_mat = offset_pos_mat/normalization_factor
+    mapped_mat = np.where(normalized_pos_mat == np.inf, 0, np.exp(np.negative(normalized_pos_mat)))
+
+    return normalized_pos_mat, mapped_mat
+
+
+@pytest.mark.parametrize("signed", [False, True])
+def test_matches_dense(signed: bool):
+
+    source = RawTextSource(load_wikipedia_text("google")[:10000])
+
+    dense, _ = learn_word_rel_pos(source, max_look_dist=10, signed=signed, word_count_max=200)
+    sparse, _ = learn_word_rel_pos(source, max_look_dist=10, signed=signed, word_count_max=200, sparse=True)
+
+    exp_normalized, exp_mapped = _dense_pipeline(dense)
+
+    normalized = normalize_rel_pos_sparse(sparse)
+    mapped = exp_map_rel_pos_sparse(normalized)
+
+    assert np.allclose(normalized.to_dense(np.inf), exp_normalized, atol=1e-6)
+    assert np.allclose(mapped.to_dense(), exp_mapped, atol=1e-5)
+
+    # The leading components of the sparse mapped matrix match those of the dense one
+
+    ys = pca(mapped, 3)
+    exp_ys = pca(exp_mapped.astype(np.float32), 3)
+    ys = ys * np.where(np.sum(ys * exp_ys, axis=0) < 0, -1, 1)
+
+    assert np.allclose(ys, exp_ys, atol=1e-2 * np.max(np.abs(exp_ys)))
+
+
+def _random_pos_mat(N: int, seed: int = 0) -> np.ndarray:
+    rng = np.random.default_rng(seed)
+    return np.where(rng.random((N, N)) < 0.6, np.inf, rng.random((N, N)) * 20).astype(np.float32)
+
+
+@pytest.mark.parametrize("chunk_rows", [1, 7, 256])
+def test_dense_matches_original(chunk_rows: int):
+
+    pos_mat = _random_pos_mat(50)
+
+    exp_normalized, exp_mapped = _dense_pipeline(pos_mat)
+
+    normalized = normalize_rel_pos(pos_mat, chunk_rows=chunk_rows)
+    mapped = exp_map_rel_pos(normalized, chunk_rows=chunk_rows)
+
+    assert normalized.dtype == mapped.dtype == np.float32
+    assert np.array_equal(np.isinf(normalized), np.isinf(exp_normalized))
+    assert np.allclose(normalized, exp_normalized, atol=1e-6)
+    assert np.allclose(mapped, exp_mapped, atol=1e-6)
+
+
+def test_dense_in_place():
+
+    pos_mat = _random_pos_mat(20)
+    exp_normalized, exp_mapped = _dense_pipeline(pos_mat)
+
+    normalized = normalize_rel_pos(pos_mat, out=pos_mat)
+    assert normalized is pos_mat
+    assert np.allclose(pos_mat, exp_normalized, atol=1e-6)
+
+    mapped = exp_map_rel_pos(pos_mat, out=pos_mat)
+    assert mapped is pos_mat
+    assert np.allclose(pos_mat, exp_mapped, atol=1e-6)
+
+
+def test_dense_wrong_out_shape():
+    with pytest.raises(ValueError):
+        normalize_rel_pos(_random_pos_mat(4), out=np.empty((4, 3), dtype=np.float32))
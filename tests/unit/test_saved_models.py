@@ -0,0 +1,119 @@
+import pytest
+import numpy as np
+from pathlib import Path
+from saved_models import save_matrix, load_matrix, save_sparse_matrix, load_sparse_matrix, save_bundle, load_bundle, save_word_indexes, load_word_indexes, save_neighbour_index, load_neighbour_index, ModelBundle
+from neighbours import NeighbourIndex
+from vocabulary import Vocabulary
+from sparse_matrix import CSRMatrix
+
+
+def test_matrix_round_trip(tmp_path: Path):
+
+    m = np.arange(12, dtype=np.float32).reshape((3, 4))
+    save_matrix(tmp_path/"m.npy", m)
+
+    loaded = load_matrix(tmp_path/"m.npy")
+
+    assert not isinstance(loaded, np.memmap)
+    assert loaded.dtype == m.dtype
+    assert np.array_equal(loaded, m)
+
+
+@pytest.mark.parametrize("mmap_mode", ["r", "c"])
+def test_matrix_memory_mapped(tmp_path: Path, mmap_mode: str):
+
+    m = np.arange(12, dtype=np.float32).reshape((3, 4))
+    save_matrix(tmp_path/"m.npy", m)
+
+    loaded = load_matrix(tmp_path/"m.npy", mmap_mode=mmap_mode)  # type: ignore
+
+    assert isinstance(loaded, np.memmap)
+    assert np.array_equal(loaded, m)
+
+
+def test_memory_mapped_read_only(tmp_path: Path):
+
+    save_matrix(tmp_path/"m.npy", np.zeros((2, 2), dtype=np.float32))
+
+    loaded = load_matrix(tmp_path/"m.npy", mmap_mode="r")
+
+    with pytest.raises(ValueError):
+        loaded[0, 0] = 1
+
+
+def test_sparse_matrix_round_trip(tmp_path: Path):
+
+    m = CSRMatrix.from_dense(np.array([[0, 1.5], [0, 0], [2, 0]], dtype=np.float32))
+    save_sparse_matrix(tmp_path/"m.npz", m)
+
+    loaded = load_sparse_matrix(tmp_path/"m.npz")
+
+    assert loaded.shape == m.shape
+    assert np.array_equal(loaded.to_dense(), m.to_dense())
+
+
+@pytest.mark.parametrize("sparse", [False, True])
+@pytest.mark.parametrize("mmap", [False, True])
+def test_bundle_round_trip(tmp_path: Path, sparse: bool, mmap: bool):
+
+    words = ["the", "a:b", "cat"]
+    dense = np.array([[0.5, np.inf, 1], [np.inf, 0, 2], [1, 2, -1]], dtype=np.float32)
+    rel_pos = CSRMatrix.from_dense(dense, missing_value=np.inf) if sparse else dense
+
+    bundle = ModelBundle(
+        Vocabulary(words),
+        rel_pos,
+        np.identity(3, dtype=np.float32)[:2],
+        np.arange(6, dtype=np.float32).reshape((3, 2)),
+        max_look_dist=20,
+        signed=True,
+        corpus_hash="abc"
+    )
+
+    save_bundle(tmp_path/"model.bundle", bundle)
+    loaded = load_bundle(tmp_path/"model.bundle", mmap=mmap)
+
+    assert [loaded.word_indexes.get_from(i) for i in range(3)] == words
+    assert loaded.max_look_dist == 20
+    assert loaded.signed is True
+    assert loaded.corpus_hash == "abc"
+    assert np.array_equal(loaded.principal_components, bundle.principal_components)
+    assert np.array_equal(loaded.projections, bundle.projections)
+
+    if sparse:
+        assert isinstance(loaded.rel_pos, CSRMatrix)
+        assert np.array_equal(loaded.rel_pos.to_dense(np.inf), dense)
+    else:
+        assert np.array_equal(loaded.rel_pos, dense)
+
+
+def test_word_indexes_round_trip(tmp_path: Path):
+
+    vocabulary = Vocabulary(["b", "a", "c"])
+    save_word_indexes(tmp_path/"words.dat", vocabulary)
+
+    assert load_word_indexes(tmp_path/"words.dat") == vocabulary
+
+
+@pytest.mark.parametrize("metric", ["cosine", "euclidean"])
+@pytest.mark.parametrize("ivf", [False, True])
+def test_neighbour_index_round_trip(tmp_path: Path, metric: str, ivf: bool):
+
+    vectors = np.random.default_rng(0).standard_normal((100, 5)).astype(np.float32)
+
+    index = NeighbourIndex(vectors, metric=metric)  # type: ignore
+    if ivf:
+        index.build_ivf(list_count=10)
+
+    save_neighbour_index(tmp_path/"index.bundle", index)
+    loaded = load_neighbour_index(tmp_path/"index.bundle")
+
+    assert loaded.metric == metric
+    assert isinstance(loaded.vectors, np.memmap)
+    assert np.array_equal(loaded.vectors, index.vectors)
+    assert np.array_equal(loaded.query(vectors[:5], 4)[0], index.query(vectors[:5], 4)[0])
+
+    if ivf:
+        assert np.array_equal(loaded.query(vectors[:5], 4, approximate=True, probes=2)[0], index.query(vectors[:5], 4, approximate=True, probes=2)[0])
+    else:
+        assert loaded.ivf is None
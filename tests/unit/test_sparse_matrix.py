@@ -0,0 +1,87 @@
+import pytest
+import numpy as np
+from sparse_matrix import CSRMatrix
+
+
+def _random_sparse(rows: int, cols: int, density: float, seed: int = 0) -> np.ndarray:
+    rng = np.random.default_rng(seed)
+    return np.where(rng.random((rows, cols)) < density, rng.standard_normal((rows, cols)), 0).astype(np.float32)
+
+
+@pytest.mark.parametrize(("rows", "cols", "density"), [
+    (1, 1, 1),
+    (5, 3, 0.5),
+    (20, 30, 0.1),
+    (10, 10, 0),
+])
+def test_dense_round_trip(rows: int, cols: int, density: float):
+    m = _random_sparse(rows, cols, density)
+    sparse = CSRMatrix.from_dense(m)
+    assert sparse.shape == m.shape
+    assert sparse.nnz == np.count_nonzero(m)
+    assert np.array_equal(sparse.to_dense(), m)
+
+
+def test_missing_value():
+    m = np.array([[1, np.inf], [np.inf, 0]], dtype=np.float32)
+    sparse = CSRMatrix.from_dense(m, missing_value=np.inf)
+    assert sparse.nnz == 2
+    assert np.array_equal(sparse.to_dense(np.inf), m)
+    assert np.array_equal(sparse.indptr, [0, 1, 2])
+    assert np.array_equal(sparse.indices, [0, 1])
+
+
+@pytest.mark.parametrize("b_shape", [(30,), (30, 1), (30, 4)])
+def test_dot(b_shape):
+    m = _random_sparse(20, 30, 0.2)
+    b = np.random.default_rng(1).standard_normal(b_shape)
+    sparse = CSRMatrix.from_dense(m)
+    assert np.allclose(sparse.dot(b), m @ b)
+    assert np.allclose(sparse @ b, m @ b)
+
+
+@pytest.mark.parametrize("b_shape", [(20,), (20, 4)])
+def test_transpose_dot(b_shape):
+    m = _random_sparse(20, 30, 0.2)
+    b = np.random.default_rng(1).standard_normal(b_shape)
+    assert np.allclose(CSRMatrix.from_dense(m).transpose_dot(b), m.T @ b)
+
+
+def test_with_data():
+    m = _random_sparse(6, 6, 0.5)
+    sparse = CSRMatrix.from_dense(m)
+    doubled = sparse.with_data(sparse.data * 2)
+    assert np.array_equal(doubled.to_dense(), m * 2)
+    with pytest.raises(ValueError):
+        sparse.with_data(sparse.data[:-1])
+
+
+def test_mismatched_dimensions():
+    with pytest.raises(ValueError):
+        CSRMatrix.from_dense(np.ones((2, 3))).dot(np.ones(2))
+
+
+def test_transposed():
+    m = _random_sparse(7, 12, 0.3)
+    sparse = CSRMatrix.from_dense(m)
+    assert np.array_equal(sparse.transposed().to_dense(), m.T)
+    assert sparse.transposed().transposed() is sparse
+
+
+def test_dot_in_chunks(monkeypatch: pytest.MonkeyPatch):
+    import sparse_matrix
+    monkeypatch.setattr(sparse_matrix, "_PRODUCT_CHUNK_CELLS", 8)
+    m = _random_sparse(30, 20, 0.3)
+    m[5] = 0
+    b = np.random.default_rng(1).standard_normal((20, 3))
+    assert np.allclose(CSRMatrix.from_dense(m).dot(b), m @ b)
+
+
+def test_value_at():
+    m = _random_sparse(8, 9, 0.3)
+    sparse = CSRMatrix.from_dense(m, missing_value=0)
+    for i in range(8):
+        for j in range(9):
+            assert sparse.value_at(i, j, missing_value=0) == m[i, j]
+    with pytest.raises(IndexError):
+        sparse.value_at(8, 0)
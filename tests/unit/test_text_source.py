@@ -0,0 +1,216 @@
+from typing import List, Optional
+from pathlib import Path
+import numpy as np
+import pytest
+from tokenizing import tokenize, TextToken, WordTextToken, EncodedText
+from text_source import ITextSource, RawTextSource, StreamingFileTextSource, DocumentsTextSource
+from learn import learn_word_rel_pos_both
+from example_data.text.wikipedia_articles import load_text as load_wikipedia_text
+
+
+_TEXTS: List[str] = [
+    "",
+    ".\n.",
+    "word",
+    "word.",
+    ". first section. second section\n\nthird",
+    "one two. three.",
+    load_wikipedia_text("frances-cleveland")[:10000],
+]
+
+
+def _describe(tokens: List[TextToken]) -> List[Optional[str]]:
+    return [token.word if isinstance(token, WordTextToken) else None for token in tokens]
+
+
+@pytest.mark.parametrize("text", _TEXTS)
+def test_read_all(text: str):
+
+    expected = _describe(tokenize(text))
+    source = RawTextSource(text)
+
+    assert source.get_max_position() == len(expected)
+    assert _describe(source.read_all()) == expected
+
+
+@pytest.mark.parametrize("text", _TEXTS)
+def test_read_at(text: str):
+
+    expected = _describe(tokenize(text))
+    source = RawTextSource(text)
+
+    assert _describe([source.read_at(i) for i in range(len(expected))]) == expected
+
+    with pytest.raises(IndexError):
+        source.read_at(len(expected))
+
+
+@pytest.mark.parametrize("text", _TEXTS)
+def test_read_forwards(text: str):
+
+    expected = _describe(tokenize(text))
+    source = RawTextSource(text)
+
+    assert _describe([source.read_forwards() for _ in range(len(expected))]) == expected
+    assert source.get_position() == len(expected)
+
+
+@pytest.mark.parametrize("text", _TEXTS)
+def test_read_all_sections(text: str):
+
+    expected: List[List[str]] = [[]]
+    for word in _describe(tokenize(text)):
+        if word is None:
+            expected.append([])
+        else:
+            expected[-1].append(word)
+    expected = [section for section in expected if section]
+
+    source = RawTextSource(text)
+
+    assert [[token.word for token in section] for section in source.read_all_sections()] == expected
+
+
+@pytest.mark.parametrize("text", _TEXTS)
+def test_read_all_section_ids(text: str):
+
+    source = RawTextSource(text)
+
+    encoded = source.read_all_section_ids()
+    expected = ITextSource.read_all_section_ids(source)
+
+    assert encoded.words == expected.words
+    assert np.array_equal(encoded.ids, expected.ids)
+    assert np.array_equal(encoded.offsets, expected.offsets)
+    assert encoded.ends_with_section_end == expected.ends_with_section_end
+
+
+_FILE_TEXTS: List[str] = [
+    load_wikipedia_text("frances-cleveland")[:3000],
+    "",
+    "no separator at the end",
+    "...",
+    load_wikipedia_text("github")[:5000],
+]
+
+
+def _write_files(directory: Path, texts: List[str]) -> List[Path]:
+    paths = [directory/f"{i}.txt" for i in range(len(texts))]
+    for path, text in zip(paths, texts):
+        path.write_text(text, encoding="UTF-8")
+    return paths
+
+
+def _batch_sections(batches: List[EncodedText]) -> List[List[str]]:
+    return [
+        [batch.words[word_id] for word_id in batch.ids[batch.offsets[i]:batch.offsets[i+1]]]
+        for batch in batches
+        for i in range(batch.section_count)
+    ]
+
+
+@pytest.mark.parametrize("chunk_length", [1, 50, 300, 1 << 20])
+def test_streaming_matches_joined(chunk_length: int, tmp_path: Path):
+
+    source = StreamingFileTextSource(_write_files(tmp_path, _FILE_TEXTS), chunk_length=chunk_length)
+    expected = RawTextSource("\n".join(_FILE_TEXTS))
+
+    batches = list(source.iter_section_ids())
+    assert all(batch.section_count > 0 for batch in batches)
+
+    sections = _batch_sections(batches)
+    expected_sections = [[token.word for token in section] for section in expected.read_all_sections()]
+
+    # Sections longer than the chunk length are split at a word separator, and words longer than it are split too.
+    # Every word of the texts is shorter than 50 characters and every section is shorter than 300
+
+    assert "".join(sum(sections, [])) == "".join(sum(expected_sections, []))
+
+    if chunk_length >= 50:
+        assert sum(sections, []) == sum(expected_sections, [])
+
+    if chunk_length >= 300:
+        assert sections == expected_sections
+        assert _describe(source.read_all()) == _describe(expected.read_all()) + [None]
+
+
+def test_streaming_long_section(tmp_path: Path):
+
+    # Neither file has a section separator, and the second doesn't have a word separator either
+
+    source = StreamingFileTextSource(_write_files(tmp_path, ["word " * 10_000, "a" * 5000]), chunk_length=1000)
+
+    batches = list(source.iter_section_ids())
+
+    assert len(batches) > 10
+    assert all(len(batch.ids) <= 400 for batch in batches)
+
+    words = sum(_batch_sections(batches), [])
+
+    assert words[:10_000] == ["word"] * 10_000
+    assert "".join(words[10_000:]) == "a" * 5000
+
+
+@pytest.mark.parametrize("workers", [1, 2])
+def test_streaming_learn_matches_joined(workers: int, tmp_path: Path):
+
+    source = StreamingFileTextSource(_write_files(tmp_path, _FILE_TEXTS), chunk_length=300)
+    expected = RawTextSource("\n".join(_FILE_TEXTS))
+
+    unsigned_mat, signed_mat, word_indexes = learn_word_rel_pos_both(source, max_look_dist=5, word_count_max=100, workers=workers)
+    exp_unsigned_mat, exp_signed_mat, exp_word_indexes = learn_word_rel_pos_both(expected, max_look_dist=5, word_count_max=100)
+
+    assert list(word_indexes.iterate_to()) == list(exp_word_indexes.iterate_to())
+    assert np.array_equal(unsigned_mat, exp_unsigned_mat)
+    assert np.array_equal(signed_mat, exp_signed_mat)
+
+
+@pytest.mark.parametrize("workers", [1, 2])
+@pytest.mark.parametrize("batch_length", [1, 100, 1 << 20])
+def test_documents_match_joined(workers: int, batch_length: int):
+
+    source = DocumentsTextSource(_TEXTS, workers=workers, batch_length=batch_length)
+    expected = RawTextSource("\n".join(_TEXTS)).read_all_section_ids()
+
+    encoded = source.read_all_section_ids()
+
+    assert encoded.words == expected.words
+    assert np.array_equal(encoded.ids, expected.ids)
+    assert np.array_equal(encoded.offsets, expected.offsets)
+
+
+def test_document_ids():
+
+    documents = ["one. two", "", "three four. five.", "six"]
+    source = DocumentsTextSource(documents, batch_length=5)
+
+    encoded = source.read_all_section_ids()
+
+    assert encoded.document_ids is not None
+    assert encoded.document_ids.tolist() == [0, 0, 2, 2, 3]
+
+    for batch in source.iter_section_ids():
+        assert batch.document_ids is not None
+        assert len(batch.document_ids) == batch.section_count
+
+
+def test_documents_from_function():
+
+    source = DocumentsTextSource(lambda: iter(_TEXTS))
+
+    # The documents are read again each time that the text source is iterated over
+
+    assert [batch.ids.tolist() for batch in source.iter_section_ids()] == [batch.ids.tolist() for batch in source.iter_section_ids()]
+    assert _describe(source.read_all()) == _describe(RawTextSource("\n".join(_TEXTS) + "\n").read_all())
+
+
+def test_documents_learn_matches_joined():
+
+    documents = [load_wikipedia_text(name) for name in ["frances-cleveland", "google"]]
+
+    unsigned_mat, signed_mat, word_indexes = learn_word_rel_pos_both(DocumentsTextSource(documents, batch_length=1000), max_look_dist=5, word_count_max=100)
+    exp_unsigned_mat, exp_signed_mat, exp_word_indexes = learn_word_rel_pos_both(RawTextSource("\n".join(documents)), max_look_dist=5, word_count_max=100)
+
+    assert word_indexes == exp_word_indexes
+    assert np.array_equal(unsigned_mat, exp_unsigned_mat)
+    assert np.array_equal(signed_mat, exp_signed_mat)
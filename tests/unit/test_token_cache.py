@@ -0,0 +1,86 @@
+from typing import List
+from pathlib import Path
+import numpy as np
+import pytest
+import token_cache
+from text_source import StreamingFileTextSource
+from token_cache import CachedTextSource, InvalidTokenCacheError, cached_file_text_source, corpus_key, write_token_cache
+from example_data.text.wikipedia_articles import load_text as load_wikipedia_text
+
+
+_TEXTS: List[str] = [
+    load_wikipedia_text("google")[:4000],
+    "",
+    "a final file without a full stop",
+]
+
+
+def _write_files(directory: Path) -> List[Path]:
+    paths = [directory/f"{i}.txt" for i in range(len(_TEXTS))]
+    for path, text in zip(paths, _TEXTS):
+        path.write_text(text, encoding="UTF-8")
+    return paths
+
+
+def test_matches_streaming(tmp_path: Path):
+
+    filepaths = _write_files(tmp_path)
+
+    cached = cached_file_text_source(filepaths, cache_directory=tmp_path/"cache")
+    expected = StreamingFileTextSource(filepaths).read_all_section_ids()
+    encoded = cached.read_all_section_ids()
+
+    assert isinstance(encoded.ids, np.memmap)
+    assert encoded.words == expected.words
+    assert np.array_equal(encoded.ids, expected.ids)
+    assert np.array_equal(encoded.offsets, expected.offsets)
+    assert encoded.ends_with_section_end == expected.ends_with_section_end
+    assert cached.get_max_position() == len(cached.read_all())
+
+
+def test_reused(tmp_path: Path, monkeypatch: pytest.MonkeyPatch):
+
+    filepaths = _write_files(tmp_path)
+
+    first = cached_file_text_source(filepaths, cache_directory=tmp_path/"cache")
+
+    def fail(*args, **kwargs):
+        raise AssertionError("Cache was written again")
+
+    monkeypatch.setattr(token_cache, "write_token_cache", fail)
+
+    second = cached_file_text_source(filepaths, cache_directory=tmp_path/"cache")
+
+    assert second.directory == first.directory
+    assert np.array_equal(second.read_all_section_ids().ids, first.read_all_section_ids().ids)
+
+
+def test_key_changes(tmp_path: Path):
+
+    filepaths = _write_files(tmp_path)
+
+    key = corpus_key(filepaths)
+    content_key = corpus_key(filepaths, hash_contents=True)
+
+    filepaths[2].write_text("different text of different length", encoding="UTF-8")
+
+    assert corpus_key(filepaths) != key
+    assert corpus_key(filepaths, hash_contents=True) != content_key
+    assert corpus_key(filepaths[:2]) != corpus_key(filepaths)
+
+
+def test_empty(tmp_path: Path):
+
+    path = tmp_path/"empty.txt"
+    path.write_text("...", encoding="UTF-8")
+
+    write_token_cache(StreamingFileTextSource([path]), tmp_path/"cache")
+    source = CachedTextSource(tmp_path/"cache")
+
+    assert source.get_max_position() == 0
+    assert source.read_all_section_ids().words == []
+
+
+def test_missing(tmp_path: Path):
+    with pytest.raises(InvalidTokenCacheError):
+        CachedTextSource(tmp_path/"missing")
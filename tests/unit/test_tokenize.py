@@ -0,0 +1,51 @@
+from typing import List, Tuple, Optional
+import pytest
+import tokenizing
+from tokenizing import tokenize, TextToken, WordTextToken, EndOfSectionTextToken
+from example_data.text.wikipedia_articles import load_text as load_wikipedia_text
+
+
+_CASES: List[Tuple[str, List[Optional[str]]]] = [
+    ("", []),
+    ("hello", ["hello"]),
+    ("Hello World", ["hello", "world"]),
+    ("one, two-three  four", ["one", "two", "three", "four"]),
+    ("a. b\nc", ["a", None, "b", None, "c"]),
+    ("a.. .\n\nb.", ["a", None, "b", None]),
+    (". . a", ["a"]),
+    ("don't stop", ["dont", "stop"]),
+    ("abc123def", ["abcdef"]),
+    ("café au\tlait", ["caf", "aulait"]),
+    ("1. 2. x", ["x"]),
+]
+"""Each case has the input text and the expected tokens, where `None` is an end-of-section token"""
+
+
+def _describe(tokens: List[TextToken]) -> List[Optional[str]]:
+    return [token.word if isinstance(token, WordTextToken) else None for token in tokens]
+
+
+@pytest.mark.parametrize(("text", "expected"), _CASES)
+def test_tokens(text: str, expected: List[Optional[str]]):
+    out = tokenize(text)
+    assert all(isinstance(token, (WordTextToken, EndOfSectionTextToken)) for token in out)
+    assert _describe(out) == expected
+
+
+@pytest.mark.parametrize("chunk_length", [1, 7, 100])
+def test_chunking_matches_whole(chunk_length: int, monkeypatch: pytest.MonkeyPatch):
+
+    text = load_wikipedia_text("france")[:20000]
+
+    expected = _describe(tokenize(text))
+
+    monkeypatch.setattr(tokenizing, "_CHUNK_LENGTH", chunk_length)
+
+    assert _describe(tokenize(text)) == expected
+
+
+def test_words_valid():
+    for token in tokenize(load_wikipedia_text("google")):
+        if isinstance(token, WordTextToken):
+            assert WordTextToken._VALID_REGEX.fullmatch(token.word)
+            assert token.word == token.word.lower()
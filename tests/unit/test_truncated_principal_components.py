@@ -0,0 +1,41 @@
+import pytest
+import numpy as np
+from _test_util import *
+from pca import DimensionTooHighError, covariance_matrix, principal_components, truncated_principal_components
+
+
+def _low_rank_data(P: int, M: int, rank: int, seed: int = 0) -> npt.NDArray[np.float32]:
+    """Data with a few strong and distinct directions of variance, plus some noise"""
+    rng = np.random.default_rng(seed)
+    scales = np.linspace(10, 5, rank)
+    xs = (rng.standard_normal((P, rank)) * scales) @ rng.standard_normal((rank, M))
+    return (xs + 0.01 * rng.standard_normal((P, M))).astype(np.float32)
+
+
+@pytest.mark.parametrize(("N", "chunk_rows"), [
+    (1, 1024),
+    (3, 1024),
+    (5, 7),
+    (5, 1),
+])
+def test_matches_covariance_components(N: int, chunk_rows: int):
+
+    xs = _low_rank_data(200, 60, 5)
+
+    out = truncated_principal_components(xs, N, chunk_rows=chunk_rows)
+    expected = principal_components(covariance_matrix(xs), N)
+
+    assert out.shape == (N, xs.shape[1])
+    assert out.dtype == np.float32
+    assert np.allclose(np.abs(np.sum(out * expected, axis=1)), 1, atol=1e-3)
+
+
+def test_orthonormal():
+    xs = _low_rank_data(100, 40, 10)
+    out = truncated_principal_components(xs, 10)
+    assert np.allclose(out @ out.T, np.identity(10), atol=1e-4)
+
+
+def test_too_many_components():
+    with pytest.raises(DimensionTooHighError):
+        truncated_principal_components(np.zeros(shape=(4, 3), dtype=np.float32), 4)
@@ -0,0 +1,140 @@
+from typing import Dict
+import pytest
+import numpy as np
+from bij_map import BijMap
+from vocabulary import Vocabulary
+
+
+_WORDS = ["the", "cat", "sat", "on", "mat", "ünïcode", ""]
+
+
+def test_indexes():
+
+    vocabulary = Vocabulary(_WORDS)
+
+    assert len(vocabulary) == vocabulary.size == len(_WORDS)
+    assert list(vocabulary) == vocabulary.words == _WORDS
+
+    for i, word in enumerate(_WORDS):
+        assert vocabulary[i] == vocabulary.get_from(i) == word
+        assert vocabulary.index_of(word) == vocabulary.get_to(word) == i
+        assert word in vocabulary
+
+
+def test_add():
+
+    vocabulary = Vocabulary()
+
+    assert vocabulary.add("a") == 0
+    assert vocabulary.add("b") == 1
+    assert vocabulary.add("a") == 0
+    assert vocabulary.words == ["a", "b"]
+
+
+def test_duplicates():
+    with pytest.raises(ValueError):
+        Vocabulary(["a", "b", "a"])
+
+
+def test_encode_decode():
+
+    vocabulary = Vocabulary(_WORDS)
+
+    ids = vocabulary.encode(["mat", "the", "mat"])
+
+    assert ids.dtype == np.int32
+    assert ids.tolist() == [4, 0, 4]
+    assert vocabulary.decode(ids) == ["mat", "the", "mat"]
+    assert vocabulary.decode([]) == []
+
+
+def test_encode_missing():
+
+    vocabulary = Vocabulary(_WORDS)
+
+    assert vocabulary.encode(["cat", "dog"], missing=-1).tolist() == [1, -1]
+
+    with pytest.raises(KeyError):
+        vocabulary.encode(["cat", "dog"])
+
+
+def test_decode_after_add():
+
+    vocabulary = Vocabulary(["a"])
+    assert vocabulary.decode([0]) == ["a"]
+
+    vocabulary.add("b")
+    assert vocabulary.decode([1, 0]) == ["b", "a"]
+
+    with pytest.raises(IndexError):
+        vocabulary.decode([2])
+
+
+@pytest.mark.parametrize("words", [[], [""], _WORDS])
+def test_bytes_round_trip(words):
+    assert Vocabulary.from_bytes(Vocabulary(words).to_bytes()) == Vocabulary(words)
+
+
+@pytest.mark.parametrize("data", [b"", b"nonsense data", Vocabulary(_WORDS).to_bytes()[:-1]])
+def test_invalid_bytes(data: bytes):
+    with pytest.raises(ValueError):
+        Vocabulary.from_bytes(data)
+
+
+def test_bij_map_interoperation():
+
+    bm = BijMap[str, int]()
+    for i, word in enumerate(_WORDS):
+        bm.set_from(i, word)
+
+    vocabulary = Vocabulary.from_bij_map(bm)
+
+    assert vocabulary.words == _WORDS
+
+    bm_out = vocabulary.to_bij_map()
+
+    assert list(bm_out.iterate_to()) == list(vocabulary.iterate_to())
+    assert list(bm_out.iterate_from()) == list(vocabulary.iterate_from())
+    assert all(bm_out.get_to(word) == vocabulary.get_to(word) for word in _WORDS)
+
+
+def test_bij_map_set_to():
+
+    vocabulary = Vocabulary()
+    vocabulary.set_to("a", 0)
+    vocabulary.set_from(1, "b")
+    vocabulary.set_to("a", 0)
+
+    assert vocabulary.words == ["a", "b"]
+    assert vocabulary.to_contains("b") and not vocabulary.to_contains("c")
+    assert vocabulary.from_contains(1) and not vocabulary.from_contains(2)
+
+    with pytest.raises(ValueError):
+        vocabulary.set_to("c", 5)
+
+    with pytest.raises(KeyError):
+        vocabulary.get_from(2)
+
+
+def test_from_bij_map_out_of_range():
+
+    bm = BijMap[str, int]()
+    bm.set_to("a", 1)
+
+    with pytest.raises(ValueError):
+        Vocabulary.from_bij_map(bm)
+
+
+@pytest.mark.parametrize("indexes", [
+    { "a": 0, "b": 0 },
+    { "a": 1, "b": 1 },
+    { "a": 0, "b": 2, "c": 2 },
+])
+def test_from_bij_map_repeated_index(indexes: Dict[str, int]):
+
+    bm = BijMap[str, int]()
+    for word, index in indexes.items():
+        bm.set_to(word, index)
+
+    with pytest.raises(ValueError):
+        Vocabulary.from_bij_map(bm)
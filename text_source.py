@@ -1,8 +1,17 @@
-from typing import List, Optional
+from typing import List, Optional, Iterator, Sequence, Iterable, Callable, Union, Tuple, Deque
 from abc import ABC, abstractmethod
 from pathlib import Path
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, Future
+import numpy as np
+import numpy.typing as npt
 from progress import Progress
-from tokenizing import TextToken, tokenize, WordTextToken, EndOfSectionTextToken, UnhandledTextTokenTypeException
+from instrumentation import instrumented, count
+from tokenizing import TextToken, WordTextToken, EndOfSectionTextToken, EncodedText, WordIds, encode_text, encode_documents, section_end_position, word_end_position, section_batches
+
+
+_ITER_BATCH_TOKENS: int = 1 << 22
+"""The approximate number of tokens in each batch yielded when iterating over the sections of an already-tokenized text"""
 
 
 class ITextSource(ABC):
@@ -30,74 +39,135 @@ class ITextSource(ABC):
         """Reads all sections of text delimited by a `EndOfSectionTextToken`"""
         pass
 
+    def read_all_section_ids(self) -> EncodedText:
+        """Reads all sections of text as arrays of word IDs, with IDs given in order of first occurence. \
+By default this encodes the output of `read_all_sections` but sources that store word IDs may return them directly"""
 
-class RawTextSource(ITextSource):
+        sections = self.read_all_sections()
 
-    def __init__(self,
-                 text: str,
-                 tokenize_progress: Optional[Progress] = None):
+        word_ids = WordIds()
+        ids: List[int] = []
+        offsets = np.zeros(shape=(len(sections)+1,), dtype=np.int64)
+
+        for i, section in enumerate(sections):
+            ids.extend(word_ids[token.word] for token in section)
+            offsets[i+1] = len(ids)
+
+        max_position = self.get_max_position()
+        ends_with_section_end = (max_position > 0) and isinstance(self.read_at(max_position-1), EndOfSectionTextToken)
+
+        return EncodedText(list(word_ids), np.array(ids, dtype=np.int32), offsets, ends_with_section_end)
+
+    def iter_section_ids(self) -> Iterator[EncodedText]:
+        """Reads the sections of text as word IDs in batches of whole sections, so that the whole text doesn't need to be held in memory at once.
+
+Every batch from a single iteration shares the same word IDs. The `words` of each batch is the vocabulary discovered so far, which only ever has words added to its end. \
+By default this yields the output of `read_all_section_ids` as a single batch.
+"""
+        yield self.read_all_section_ids()
+
+
+class EncodedTextSource(ITextSource):
+    """A text source for a text that has already been tokenized into word ID arrays. Token objects are only created when they are read"""
+
+    def __init__(self, encoded: EncodedText):
+
+        self._encoded: EncodedText = encoded
+
+        self._encoded.ids.flags.writeable = False
+        self._encoded.offsets.flags.writeable = False
+
+        self._word_tokens: List[WordTextToken] = [WordTextToken._from_valid_word(word) for word in self._encoded.words]
 
-        self._text = text
+        section_count = self._encoded.section_count
 
-        self._token_list: List[TextToken] = tokenize(self._text, progress=tokenize_progress)
+        self._section_token_starts: npt.NDArray[np.int64] = self._encoded.offsets[:-1] + np.arange(section_count)
+        """The position of the first token of each section. Each section is followed by its end-of-section token, except possibly the last"""
+
+        self._max_position: int = 0 if section_count == 0 \
+            else len(self._encoded.ids) + section_count - (0 if self._encoded.ends_with_section_end else 1)
 
         self.__pos: int = 0
 
     def __pos_is_valid(self, pos: int) -> bool:
-        return 0 <= pos < len(self._token_list)
+        return 0 <= pos < self._max_position
 
     def get_position(self) -> int:
         return self.__pos
 
     def get_max_position(self) -> int:
-        return len(self._token_list)
+        return self._max_position
 
     def read_forwards(self) -> TextToken:
         if not self.__pos_is_valid(self.__pos):
             raise IndexError()
-        token = self._token_list[self.__pos]
+        token = self.read_at(self.__pos)
         self.__pos += 1
         return token
 
     def read_backwards(self) -> TextToken:
         if not self.__pos_is_valid(self.__pos):
             raise IndexError()
-        token = self._token_list[self.__pos]
+        token = self.read_at(self.__pos)
         self.__pos -= 1
         return token
 
     def read_all(self) -> List[TextToken]:
-        return self._token_list.copy()
+
+        tokens: List[TextToken] = []
+
+        for section in self.read_all_sections():
+            tokens.extend(section)
+            tokens.append(EndOfSectionTextToken())
+
+        if tokens and not self._encoded.ends_with_section_end:
+            tokens.pop()
+
+        return tokens
 
     def read_at(self, pos: int) -> TextToken:
+
         if not self.__pos_is_valid(pos):
             raise IndexError()
-        return self._token_list[pos]
 
+        section = int(np.searchsorted(self._section_token_starts, pos, side="right")) - 1
+        index = self._encoded.offsets[section] + (pos - self._section_token_starts[section])
+
+        if index < self._encoded.offsets[section+1]:
+            return self._word_tokens[self._encoded.ids[index]]
+        else:
+            return EndOfSectionTextToken()
+
+    @instrumented("read_all_sections")
     def read_all_sections(self) -> List[List[WordTextToken]]:
 
-        sections: List[List[WordTextToken]] = []
-        curr: List[WordTextToken] = []
+        ids = self._encoded.ids.tolist()
+        offsets = self._encoded.offsets.tolist()
 
-        for i in range(self.get_max_position()):
+        count("sections", self._encoded.section_count)
+        count("tokens", len(ids))
 
-            token = self.read_at(i)
+        return [
+            [self._word_tokens[word_id] for word_id in ids[offsets[i]:offsets[i+1]]]
+            for i in range(self._encoded.section_count)
+        ]
 
-            match token:
-                case WordTextToken():
-                    curr.append(token)
-                case EndOfSectionTextToken():
-                    if len(curr) > 0:
-                        sections.append(curr.copy())
-                        curr = []
-                case _:
-                    raise UnhandledTextTokenTypeException()
+    def read_all_section_ids(self) -> EncodedText:
+        return self._encoded
 
-        if len(curr) > 0:
-            sections.append(curr.copy())
-            curr = []
+    def iter_section_ids(self) -> Iterator[EncodedText]:
+        for start, stop in section_batches(self._encoded.offsets, _ITER_BATCH_TOKENS):
+            yield self._encoded.sections(start, stop)
 
-        return sections
+
+class RawTextSource(EncodedTextSource):
+    """A text source for a text held in memory"""
+
+    def __init__(self,
+                 text: str,
+                 tokenize_progress: Optional[Progress] = None):
+
+        super().__init__(encode_text(text, progress=tokenize_progress))
 
 
 class FileTextSource(RawTextSource):
@@ -118,3 +188,267 @@ class FileTextSource(RawTextSource):
     @property
     def filepath(self) -> Path:
         return self._filepath
+
+
+class _StreamedTextSource(ITextSource):
+    """A text source which is read by iterating over `iter_section_ids`, which subclasses implement. \
+The other ways of reading the text need the whole tokenized text at once, so the first of them to be used reads the whole text and keeps the result.
+"""
+
+    def __init__(self):
+        self.__materialized: Optional[EncodedTextSource] = None
+
+    @abstractmethod
+    def iter_section_ids(self) -> Iterator[EncodedText]:
+        pass
+
+    def read_all_section_ids(self) -> EncodedText:
+
+        words: List[str] = []
+        id_arrays: List[npt.NDArray[np.int32]] = []
+        offset_arrays: List[npt.NDArray[np.int64]] = [np.zeros(shape=(1,), dtype=np.int64)]
+        document_id_arrays: List[npt.NDArray[np.int64]] = [np.zeros(shape=(0,), dtype=np.int64)]
+        has_document_ids = True
+
+        for encoded in self.iter_section_ids():
+            words = encoded.words
+            offset_arrays.append(encoded.offsets[1:] + offset_arrays[-1][-1])
+            id_arrays.append(encoded.ids)
+            if encoded.document_ids is None:
+                has_document_ids = False
+            else:
+                document_id_arrays.append(encoded.document_ids)
+
+        return EncodedText(
+            words,
+            np.concatenate(id_arrays) if id_arrays else np.zeros(shape=(0,), dtype=np.int32),
+            np.concatenate(offset_arrays),
+            len(id_arrays) > 0,
+            np.concatenate(document_id_arrays) if has_document_ids else None
+        )
+
+    def __source(self) -> EncodedTextSource:
+        if self.__materialized is None:
+            self.__materialized = EncodedTextSource(self.read_all_section_ids())
+        return self.__materialized
+
+    def get_position(self) -> int:
+        return self.__source().get_position()
+
+    def get_max_position(self) -> int:
+        return self.__source().get_max_position()
+
+    def read_at(self, pos: int) -> TextToken:
+        return self.__source().read_at(pos)
+
+    def read_forwards(self) -> TextToken:
+        return self.__source().read_forwards()
+
+    def read_backwards(self) -> TextToken:
+        return self.__source().read_backwards()
+
+    def read_all(self) -> List[TextToken]:
+        return self.__source().read_all()
+
+    def read_all_sections(self) -> List[List[WordTextToken]]:
+        return self.__source().read_all_sections()
+
+
+class StreamingFileTextSource(_StreamedTextSource):
+    """A text source for text files which only tokenizes the files when they are read and never holds more than about one batch of the text in memory.
+
+Each file is read in chunks, and the end of each file also ends a section. \
+A section longer than the chunk length is cut at a word separator, so that the memory used doesn't grow with the length of a section, \
+which splits it into several sections. \
+Iterating over `iter_section_ids` reads and tokenizes the files again each time. \
+The other ways of reading the text need the whole tokenized text at once, so the first of them to be used reads every file and keeps the result.
+"""
+
+    def __init__(self,
+                 filepaths: Sequence[Path],
+                 chunk_length: int = 1 << 22,
+                 encoding: str = "UTF-8"):
+        """Parameters:
+
+    filepaths - the files to read the text of, in order
+
+    chunk_length (optional) - the approximate number of characters to read at a time and to tokenize into each batch
+
+    encoding (optional) - the encoding of the files
+"""
+
+        for filepath in filepaths:
+            if not filepath.is_file():
+                raise ValueError(filepath)
+
+        if chunk_length < 1:
+            raise ValueError(chunk_length)
+
+        super().__init__()
+
+        self._filepaths = list(filepaths)
+        self._chunk_length = chunk_length
+        self._encoding = encoding
+
+    @property
+    def filepaths(self) -> List[Path]:
+        return self._filepaths.copy()
+
+    def __iter_texts(self) -> Iterator[str]:
+        """Yields the text of the files in pieces of roughly the chunk length which end at the end of a section, unless the section is longer than the chunk length"""
+
+        pending: List[str] = []
+        pending_length: int = 0
+
+        for filepath in self._filepaths:
+
+            with filepath.open("r", encoding=self._encoding) as file:
+
+                remainder = ""
+
+                while chunk := file.read(self._chunk_length):
+
+                    text = remainder + chunk
+                    end = section_end_position(text)
+
+                    # The remainder is never left longer than the chunk length, so a file without section separators is still read in pieces.
+                    # If there's no word separator near enough to cut at either, the text is cut wherever it is
+
+                    if len(text) - end > self._chunk_length:
+                        end = word_end_position(text)
+
+                    if len(text) - end > self._chunk_length:
+                        end = len(text)
+
+                    pending.append(text[:end])
+                    pending_length += end
+                    remainder = text[end:]
+
+                    if pending_length >= self._chunk_length:
+                        yield "".join(pending)
+                        pending = []
+                        pending_length = 0
+
+                pending.append(remainder + "\n")
+                pending_length += len(remainder) + 1
+
+        if pending:
+            yield "".join(pending)
+
+    def iter_section_ids(self) -> Iterator[EncodedText]:
+
+        word_ids = WordIds()
+
+        for text in self.__iter_texts():
+            encoded = encode_text(text, word_ids=word_ids)
+            if encoded.section_count > 0:
+                yield encoded
+
+
+_DOCUMENT_BATCH_LENGTH: int = 1 << 20
+"""The approximate number of characters of documents tokenized together, and yielded together, by a `DocumentsTextSource`"""
+
+
+class DocumentsTextSource(_StreamedTextSource):
+    """A text source for a collection of separate documents, such as reviews, which are each tokenized on their own.
+
+The end of each document ends a section, so no section spans two documents, and the `document_ids` of the encoded sections give the index of the document that each section is from. \
+Documents are tokenized in batches, optionally by several processes at once, and only about one batch of them is held in memory at once while iterating over `iter_section_ids`. \
+Word IDs are given in order of first occurence across the documents in order, so they are the same however many processes are used.
+"""
+
+    def __init__(self,
+                 documents: Union[Sequence[str], Callable[[], Iterable[str]]],
+                 workers: int = 1,
+                 batch_length: int = _DOCUMENT_BATCH_LENGTH):
+        """Parameters:
+
+    documents - the documents, in order. \
+Either a sequence of the documents or a function which returns a new iterable of them each time that it is called, such as `iter_reviews`, so that they don't all need to be held in memory
+
+    workers (optional) - the number of processes to tokenize the documents with. Defaults to tokenizing in the current process
+
+    batch_length (optional) - the approximate number of characters of documents to tokenize and yield in each batch
+"""
+
+        if workers < 1:
+            raise ValueError(workers)
+
+        if batch_length < 1:
+            raise ValueError(batch_length)
+
+        super().__init__()
+
+        self._documents = documents
+        self._workers = workers
+        self._batch_length = batch_length
+
+    def __iter_batches(self) -> Iterator[List[str]]:
+
+        documents = self._documents() if callable(self._documents) else self._documents
+
+        batch: List[str] = []
+        batch_length: int = 0
+
+        for document in documents:
+
+            batch.append(document)
+            batch_length += len(document)
+
+            if batch_length >= self._batch_length:
+                yield batch
+                batch = []
+                batch_length = 0
+
+        if batch:
+            yield batch
+
+    def __iter_encoded_batches(self) -> Iterator[Tuple[EncodedText, npt.NDArray[np.int64]]]:
+        """Yields the tokenized batches of documents in order. With several workers, only a limited number of batches are left waiting so that the documents are read no faster than they are tokenized"""
+
+        if self._workers == 1:
+            for batch in self.__iter_batches():
+                yield encode_documents(batch)
+            return
+
+        with ProcessPoolExecutor(max_workers=self._workers) as executor:
+
+            pending: Deque[Future[Tuple[EncodedText, npt.NDArray[np.int64]]]] = deque()
+
+            try:
+
+                for batch in self.__iter_batches():
+
+                    if len(pending) >= 2*self._workers:
+                        yield pending.popleft().result()
+
+                    pending.append(executor.submit(encode_documents, batch))
+
+                while pending:
+                    yield pending.popleft().result()
+
+            finally:
+                for future in pending:
+                    future.cancel()
+
+    def iter_section_ids(self) -> Iterator[EncodedText]:
+
+        word_ids = WordIds()
+        document_count: int = 0
+
+        for encoded, section_counts in self.__iter_encoded_batches():
+
+            # Each batch was given its own word IDs, which are mapped to the IDs shared by every batch
+
+            remap = np.array([word_ids[word] for word in encoded.words], dtype=np.int32)
+            document_ids = np.repeat(np.arange(document_count, document_count+len(section_counts)), section_counts)
+            document_count += len(section_counts)
+
+            if encoded.section_count > 0:
+                yield EncodedText(
+                    list(word_ids),
+                    remap[encoded.ids],
+                    encoded.offsets,
+                    True,
+                    document_ids
+                )
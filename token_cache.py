@@ -0,0 +1,190 @@
+from typing import List, Sequence
+from pathlib import Path
+import hashlib
+import json
+import os
+import shutil
+import numpy as np
+from text_source import ITextSource, EncodedTextSource, StreamingFileTextSource
+from tokenizing import EncodedText, tokenizer_fingerprint
+
+
+DEFAULT_CACHE_DIRECTORY: Path = Path("token_cache")
+
+
+_FORMAT_VERSION: int = 1
+
+_METADATA_FILENAME: str = "metadata.json"
+_WORDS_FILENAME: str = "words.txt"
+_IDS_FILENAME: str = "ids.int32"
+_OFFSETS_FILENAME: str = "offsets.int64"
+
+
+class InvalidTokenCacheError(Exception):
+    pass
+
+
+def corpus_key(filepaths: Sequence[Path],
+               encoding: str = "UTF-8",
+               hash_contents: bool = False) -> str:
+    """Returns a hash identifying some text files and the way they are tokenized.
+
+Parameters:
+
+    filepaths - the files of the corpus, in order
+
+    encoding (optional) - the encoding the files are read with
+
+    hash_contents (optional) - if true, the contents of the files are hashed. \
+Otherwise only the paths, sizes and modification times of the files are, which avoids reading every file
+"""
+
+    hasher = hashlib.sha256()
+
+    hasher.update(f"{_FORMAT_VERSION}\n{tokenizer_fingerprint()}\n{encoding}\n".encode("UTF-8"))
+
+    for filepath in filepaths:
+
+        stat = filepath.stat()
+        hasher.update(f"{filepath.absolute()}\n{stat.st_size}\n".encode("UTF-8"))
+
+        if hash_contents:
+            hasher.update(filepath.read_bytes())
+        else:
+            hasher.update(f"{stat.st_mtime_ns}\n".encode("UTF-8"))
+
+    return hasher.hexdigest()
+
+
+def write_token_cache(text_source: ITextSource, directory: Path) -> None:
+    """Tokenizes a text source and writes its tokens to a cache directory. \
+The directory is written to a temporary location first and then moved into place, so a partially-written cache is never seen"""
+
+    directory.parent.mkdir(parents=True, exist_ok=True)
+
+    temp_directory = directory.with_name(f"{directory.name}.tmp-{os.getpid()}")
+    if temp_directory.exists():
+        shutil.rmtree(temp_directory)
+    temp_directory.mkdir()
+
+    words: List[str] = []
+    token_count: int = 0
+    section_count: int = 0
+    ends_with_section_end: bool = False
+
+    try:
+
+        with (temp_directory/_IDS_FILENAME).open("wb") as ids_file, \
+             (temp_directory/_OFFSETS_FILENAME).open("wb") as offsets_file:
+
+            np.zeros(shape=(1,), dtype=np.int64).tofile(offsets_file)
+
+            for encoded in text_source.iter_section_ids():
+
+                encoded.ids.astype(np.int32).tofile(ids_file)
+                (encoded.offsets[1:] + token_count).astype(np.int64).tofile(offsets_file)
+
+                words = encoded.words
+                token_count += len(encoded.ids)
+                section_count += encoded.section_count
+                ends_with_section_end = encoded.ends_with_section_end
+
+        for word in words:
+            if "\n" in word:
+                raise ValueError(word)
+
+        (temp_directory/_WORDS_FILENAME).write_text("\n".join(words), encoding="UTF-8")
+
+        (temp_directory/_METADATA_FILENAME).write_text(json.dumps({
+            "version": _FORMAT_VERSION,
+            "word_count": len(words),
+            "token_count": token_count,
+            "section_count": section_count,
+            "ends_with_section_end": ends_with_section_end,
+        }), encoding="UTF-8")
+
+        if directory.exists():
+            shutil.rmtree(directory)
+        temp_directory.rename(directory)
+
+    finally:
+        if temp_directory.exists():
+            shutil.rmtree(temp_directory)
+
+
+class CachedTextSource(EncodedTextSource):
+    """A text source for tokens that have been written to a cache directory by `write_token_cache`.
+
+The word IDs and section offsets are memory-mapped rather than read, so opening the cache is fast and \
+every process using the same cache shares the same pages of memory.
+"""
+
+    def __init__(self, directory: Path):
+
+        metadata_path = directory/_METADATA_FILENAME
+
+        if not metadata_path.is_file():
+            raise InvalidTokenCacheError(directory)
+
+        metadata = json.loads(metadata_path.read_text(encoding="UTF-8"))
+
+        if metadata.get("version") != _FORMAT_VERSION:
+            raise InvalidTokenCacheError(directory)
+
+        words_text = (directory/_WORDS_FILENAME).read_text(encoding="UTF-8")
+        words = words_text.split("\n") if metadata["word_count"] > 0 else []
+
+        if len(words) != metadata["word_count"]:
+            raise InvalidTokenCacheError(directory)
+
+        self._directory = directory
+
+        super().__init__(EncodedText(
+            words,
+            _map_array(directory/_IDS_FILENAME, np.int32, metadata["token_count"]),
+            _map_array(directory/_OFFSETS_FILENAME, np.int64, metadata["section_count"]+1),
+            metadata["ends_with_section_end"]
+        ))
+
+    @property
+    def directory(self) -> Path:
+        return self._directory
+
+
+def _map_array(filepath: Path, dtype: type, length: int) -> np.ndarray:
+
+    if filepath.stat().st_size != length * np.dtype(dtype).itemsize:
+        raise InvalidTokenCacheError(filepath)
+
+    # Memory-mapping an empty file isn't possible
+
+    if length == 0:
+        return np.zeros(shape=(0,), dtype=dtype)
+
+    return np.memmap(filepath, dtype=dtype, mode="r", shape=(length,))
+
+
+def cached_file_text_source(filepaths: Sequence[Path],
+                            cache_directory: Path = DEFAULT_CACHE_DIRECTORY,
+                            encoding: str = "UTF-8",
+                            hash_contents: bool = False) -> CachedTextSource:
+    """Returns a text source for some text files using a cache of their tokens, which is created first if it doesn't already exist.
+
+Parameters:
+
+    filepaths - the files to read the text of, in order. As with `StreamingFileTextSource`, the end of each file ends a section
+
+    cache_directory (optional) - the directory to keep caches in. Each corpus has its own subdirectory, named by `corpus_key`
+
+    encoding (optional) - the encoding of the files
+
+    hash_contents (optional) - whether the corpus is identified by the contents of its files rather than just their sizes and modification times
+"""
+
+    directory = cache_directory/corpus_key(filepaths, encoding=encoding, hash_contents=hash_contents)
+
+    try:
+        return CachedTextSource(directory)
+    except InvalidTokenCacheError:
+        write_token_cache(StreamingFileTextSource(filepaths, encoding=encoding), directory)
+        return CachedTextSource(directory)
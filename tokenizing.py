@@ -1,6 +1,9 @@
-from typing import List, Set, Optional
+from typing import List, Set, Dict, Tuple, Iterator, Iterable, Optional
 from abc import ABC
+import numpy as np
+import numpy.typing as npt
 from progress import Progress
+from instrumentation import instrumented, count
 import re
 
 
@@ -18,6 +21,40 @@ __SECTION_SEPARATORS: Set[str] = { ".", "\n" }
 """Characters that are accepted as separating sections of text."""
 
 
+def __character_class(chars: Set[str], negate: bool = False) -> str:
+    return "[" + ("^" if negate else "") + "".join(re.escape(char) for char in sorted(chars)) + "]"
+
+
+__IGNORED_CHARACTERS_REGEX = re.compile(__character_class(__WORD_CHARACTERS | __WORD_SEPARATORS | __SECTION_SEPARATORS, negate=True) + "+")
+"""Matches runs of characters that are neither part of a word nor a separator. These are removed before tokenizing"""
+
+__SECTION_SEPARATORS_REGEX = re.compile(__character_class(__SECTION_SEPARATORS))
+
+__WORD_REGEX = re.compile(__character_class({ char.lower() for char in __WORD_CHARACTERS }) + "+")
+"""Matches whole words once the ignored characters have been removed and the text has been made lowercase"""
+
+
+def tokenizer_fingerprint() -> str:
+    """Returns a string which changes whenever the way that text is tokenized changes, for identifying cached tokens"""
+    return "\n".join(regex.pattern for regex in (__IGNORED_CHARACTERS_REGEX, __SECTION_SEPARATORS_REGEX, __WORD_REGEX))
+
+
+_CHUNK_LENGTH: int = 1 << 20
+"""The approximate number of characters tokenized at once. Progress is reported after each chunk"""
+
+
+def section_end_position(text: str) -> int:
+    """Returns the position just after the last section separator in a text, or 0 if there isn't one. \
+Tokenizing the text before and after this position separately gives the same tokens as tokenizing the whole text"""
+    return max(text.rfind(separator) for separator in __SECTION_SEPARATORS) + 1
+
+
+def word_end_position(text: str) -> int:
+    """Returns the position just after the last word or section separator in a text, or 0 if there isn't one. \
+Tokenizing the text before and after this position separately gives the same words, although the section they are in is split in two"""
+    return max(text.rfind(separator) for separator in __WORD_SEPARATORS | __SECTION_SEPARATORS) + 1
+
+
 class UnhandledTextTokenTypeException(Exception):
     pass
 
@@ -40,48 +77,266 @@ class WordTextToken(TextToken):
 
         self.word = word if preserve_case else word.lower()
 
+    @classmethod
+    def _from_valid_word(cls, word: str) -> "WordTextToken":
+        """Creates a token without checking the word or changing its case. For use when the word is already known to be valid"""
+        token = cls.__new__(cls)
+        token.word = word
+        return token
+
 
 class EndOfSectionTextToken(TextToken):
     pass
 
 
-def tokenize(text: str, progress: Optional[Progress] = None) -> List[TextToken]:
+class WordIds(Dict[str, int]):
+    """A mapping of words to integer IDs, which gives each new word the next unused ID the first time that it is looked up"""
 
-    tokens: List[TextToken] = []
-    curr: str = ""
+    def __missing__(self, word: str) -> int:
+        word_id = len(self)
+        self[word] = word_id
+        return word_id
 
-    if progress:
-        progress.max = len(text)
 
-    for char in text:
+class EncodedText:
+    """A tokenized text stored as arrays of word IDs instead of as a list of token objects
+
+Attributes:
+
+    words - the word corresponding to each word ID
+
+    ids - the IDs of the words of every section, concatenated
+
+    offsets - an (S+1)-vector of positions in `ids` where section `i` is `ids[offsets[i]:offsets[i+1]]`. No section is empty
+
+    ends_with_section_end - whether the last section is followed by an end-of-section token
 
-        if char in __WORD_CHARACTERS:
+    document_ids - for texts made of several documents, an S-vector of the index of the document that each section is from. Otherwise, None
+"""
 
-            curr += char
+    def __init__(self,
+                 words: List[str],
+                 ids: npt.NDArray[np.int32],
+                 offsets: npt.NDArray[np.int64],
+                 ends_with_section_end: bool,
+                 document_ids: Optional[npt.NDArray[np.int64]] = None):
+
+        self.words = words
+        self.ids = ids
+        self.offsets = offsets
+        self.ends_with_section_end = ends_with_section_end
+        self.document_ids = document_ids
+
+    @property
+    def section_count(self) -> int:
+        return len(self.offsets) - 1
+
+    def sections(self, start: int, stop: int) -> "EncodedText":
+        """Returns the sections from index `start` (inclusive) to `stop` (exclusive). The word IDs are a view of the IDs of this text rather than a copy"""
+        return EncodedText(
+            self.words,
+            self.ids[self.offsets[start]:self.offsets[stop]],
+            self.offsets[start:stop+1] - self.offsets[start],
+            self.ends_with_section_end if stop == self.section_count else True,
+            None if self.document_ids is None else self.document_ids[start:stop]
+        )
+
+
+def section_batches(offsets: npt.NDArray[np.int64], batch_tokens: int) -> Iterator[Tuple[int, int]]:
+    """Splits sections into consecutive ranges of whole sections with roughly `batch_tokens` tokens in each. \
+Yields the start (inclusive) and stop (exclusive) section indexes of each range.
+
+Parameters:
+
+    offsets - an (S+1)-vector of the positions where each section starts, followed by the position where the last section ends
+
+    batch_tokens - the number of tokens to aim for in each range. A range only has more than this if it has a single section
+"""
+
+    section_count = len(offsets)-1
+
+    start = 0
+    while start < section_count:
+
+        stop = int(np.searchsorted(offsets, offsets[start] + batch_tokens, side="right")) - 1
+        stop = min(max(stop, start+1), section_count)
 
-        elif char in __WORD_SEPARATORS:
+        yield start, stop
 
-            if curr:
-                tokens.append(WordTextToken(curr))
-                curr = ""
+        start = stop
 
-        elif char in __SECTION_SEPARATORS:
 
-            if curr:
-                tokens.append(WordTextToken(curr))
-                curr = ""
+def __iter_sections(text: str, progress: Optional[Progress]) -> Iterator[Tuple[List[str], bool]]:
+    """Yields the words of each section of a text and whether the section is followed by a section separator. Sections may have no words.
 
-            if (len(tokens) > 0) and (not isinstance(tokens[-1], EndOfSectionTextToken)):
-                tokens.append(EndOfSectionTextToken())
+Letters are accumulated into words, which are separated by the word separator or section separator characters. \
+All other characters are ignored entirely, so they neither end a word nor appear in one.
+
+The text is split in chunks which always end just after a section separator, so that no word is split between chunks.
+"""
+
+    if progress:
+        progress.max = len(text)
+
+    start = 0
+    while start < len(text):
+
+        stop = start + _CHUNK_LENGTH
+
+        if stop < len(text):
+            separator = __SECTION_SEPARATORS_REGEX.search(text, stop)
+            stop = separator.end() if separator else len(text)
+        else:
+            stop = len(text)
+
+        sections = __SECTION_SEPARATORS_REGEX.split(__IGNORED_CHARACTERS_REGEX.sub("", text[start:stop]).lower())
+
+        for i, section in enumerate(sections):
+            yield __WORD_REGEX.findall(section), i < len(sections)-1
 
         if progress:
-            progress.next()
+            progress.next(stop-start)
 
-    if curr:
-        tokens.append(WordTextToken(curr))
-        curr = ""
+        start = stop
 
     if progress:
         progress.finish()
 
+
+class __WordTokenCache(Dict[str, WordTextToken]):
+    """Creates the token for each word the first time the word is looked up"""
+
+    def __missing__(self, word: str) -> WordTextToken:
+        token = WordTextToken._from_valid_word(word)
+        self[word] = token
+        return token
+
+
+@instrumented("tokenize")
+def tokenize(text: str, progress: Optional[Progress] = None) -> List[TextToken]:
+    """Splits a text into word tokens, with end-of-section tokens between sections. Every occurence of a word shares the same token object"""
+
+    tokens: List[TextToken] = []
+
+    word_tokens = __WordTokenCache()
+
+    for words, separated in __iter_sections(text, progress):
+
+        tokens.extend(map(word_tokens.__getitem__, words))
+
+        if separated and (len(tokens) > 0) and (not isinstance(tokens[-1], EndOfSectionTextToken)):
+            tokens.append(EndOfSectionTextToken())
+
+    count("characters", len(text))
+    count("tokens", len(tokens))
+
     return tokens
+
+
+@instrumented("encode_text")
+def encode_text(text: str,
+                word_ids: Optional[WordIds] = None,
+                progress: Optional[Progress] = None) -> EncodedText:
+    """Tokenizes a text in the same way as `tokenize` but stores the words as IDs instead of as token objects.
+
+Parameters:
+
+    text - the text to tokenize
+
+    word_ids (optional) - the IDs to give the words. New words are added to it, so passing the same mapping to multiple calls gives the texts shared IDs
+
+    progress (optional) - a progress tracker for the tokenizing
+"""
+
+    if word_ids is None:
+        word_ids = WordIds()
+
+    id_arrays: List[npt.NDArray[np.int32]] = []
+    offsets: List[int] = [0]
+    ends_with_section_end: bool = False
+
+    pending: List[int] = []
+    """IDs not yet copied into an array. These are copied in batches so that the whole text is never held as Python integers"""
+
+    for words, separated in __iter_sections(text, progress):
+
+        if words:
+
+            pending.extend(map(word_ids.__getitem__, words))
+            offsets.append(offsets[-1] + len(words))
+            ends_with_section_end = separated
+
+            if len(pending) >= _CHUNK_LENGTH:
+                id_arrays.append(np.array(pending, dtype=np.int32))
+                pending = []
+
+    id_arrays.append(np.array(pending, dtype=np.int32))
+
+    count("characters", len(text))
+    count("sections", len(offsets)-1)
+    count("tokens", offsets[-1])
+
+    return EncodedText(
+        list(word_ids),
+        np.concatenate(id_arrays),
+        np.array(offsets, dtype=np.int64),
+        ends_with_section_end
+    )
+
+
+@instrumented("encode_documents")
+def encode_documents(documents: Iterable[str],
+                     word_ids: Optional[WordIds] = None) -> Tuple[EncodedText, npt.NDArray[np.int64]]:
+    """Tokenizes each of some documents in the same way as `encode_text`, with the end of each document also ending a section so that no section spans two documents.
+
+Parameters:
+
+    documents - the documents to tokenize, in order
+
+    word_ids (optional) - the IDs to give the words. New words are added to it
+
+Returns:
+
+    encoded - the sections of all the documents, in order
+
+    section_counts - the number of sections of each document, which is 0 for documents without any words
+"""
+
+    if word_ids is None:
+        word_ids = WordIds()
+
+    id_arrays: List[npt.NDArray[np.int32]] = []
+    offsets: List[int] = [0]
+    section_counts: List[int] = []
+
+    pending: List[int] = []
+
+    for document in documents:
+
+        section_count = len(offsets)
+
+        for words, _ in __iter_sections(document, None):
+
+            if words:
+
+                pending.extend(map(word_ids.__getitem__, words))
+                offsets.append(offsets[-1] + len(words))
+
+                if len(pending) >= _CHUNK_LENGTH:
+                    id_arrays.append(np.array(pending, dtype=np.int32))
+                    pending = []
+
+        section_counts.append(len(offsets) - section_count)
+
+    id_arrays.append(np.array(pending, dtype=np.int32))
+
+    count("documents", len(section_counts))
+    count("sections", len(offsets)-1)
+    count("tokens", offsets[-1])
+
+    return EncodedText(
+        list(word_ids),
+        np.concatenate(id_arrays),
+        np.array(offsets, dtype=np.int64),
+        True
+    ), np.array(section_counts, dtype=np.int64)
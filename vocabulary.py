@@ -0,0 +1,192 @@
+from typing import Dict, Iterable, Iterator, List, Optional, Sequence, Union
+import numpy as np
+import numpy.typing as npt
+from bij_map import BijMap
+from array_bundle import encode_strings, decode_strings
+
+
+_BYTES_MAGIC: bytes = b"WMLVOCB\x01"
+
+
+class Vocabulary:
+    """A list of distinct words, where each word's index is its position in the list.
+
+Words are looked up by index directly in the list and indexes are looked up by word in a dict. \
+Whole arrays of words or indexes can be converted at once with `encode` and `decode`. \
+The methods of `BijMap[str, int]` are also provided so that a vocabulary can be used wherever one of those mapping words to indexes was.
+"""
+
+    def __init__(self, words: Iterable[str] = ()):
+
+        self.__words: List[str] = []
+        self.__indexes: Dict[str, int] = {}
+        self.__words_array: Optional[npt.NDArray[np.object_]] = None
+
+        for word in words:
+            if word in self.__indexes:
+                raise ValueError(f"Duplicate word {word}")
+            self.add(word)
+
+    @classmethod
+    def from_bij_map(cls, bm: BijMap[str, int]) -> "Vocabulary":
+        """Creates a vocabulary from a bijective map of words to indexes. \
+The indexes must be 0 to N-1, each used by exactly one of the N words, otherwise a `ValueError` is raised"""
+
+        words: List[Optional[str]] = [None] * bm.size
+
+        for word in bm.iterate_to():
+            index = bm.get_to(word)
+            if not (0 <= index < bm.size):
+                raise ValueError(f"Index {index} is out of range")
+            if words[index] is not None:
+                raise ValueError(f"Index {index} is used by both {words[index]} and {word}")
+            words[index] = word
+
+        if None in words:
+            raise ValueError(f"Index {words.index(None)} isn't used")
+
+        return cls(word for word in words if word is not None)
+
+    def to_bij_map(self) -> BijMap[str, int]:
+
+        bm = BijMap[str, int]()
+
+        for index, word in enumerate(self.__words):
+            bm.set_to(word, index)
+
+        return bm
+
+    def add(self, word: str) -> int:
+        """Adds a word to the end of the vocabulary if it isn't already in it. Returns the index of the word"""
+
+        index = self.__indexes.get(word)
+
+        if index is None:
+            index = len(self.__words)
+            self.__words.append(word)
+            self.__indexes[word] = index
+            self.__words_array = None
+
+        return index
+
+    @property
+    def words(self) -> List[str]:
+        """The words in order of index"""
+        return self.__words.copy()
+
+    def index_of(self, word: str) -> int:
+        return self.__indexes[word]
+
+    def encode(self, words: Iterable[str], missing: Optional[int] = None) -> npt.NDArray[np.int32]:
+        """Returns the indexes of some words as an array.
+
+If `missing` is provided, words not in the vocabulary are given it as their index. Otherwise a `KeyError` is raised for them.
+"""
+
+        if missing is None:
+            return np.fromiter((self.__indexes[word] for word in words), dtype=np.int32)
+        else:
+            return np.fromiter((self.__indexes.get(word, missing) for word in words), dtype=np.int32)
+
+    def decode(self, indexes: Union[Sequence[int], npt.NDArray[np.integer]]) -> List[str]:
+        """Returns the words with some indexes"""
+
+        if self.__words_array is None:
+            self.__words_array = np.empty(shape=(len(self.__words),), dtype=object)
+            self.__words_array[:] = self.__words
+
+        indexes = np.asarray(indexes, dtype=np.int64)
+
+        if np.any((indexes < 0) | (indexes >= len(self.__words))):
+            raise IndexError("Index out of range")
+
+        return self.__words_array[indexes].tolist()
+
+    def to_bytes(self) -> bytes:
+        """Serializes the vocabulary to a compact binary form, which is the UTF-8 encodings of the words concatenated after their offsets"""
+
+        blob, offsets = encode_strings(self.__words)
+
+        return _BYTES_MAGIC \
+            + np.array([len(self.__words)], dtype="<u8").tobytes() \
+            + offsets.astype("<i8").tobytes() \
+            + blob.tobytes()
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> "Vocabulary":
+        """Deserializes a vocabulary serialized by `to_bytes`"""
+
+        header_length = len(_BYTES_MAGIC) + 8
+
+        if (len(data) < header_length) or (not data.startswith(_BYTES_MAGIC)):
+            raise ValueError("Invalid vocabulary data")
+
+        count = int(np.frombuffer(data, dtype="<u8", count=1, offset=len(_BYTES_MAGIC))[0])
+        blob_start = header_length + 8*(count+1)
+
+        if len(data) < blob_start:
+            raise ValueError("Invalid vocabulary data")
+
+        offsets = np.frombuffer(data, dtype="<i8", count=count+1, offset=header_length)
+        blob = np.frombuffer(data, dtype=np.uint8, offset=blob_start)
+
+        if (offsets[0] != 0) or (offsets[-1] != len(blob)):
+            raise ValueError("Invalid vocabulary data")
+
+        return cls(decode_strings(blob, offsets))
+
+    def __len__(self) -> int:
+        return len(self.__words)
+
+    def __contains__(self, word: str) -> bool:
+        return word in self.__indexes
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.__words)
+
+    def __getitem__(self, index: int) -> str:
+        return self.__words[index]
+
+    def __eq__(self, other: object) -> bool:
+        return isinstance(other, Vocabulary) and (self.__words == other.__words)
+
+    # Methods of BijMap[str, int]
+
+    def set_to(self, a: str, b: int) -> None:
+        """Adds a word with a given index. As indexes are positions, the index must be the next one unless the word already has it"""
+        if self.__indexes.get(a) == b:
+            return
+        if (a in self.__indexes) or (b != len(self.__words)):
+            raise ValueError(f"Can't give {a} the index {b}")
+        self.add(a)
+
+    def set_from(self, b: int, a: str) -> None:
+        self.set_to(a, b)
+
+    def get_to(self, a: str) -> int:
+        return self.__indexes[a]
+
+    def get_from(self, b: int) -> str:
+        if 0 <= b < len(self.__words):
+            return self.__words[b]
+        else:
+            raise KeyError(b)
+
+    def to_contains(self, a: str) -> bool:
+        return a in self.__indexes
+
+    def from_contains(self, b: int) -> bool:
+        return 0 <= b < len(self.__words)
+
+    def from_contins(self, b: int) -> bool:
+        return self.from_contains(b)
+
+    def iterate_to(self) -> Iterator[str]:
+        return iter(self.__words)
+
+    def iterate_from(self) -> Iterator[int]:
+        return iter(range(len(self.__words)))
+
+    @property
+    def size(self) -> int:
+        return len(self.__words)